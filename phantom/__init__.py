@@ -1,5 +1,28 @@
-from .editor import main, LayerEditorApp
-from .layer import LayerItem
+"""Phantom construction tools.
+
+The GUI entry points are resolved lazily (PEP 562) so headless users of
+`phantom.image_utils` or `phantom.config` never import tkinter.
+"""
+from importlib import import_module
+
+# re-exported name -> submodule defining it
+_LAZY_ATTRS = {
+    "main": "editor",
+    "LayerEditorApp": "editor",
+    "LayerItem": "layer",
+}
 
 __all__ = ["main", "LayerEditorApp", "LayerItem"]
 
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
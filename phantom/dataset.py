@@ -0,0 +1,162 @@
+"""Headless, deterministic generation of phantom datasets.
+
+Every sample is built from a base `layer_positions.json` and `gamma_parameters.json`
+with its own random per-layer vertical offsets and its own RNG, seeded from
+(seed, sample index), so a dataset is reproducible regardless of how many worker
+processes generate it.
+
+Output directory layout:
+  images.npy     (N, H, W) uint8 grayscale phantoms
+  labels.npy     (N, H, W) uint8 index into LAYER_NAMES of the topmost layer (UNLABELED where empty)
+  manifest.json  generation parameters plus per-sample seed and layer positions
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .config import CANVAS_W, CANVAS_H, PNG_FILES, LAYER_NAMES
+from .image_utils import UNLABELED, load_layer_mask, gamma_noise_plane, composite_layers
+
+# per-process cache of layer alpha masks, filled once by the pool initializer
+_LAYER_MASKS: Dict[str, np.ndarray] = {}
+
+
+def resolve_layer_png(png_path: str, layer_name: str) -> Optional[Path]:
+    """Locate a layer PNG the same way the editor does (as given, project root, pngs/<name>.png)."""
+    project_root = Path(__file__).resolve().parents[1]
+    for cand in (Path(png_path), project_root / png_path, project_root / "pngs" / f"{layer_name}.png"):
+        if cand.exists():
+            return cand
+    return None
+
+
+def load_layer_masks(canvas_w: int = CANVAS_W, png_files=None, layer_names=None) -> Dict[str, np.ndarray]:
+    """Load the uint8 alpha masks of all non-background layer PNGs, scaled to the canvas width."""
+    if png_files is None:
+        png_files = PNG_FILES
+    if layer_names is None:
+        layer_names = LAYER_NAMES
+    masks = {}
+    for png_path, layer_name in zip(png_files, layer_names[1:]):
+        path = resolve_layer_png(png_path, layer_name)
+        if path is None:
+            raise FileNotFoundError(f"PNG for layer '{layer_name}' not found ({png_path})")
+        masks[layer_name] = load_layer_mask(str(path), target_width=canvas_w)
+    return masks
+
+
+def sample_seed_sequence(seed: int, index: int) -> np.random.SeedSequence:
+    """Independent, reproducible seed for sample `index` of a dataset seeded with `seed`."""
+    return np.random.SeedSequence([seed, index])
+
+
+def sample_positions(base_positions: Dict[str, int], max_offset: int, rng) -> Dict[str, int]:
+    """Shift every layer's base y by an independent integer offset in [-max_offset, max_offset]."""
+    names = list(base_positions)
+    offsets = rng.integers(-max_offset, max_offset + 1, size=len(names)) if max_offset > 0 else np.zeros(len(names), int)
+    return {name: int(base_positions[name] + off) for name, off in zip(names, offsets)}
+
+
+def render_phantom(positions: Dict[str, int], gamma_params: Dict[str, Any], layer_masks: Dict[str, np.ndarray],
+                   canvas_w: int, canvas_h: int, rng, layer_names=None):
+    """Composite one phantom; returns (image, labels) as (H, W) uint8 arrays.
+
+    Layers are drawn in LAYER_NAMES order on top of the gamma-filled background.
+    labels holds the index (in layer_names) of the topmost layer covering each pixel.
+    """
+    if layer_names is None:
+        layer_names = LAYER_NAMES
+
+    def layers():
+        bg_params = gamma_params.get(layer_names[0])
+        if bg_params:
+            yield (gamma_noise_plane(bg_params["shape"], bg_params["scale"], size=(canvas_h, canvas_w), rng=rng),
+                   np.full((canvas_h, canvas_w), 255, dtype=np.uint8), 0, 0)
+        for label, layer_name in enumerate(layer_names[1:], start=1):
+            mask = layer_masks.get(layer_name)
+            if mask is None:
+                continue
+            params = gamma_params.get(layer_name)
+            if params:
+                intensity = gamma_noise_plane(params["shape"], params["scale"], mask=mask, rng=rng)
+            else:
+                intensity = np.zeros(mask.shape, dtype=np.uint8)
+            y = max(-mask.shape[0] + 1, min(canvas_h - 1, positions.get(layer_name, 0)))
+            yield intensity, mask, y, label
+
+    image, _, labels = composite_layers(layers(), canvas_w, canvas_h)
+    return image, labels
+
+
+def _init_worker(canvas_w, png_files, layer_names):
+    _LAYER_MASKS.clear()
+    _LAYER_MASKS.update(load_layer_masks(canvas_w, png_files, layer_names))
+
+
+def _generate_chunk(out_dir, indices, seed, base_positions, gamma_params, max_offset, canvas_w, canvas_h, layer_names):
+    images = np.load(os.path.join(out_dir, "images.npy"), mmap_mode="r+")
+    labels = np.load(os.path.join(out_dir, "labels.npy"), mmap_mode="r+")
+    meta = []
+    for idx in indices:
+        rng = np.random.default_rng(sample_seed_sequence(seed, idx))
+        positions = sample_positions(base_positions, max_offset, rng)
+        image, label_map = render_phantom(positions, gamma_params, _LAYER_MASKS, canvas_w, canvas_h, rng, layer_names)
+        images[idx] = image
+        labels[idx] = label_map
+        meta.append({"index": int(idx), "positions": positions})
+    images.flush()
+    labels.flush()
+    return meta
+
+
+def generate_dataset(out_dir: str, n_samples: int, base_positions: List[Dict[str, Any]], gamma_params: Dict[str, Any],
+                     seed: int = 0, max_offset: int = 10, canvas_w: int = CANVAS_W, canvas_h: int = CANVAS_H,
+                     workers: Optional[int] = None, chunk_size: int = 16, png_files=None, layer_names=None) -> str:
+    """Generate `n_samples` phantoms into out_dir across a process pool and return the manifest path.
+
+    base_positions is the layer_positions.json list ({'name', 'y', ...}); layers missing from it start at y=0.
+    The same (seed, n_samples, inputs) always produce identical arrays, whatever `workers` is.
+    """
+    if png_files is None:
+        png_files = PNG_FILES
+    if layer_names is None:
+        layer_names = LAYER_NAMES
+    pos_by_name = {p["name"]: int(p.get("y", 0)) for p in base_positions if "name" in p}
+    base = {name: pos_by_name.get(name, 0) for name in layer_names[1:]}
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name in ("images.npy", "labels.npy"):
+        np.lib.format.open_memmap(os.path.join(out_dir, name), mode="w+", dtype=np.uint8,
+                                  shape=(n_samples, canvas_h, canvas_w)).flush()
+
+    chunks = [list(range(i, min(i + chunk_size, n_samples))) for i in range(0, n_samples, chunk_size)]
+    samples = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(canvas_w, png_files, layer_names)) as pool:
+        futures = [pool.submit(_generate_chunk, out_dir, chunk, seed, base, gamma_params, max_offset,
+                               canvas_w, canvas_h, layer_names) for chunk in chunks]
+        for done, fut in enumerate(futures, start=1):
+            samples.extend(fut.result())
+            print(f"  {min(done * chunk_size, n_samples)}/{n_samples} phantoms")
+
+    for meta in samples:
+        meta["seed_entropy"] = [seed, meta["index"]]
+    manifest = {
+        "n_samples": n_samples,
+        "canvas": [canvas_h, canvas_w],
+        "seed": seed,
+        "max_offset": max_offset,
+        "layer_names": list(layer_names),
+        "unlabeled": UNLABELED,
+        "base_positions": base,
+        "gamma_parameters": gamma_params,
+        "samples": sorted(samples, key=lambda m: m["index"]),
+    }
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest_path
@@ -1,23 +1,48 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import json
+import queue
+import threading
 from PIL import Image, ImageTk
 import numpy as np
 from typing import List
 from pathlib import Path
 
-from .layer import LayerItem
-from .image_utils import load_png_as_rgba, make_background_layer, fill_layer_with_gamma
+from .layer import LayerItem, layer_boundaries
+from .image_utils import load_png_as_rgba, make_background_layer, fill_layer_with_gamma, composite_rgba_layers, layer_plane
 from .config import CANVAS_W, CANVAS_H, PNG_FILES, LAYER_NAMES, load_gamma_parameters
 
+# how often the GUI thread checks for finished background fills / previews
+FILL_POLL_MS = 30
+# quiet time after the last drag event before the edge preview is recomputed
+PREVIEW_DEBOUNCE_MS = 60
+
+
 class LayerEditorApp:
-    def __init__(self, root: tk.Tk, layers: List[LayerItem], canvas_w: int, canvas_h: int):
+    def __init__(self, root: tk.Tk, layers: List[LayerItem], canvas_w: int, canvas_h: int, preview: bool = False):
+        """preview=True overlays a live DoB edge map that follows layer drags (see phantom.preview)."""
         self.root = root
         self.root.title("Drag and drop layers editor")
         self.canvas_w = canvas_w
         self.canvas_h = canvas_h
         self.layers = layers
         self.drag_data = {"item": None, "y0": 0, "mouse_y0": 0}
+        # finished background fills: (layer, PIL image, params) tuples; image is None and
+        # params the exception when filling that layer failed
+        self._fill_results = queue.Queue()
+        self._fill_thread = None
+        self._fill_pending = 0
+        self.preview = preview
+        self._preview_map = None
+        self._preview_dirty = None
+        self._preview_after = None
+        self._preview_thread = None
+        self._preview_again = False
+        self._preview_results = queue.Queue()
+        self._preview_photo = None
+        self._preview_id = None
+        # per-layer (version, intensity plane) snapshots handed to the preview worker
+        self._planes = {}
 
         self.canvas = tk.Canvas(root, width=canvas_w, height=canvas_h, bg="white")
         self.canvas.pack()
@@ -30,13 +55,28 @@ class LayerEditorApp:
 
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
+    def photo_image(self, li: LayerItem):
+        """PhotoImage of a layer, rebuilt only when its pil_image changed since the last call."""
+        if li.tk_image is None or li.tk_version != li.version:
+            li.tk_image = ImageTk.PhotoImage(li.pil_image)
+            li.tk_version = li.version
+        return li.tk_image
+
+    def refresh_layer(self, li: LayerItem):
+        if li.canvas_id is not None:
+            self.canvas.itemconfig(li.canvas_id, image=self.photo_image(li))
+
     def draw_all(self):
         self.canvas.delete("all")
         for li in self.layers:
-            li.tk_image = ImageTk.PhotoImage(li.pil_image)
+            self.photo_image(li)
             li.canvas_id = self.canvas.create_image(0, li.y, anchor="nw", image=li.tk_image, tags=("layer", li.name))
         for li in self.layers:
             self.canvas.tag_raise(li.canvas_id)
+        if self.preview:
+            # disabled items never become "current", so clicks still reach the layers below
+            self._preview_id = self.canvas.create_image(0, 0, anchor="nw", state="disabled", tags=("preview",))
+            self.mark_preview_dirty(0, self.canvas_h)
 
     def on_press(self, event):
         clicked = self.canvas.find_withtag("current")
@@ -62,41 +102,31 @@ class LayerEditorApp:
         new_y = self.drag_data["y0"] + dy
         h = li.pil_image.height
         new_y = max(-h + 1, min(self.canvas_h - 1, new_y))
+        old_y = li.y
         li.y = int(new_y)
         self.canvas.coords(li.canvas_id, 0, li.y)
+        if self.preview and li.y != old_y:
+            self.mark_preview_dirty(min(old_y, li.y), max(old_y, li.y) + h)
 
     def on_release(self, event):
         self.drag_data = {"item": None, "y0": 0, "mouse_y0": 0}
 
     def get_layer_upper_boundary(self, li: LayerItem):
-        arr = np.array(li.pil_image)
-        alpha = arr[:, :, 3]
-        h, w = alpha.shape
-
-        out = [None] * self.canvas_w
-        cols_to_process = min(w, self.canvas_w)
-
-        for x in range(cols_to_process):
-            col = alpha[:, x]
-            idx = np.where(col > 0)[0]
-            if idx.size == 0:
-                out[x] = None
-            else:
-                top_in_img = int(idx.min())
-                out[x] = int(li.y + top_in_img)
-
-        return out
+        return layer_boundaries(li.alpha, li.y, self.canvas_w, li.profiles)["upper_boundary_px"]
 
-    def save_all(self):
+    def layer_geometry(self):
+        """Position and boundary profiles of every draggable layer, as written to layer_positions.json."""
         out = []
         for li in self.layers:
             if li.name == "background" or not li.draggable:
                 continue
-            out.append({
-                "name": li.name,
-                "y": int(li.y),
-                "upper_boundary_px": self.get_layer_upper_boundary(li),
-            })
+            entry = {"name": li.name, "y": int(li.y)}
+            entry.update(layer_boundaries(li.alpha, li.y, self.canvas_w, li.profiles))
+            out.append(entry)
+        return out
+
+    def save_all(self):
+        out = self.layer_geometry()
         path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")])
         if not path:
             return
@@ -104,10 +134,13 @@ class LayerEditorApp:
             json.dump(out, f, indent=2)
         messagebox.showinfo("Saved", f"Saved to {path}")
 
+    def composite_image(self):
+        """Composite all layers; returns (RGBA image, labels) with labels indexing self.layers."""
+        layers = ((np.asarray(li.pil_image), li.y, label) for label, li in enumerate(self.layers))
+        return composite_rgba_layers(layers, self.canvas_w, self.canvas_h)
+
     def export_composite(self):
-        comp = Image.new("RGBA", (self.canvas_w, self.canvas_h), (0, 0, 0, 0))
-        for li in self.layers:
-            comp.alpha_composite(li.pil_image, dest=(0, li.y))
+        comp, _ = self.composite_image()
         path = filedialog.asksaveasfilename(defaultextension=".png", filetypes=[("PNG", "*.png")])
         if not path:
             return
@@ -115,18 +148,125 @@ class LayerEditorApp:
         messagebox.showinfo("Exported", f"Saved to {path}")
 
     def fill_all_layers(self):
+        """Refill every layer with gamma noise on a background thread; layers update as they finish."""
+        if self._fill_thread is not None and self._fill_thread.is_alive():
+            return
         try:
             gamma_by_name = load_gamma_parameters()
         except Exception:
             messagebox.showerror("Error", "Could not load gamma parameters")
             return
 
-        for li in self.layers:
-            if li.name == "background":
+        jobs = [(li, gamma_by_name[li.name]) for li in self.layers if li.name != "background"]
+        self._fill_pending = len(jobs)
+        self._fill_thread = threading.Thread(target=self._fill_worker, args=(jobs,), daemon=True)
+        self._fill_thread.start()
+        self.root.after(FILL_POLL_MS, self._poll_fills)
+
+    def _fill_worker(self, jobs):
+        # NumPy/PIL only: Tk objects must be touched from the GUI thread, in _poll_fills
+        for li, params in jobs:
+            try:
+                img = fill_layer_with_gamma(li.original_image, params["shape"], params["scale"])
+            except Exception as e:
+                self._fill_results.put((li, None, e))
                 continue
-            params = gamma_by_name[li.name]
-            fill_layer_with_gamma(li, params["shape"], params["scale"])
-            self.canvas.itemconfig(li.canvas_id, image=li.tk_image)
+            self._fill_results.put((li, img, params))
+
+    def _apply_fills(self, refresh: bool = True):
+        failed = []
+        try:
+            while True:
+                li, img, params = self._fill_results.get_nowait()
+                self._fill_pending -= 1
+                if img is None:
+                    print(f"Could not fill layer {li.name}: {params}")
+                    failed.append(li.name)
+                    continue
+                li.set_image(img)
+                li.filled_params = params
+                if refresh:
+                    self.refresh_layer(li)
+                    if self.preview:
+                        self.mark_preview_dirty(li.y, li.y + li.pil_image.height)
+        except queue.Empty:
+            pass
+        if failed and refresh:
+            messagebox.showerror("Error", f"Could not fill layers: {', '.join(failed)}")
+
+    def _poll_fills(self):
+        self._apply_fills()
+        if self._fill_pending > 0 and not self._fill_thread.is_alive() and self._fill_results.empty():
+            # the worker ended without reporting every layer
+            print(f"Layer fill stopped with {self._fill_pending} layers unfilled")
+            self._fill_pending = 0
+        if self._fill_pending > 0:
+            self.root.after(FILL_POLL_MS, self._poll_fills)
+
+    def mark_preview_dirty(self, r0: int, r1: int):
+        """Queue canvas rows [r0, r1) for a preview update once dragging pauses."""
+        r0, r1 = max(int(r0), 0), min(int(r1), self.canvas_h)
+        if self._preview_dirty is not None:
+            r0, r1 = min(r0, self._preview_dirty[0]), max(r1, self._preview_dirty[1])
+        self._preview_dirty = (r0, r1)
+        if self._preview_after is not None:
+            self.root.after_cancel(self._preview_after)
+        self._preview_after = self.root.after(PREVIEW_DEBOUNCE_MS, self._start_preview)
+
+    def _layer_planes(self):
+        out = []
+        for label, li in enumerate(self.layers):
+            cached = self._planes.get(id(li))
+            if cached is None or cached[0] != li.version:
+                cached = (li.version, layer_plane(np.asarray(li.pil_image)))
+                self._planes[id(li)] = cached
+            out.append((cached[1], li.alpha, li.y, label))
+        return out
+
+    def _start_preview(self):
+        self._preview_after = None
+        if self._preview_dirty is None:
+            return
+        if self._preview_thread is not None and self._preview_thread.is_alive():
+            # rerun with the accumulated rows as soon as the running update lands
+            self._preview_again = True
+            return
+        rows, self._preview_dirty = self._preview_dirty, None
+        self._preview_thread = threading.Thread(target=self._preview_worker, args=(self._layer_planes(), rows),
+                                                daemon=True)
+        self._preview_thread.start()
+        self.root.after(FILL_POLL_MS, self._poll_preview)
+
+    def _preview_worker(self, layers, rows):
+        # the worker owns _preview_map while it runs; only one worker runs at a time.
+        # It always puts one result, the overlay or the exception, so _poll_preview stops.
+        try:
+            from .preview import band_response, edge_overlay, PREVIEW_STEP
+            if self._preview_map is None:
+                self._preview_map = np.zeros((self.canvas_h // PREVIEW_STEP, self.canvas_w // PREVIEW_STEP),
+                                             np.float32)
+                rows = (0, self.canvas_h)
+            d0, band = band_response(layers, self.canvas_w, self.canvas_h, rows)
+            self._preview_map[d0:d0 + len(band)] = band
+            self._preview_results.put(edge_overlay(self._preview_map, (self.canvas_w, self.canvas_h)))
+        except Exception as e:
+            self._preview_results.put(e)
+
+    def _poll_preview(self):
+        try:
+            overlay = self._preview_results.get_nowait()
+        except queue.Empty:
+            self.root.after(FILL_POLL_MS, self._poll_preview)
+            return
+        if isinstance(overlay, Exception):
+            print("Edge preview update failed:", overlay)
+        else:
+            self._preview_photo = ImageTk.PhotoImage(overlay)
+            self.canvas.itemconfig(self._preview_id, image=self._preview_photo)
+            self.canvas.tag_raise(self._preview_id)
+        if self._preview_again:
+            self._preview_again = False
+            self._start_preview()
 
     def on_close(self):
         try:
@@ -135,32 +275,27 @@ class LayerEditorApp:
             gamma_by_name = {}
 
         try:
+            if self._fill_thread is not None:
+                self._fill_thread.join()
+                self._apply_fills(refresh=False)
+            # only layers not yet filled with their current parameters need new noise; the
+            # window is closing, so no PhotoImages are rebuilt
             for li in self.layers:
                 if li.name == "background":
                     continue
                 params = gamma_by_name.get(li.name)
-                if params:
+                if params and li.filled_params != params:
                     fill_layer_with_gamma(li, params["shape"], params["scale"])
-                    self.canvas.itemconfig(li.canvas_id, image=li.tk_image)
+                    li.filled_params = params
 
-            out = []
-            for li in self.layers:
-                if li.name == "background" or not li.draggable:
-                    continue
-                out.append({
-                    "name": li.name,
-                    "y": int(li.y),
-                    "upper_boundary_px": self.get_layer_upper_boundary(li),
-                })
+            out = self.layer_geometry()
             out_dir = Path("json_outputs")
             out_dir.mkdir(parents=True, exist_ok=True)
             positions_path = out_dir / "layer_positions.json"
             with open(positions_path, "w", encoding="utf-8") as f:
                 json.dump(out, f, indent=2)
 
-            comp = Image.new("RGBA", (self.canvas_w, self.canvas_h), (0, 0, 0, 0))
-            for li in self.layers:
-                comp.alpha_composite(li.pil_image, dest=(0, li.y))
+            comp, _ = self.composite_image()
             comp.save("phantom.png")
 
             print(f"Auto-saved positions to {positions_path} and composite.png")
@@ -170,7 +305,8 @@ class LayerEditorApp:
             self.root.destroy()
 
 
-def main(run: bool = True, canvas_w: int = CANVAS_W, canvas_h: int = CANVAS_H, png_files=None, layer_names=None):
+def main(run: bool = True, canvas_w: int = CANVAS_W, canvas_h: int = CANVAS_H, png_files=None, layer_names=None,
+         preview: bool = False):
     if png_files is None:
         png_files = PNG_FILES
     if layer_names is None:
@@ -234,7 +370,7 @@ def main(run: bool = True, canvas_w: int = CANVAS_W, canvas_h: int = CANVAS_H, p
 
         layers.append(LayerItem(layer_name, img_rgba, init_y=0))
 
-    app = LayerEditorApp(root, layers, canvas_w, canvas_h)
+    app = LayerEditorApp(root, layers, canvas_w, canvas_h, preview=preview)
     if run:
         try:
             root.mainloop()
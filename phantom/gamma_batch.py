@@ -0,0 +1,164 @@
+"""Headless gamma-parameter estimation over many images.
+
+Every layer region of every image is reduced to a 256-bin histogram of its 8-bit
+values, which is all the gamma MLE and its bootstrap need (see phantom.gamma_fit).
+Images are processed across a process pool; the result is a gamma_parameters-style
+JSON whose top-level entries are the pooled estimates, so it can be used directly
+wherever gamma_parameters.json is loaded:
+
+  {"NFL": {"shape": ..., "scale": ..., "shape_ci": [lo, hi], "scale_ci": [lo, hi],
+           "n_pixels": ..., "n_images": ...,
+           "per_image": {"scan_01.png": {"shape": ..., "scale": ..., "shape_ci": ..., ...}}},
+   ...}
+
+Regions are either rectangles ({layer: [x, y, w, h]}) or bands between consecutive
+layer upper boundaries taken from a layer_positions.json.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+from .config import LAYER_NAMES
+from .gamma_fit import histogram_mle, bootstrap_gamma_ci, bootstrap_pooled_ci
+
+
+def rect_mask(shape, rect) -> np.ndarray:
+    """Boolean mask of rectangle [x, y, w, h], clipped to `shape`."""
+    x, y, w, h = (int(v) for v in rect)
+    mask = np.zeros(shape, dtype=bool)
+    mask[max(y, 0):max(y + h, 0), max(x, 0):max(x + w, 0)] = True
+    return mask
+
+
+def band_masks(positions: List[Dict[str, Any]], shape, margin: int = 2, layer_names=None) -> Dict[str, np.ndarray]:
+    """Per-layer masks of the visible band of each layer from layer_positions.json entries.
+
+    Layer i covers rows from its upper boundary to the next layer's upper boundary in each
+    column (the background everything above the first layer; the last layer down to its
+    lower boundary when recorded, else the image bottom). `margin` rows are trimmed at
+    every layer boundary so boundary blur does not leak into the fit. Columns without
+    a recorded boundary are left out.
+    """
+    if layer_names is None:
+        layer_names = LAYER_NAMES
+    H, W = shape
+    by_name = {p["name"]: p for p in positions if "name" in p}
+    names = [n for n in layer_names[1:] if n in by_name]
+
+    def profile(values):
+        arr = np.full(W, np.nan)
+        vals = [np.nan if v is None else float(v) for v in (values or [])[:W]]
+        arr[:len(vals)] = vals
+        return arr
+
+    uppers = [profile(by_name[n].get("upper_boundary_px")) for n in names]
+    tops = [np.zeros(W)] + uppers
+    bottoms = uppers + [profile(by_name[names[-1]].get("lower_boundary_px")) + 1 if names else np.full(W, H)]
+    if names and np.isnan(bottoms[-1]).all():
+        bottoms[-1] = np.where(np.isnan(uppers[-1]), np.nan, H)
+
+    rows = np.arange(H)[:, None]
+    masks = {}
+    for name, top, bottom in zip([layer_names[0]] + names, tops, bottoms):
+        valid = ~(np.isnan(top) | np.isnan(bottom))
+        # the image border is not a layer boundary, so it is not trimmed
+        top = np.where(valid & (top > 0), top + margin, np.where(valid, top, 0))
+        bottom = np.where(valid & (bottom < H), bottom - margin, np.where(valid, bottom, 0))
+        masks[name] = (rows >= top) & (rows < bottom) & valid
+    return masks
+
+
+def region_histograms(image: np.ndarray, masks: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """256-bin histograms of an 8-bit image inside each mask."""
+    return {name: np.bincount(image[mask], minlength=256) for name, mask in masks.items()}
+
+
+def _image_masks(path, shape, rects, positions, margin, layer_names):
+    if positions is not None:
+        return band_masks(positions, shape, margin, layer_names)
+    per_image = rects.get("images", {}).get(os.path.basename(path))
+    layer_rects = per_image if per_image is not None else rects.get("default", rects)
+    return {name: rect_mask(shape, r) for name, r in layer_rects.items() if name != "images"}
+
+
+def _fit_entry(counts, n_boot, ci, rng):
+    shape, scale = histogram_mle(counts)
+    entry = {"shape": shape, "scale": scale, "n_pixels": int(counts[1:].sum())}
+    if n_boot > 0:
+        shape_ci, scale_ci = bootstrap_gamma_ci(counts, n_boot, ci, rng)
+        entry["shape_ci"], entry["scale_ci"] = list(shape_ci), list(scale_ci)
+    return entry
+
+
+def _fit_image(idx, path, rects, positions, margin, layer_names, n_boot, ci, seed):
+    image = np.asarray(Image.open(path).convert("L"))
+    hists = region_histograms(image, _image_masks(path, image.shape, rects, positions, margin, layer_names))
+    fits = {}
+    for layer_idx, (name, counts) in enumerate(hists.items()):
+        rng = np.random.default_rng([seed, idx, layer_idx])
+        try:
+            fits[name] = _fit_entry(counts, n_boot, ci, rng)
+        except ValueError as e:
+            print(f"  {os.path.basename(path)}/{name}: {e}")
+    return path, hists, fits
+
+
+def batch_estimate(image_paths: Sequence[str], rects: Optional[Dict[str, Any]] = None,
+                   positions: Optional[List[Dict[str, Any]]] = None, margin: int = 2, n_boot: int = 1000,
+                   ci: float = 0.95, seed: int = 0, workers: Optional[int] = None,
+                   layer_names=None) -> Dict[str, Any]:
+    """Fit every layer region of every image and pool them per layer.
+
+    Give either `rects` ({layer: [x, y, w, h]}, optionally {"default": {...},
+    "images": {basename: {...}}} for per-image rectangles) or `positions` (a
+    layer_positions.json list, regions from band_masks). Returns the consolidated dict
+    described in the module docstring; bootstrap draws are seeded per (image, layer).
+    """
+    if (rects is None) == (positions is None):
+        raise ValueError("Give exactly one of rects or positions")
+    if layer_names is None:
+        layer_names = LAYER_NAMES
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_fit_image, idx, path, rects, positions, margin, layer_names, n_boot, ci, seed)
+                   for idx, path in enumerate(image_paths)]
+        for done, fut in enumerate(futures, start=1):
+            results.append(fut.result())
+            print(f"  {done}/{len(futures)} images fitted")
+
+    out = {}
+    layer_order = [n for n in layer_names if any(n in hists for _, hists, _ in results)]
+    layer_order += sorted({n for _, hists, _ in results for n in hists} - set(layer_order))
+    for layer_idx, name in enumerate(layer_order):
+        per_image = {os.path.basename(p): fits[name] for p, _, fits in results if name in fits}
+        counts = np.stack([hists[name] for _, hists, _ in results if name in hists])
+        try:
+            entry = _fit_entry(counts.sum(axis=0), 0, ci, None)
+        except ValueError as e:
+            print(f"  {name}: no pooled fit ({e})")
+            continue
+        if n_boot > 0:
+            rng = np.random.default_rng([seed, len(image_paths), layer_idx])
+            if len(counts) > 1:
+                shape_ci, scale_ci = bootstrap_pooled_ci(counts, n_boot, ci, rng)
+            else:
+                shape_ci, scale_ci = bootstrap_gamma_ci(counts[0], n_boot, ci, rng)
+            entry["shape_ci"], entry["scale_ci"] = list(shape_ci), list(scale_ci)
+        entry["n_images"] = len(per_image)
+        entry["per_image"] = per_image
+        out[name] = entry
+    return out
+
+
+def write_parameters(params: Dict[str, Any], path: str):
+    """Write the consolidated parameters JSON atomically."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=4)
+    os.replace(tmp, path)
@@ -1,5 +1,8 @@
 import numpy as np
-from PIL import Image, ImageTk
+from PIL import Image
+
+# label value for pixels no layer covers
+UNLABELED = 255
 
 
 def load_png_as_rgba(path: str, target_width: int = None) -> Image:
@@ -11,69 +14,183 @@ def load_png_as_rgba(path: str, target_width: int = None) -> Image:
     return img
 
 
-def make_background_layer(shape_k: float, scale_theta: float, canvas_w: int, canvas_h: int) -> Image:
-    noise = np.random.gamma(shape_k, scale_theta, size=(canvas_h, canvas_w))
+def load_layer_mask(path: str, target_width: int = None) -> np.ndarray:
+    """Load a layer PNG and return only its alpha channel as a uint8 (h, w) mask."""
+    return np.array(load_png_as_rgba(path, target_width).getchannel("A"))
+
+
+def gamma_noise_plane(shape_k: float, scale_theta: float, size=None, mask: np.ndarray = None, rng=None) -> np.ndarray:
+    """Min-max scaled gamma noise as a uint8 plane.
+
+    With `mask` (bool or alpha array) noise is drawn only for covered pixels and the
+    rest of the plane is 0; otherwise a full plane of `size` (h, w) is drawn.
+    """
+    gen = np.random if rng is None else rng
+    if mask is None:
+        noise = gen.gamma(shape_k, scale_theta, size=size)
+        noise = (noise - noise.min()) / max(noise.max() - noise.min(), 1e-9)
+        return (noise * 255).astype(np.uint8)
+
+    covered = mask if mask.dtype == bool else mask > 0
+    plane = np.zeros(covered.shape, dtype=np.uint8)
+    n = int(np.count_nonzero(covered))
+    if n == 0:
+        return plane
+    noise = gen.gamma(shape_k, scale_theta, size=n)
     noise = (noise - noise.min()) / max(noise.max() - noise.min(), 1e-9)
-    noise = (noise * 255).astype(np.uint8)
-    bg_arr = np.zeros((canvas_h, canvas_w, 4), dtype=np.uint8)
-    for i in range(3):
-        bg_arr[:, :, i] = noise
-    bg_arr[:, :, 3] = 255
-    return Image.fromarray(bg_arr, mode="RGBA")
+    plane[covered] = (noise * 255).astype(np.uint8)
+    return plane
+
+
+def composite_layer(image: np.ndarray, alpha_out: np.ndarray, labels: np.ndarray,
+                    intensity: np.ndarray, alpha: np.ndarray, y: int, label: int):
+    """Alpha-composite one single-channel layer onto (image, alpha_out) in place at row offset y.
+
+    Opaque pixels are copied, partially transparent ones blended like PIL's alpha_composite.
+    labels is set to `label` wherever the layer's alpha is non-zero, so it always holds the
+    topmost covering layer. Parts of the layer outside the canvas are clipped.
+    """
+    H, W = image.shape
+    h, w = alpha.shape
+    top, src_top = max(y, 0), max(-y, 0)
+    rows = min(H - top, h - src_top)
+    cols = min(W, w)
+    if rows <= 0 or cols <= 0:
+        return
+
+    dst = image[top:top + rows, :cols]
+    dst_a = alpha_out[top:top + rows, :cols]
+    src = intensity[src_top:src_top + rows, :cols]
+    a = alpha[src_top:src_top + rows, :cols]
+    if a.dtype == bool:
+        a = a.astype(np.uint8) * 255
+
+    opaque = a == 255
+    dst[opaque] = src[opaque]
+    dst_a[opaque] = 255
 
+    partial = (a > 0) & ~opaque
+    if partial.any():
+        sa = a[partial].astype(np.uint32)
+        # everything scaled by 255: out_a = sa + da * (1 - sa)
+        keep = dst_a[partial].astype(np.uint32) * (255 - sa)
+        out_a = sa * 255 + keep
+        out_c = (src[partial].astype(np.uint32) * sa * 255 + dst[partial].astype(np.uint32) * keep + out_a // 2) // out_a
+        dst[partial] = out_c.astype(np.uint8)
+        dst_a[partial] = ((out_a + 127) // 255).astype(np.uint8)
 
-def fill_layer_with_gamma(layer, shape_k: float, scale_theta: float):
+    labels[top:top + rows, :cols][a > 0] = label
+
+
+def composite_layers(layers, canvas_w: int, canvas_h: int):
+    """Composite single-channel layers in order; returns (image, alpha, labels) uint8 (H, W) planes.
+
+    `layers` yields (intensity, alpha, y, label) tuples: uint8 intensity and bool/uint8 alpha
+    arrays of the same (h, w) shape, the top row on the canvas and the label value for the
+    label map. Pixels no layer covers are 0 in image/alpha and UNLABELED in labels.
+    """
+    image = np.zeros((canvas_h, canvas_w), dtype=np.uint8)
+    alpha_out = np.zeros((canvas_h, canvas_w), dtype=np.uint8)
+    labels = np.full((canvas_h, canvas_w), UNLABELED, dtype=np.uint8)
+    for intensity, alpha, y, label in layers:
+        composite_layer(image, alpha_out, labels, intensity, alpha, int(y), label)
+    return image, alpha_out, labels
+
+
+def to_rgba_image(image: np.ndarray, alpha: np.ndarray = None) -> Image:
+    """Wrap a gray plane (and optional alpha plane) as the RGBA PIL image the GUI and PNGs use."""
+    if alpha is None:
+        alpha = np.full(image.shape, 255, dtype=np.uint8)
+    return Image.fromarray(np.stack([image, image, image, alpha], axis=-1), mode="RGBA")
+
+
+def is_gray_rgba(rgba: np.ndarray) -> bool:
+    """True when the R, G and B channels of an (h, w, 4) array are equal everywhere."""
+    return bool((rgba[:, :, 0] == rgba[:, :, 1]).all() and (rgba[:, :, 1] == rgba[:, :, 2]).all())
+
+
+def layer_plane(rgba: np.ndarray) -> np.ndarray:
+    """uint8 gray intensity of an (h, w, 4) layer: its R channel for gray layers, else the
+    luminance with the weights io_utils.to_gray_uint8 (skimage rgb2gray) uses."""
+    if is_gray_rgba(rgba):
+        return rgba[:, :, 0]
+    rgb = rgba[:, :, :3].astype(np.float64) / 255.0
+    return (rgb @ np.array([0.2125, 0.7154, 0.0721]) * 255).astype(np.uint8)
+
+
+def composite_rgba_layers(layers, canvas_w: int, canvas_h: int):
+    """Composite RGBA layers in order; returns (RGBA PIL image, labels).
+
+    `layers` yields (rgba, y, label) with uint8 (h, w, 4) arrays. When every layer is gray
+    (e.g. filled with gamma noise) they go through composite_layers, which gives the same
+    pixels; otherwise (colour layer PNGs not yet filled) PIL's alpha_composite keeps the
+    colours. labels is the label map of composite_layers either way.
+    """
+    layers = list(layers)
+    if all(is_gray_rgba(rgba) for rgba, _, _ in layers):
+        image, alpha, labels = composite_layers(((rgba[:, :, 0], rgba[:, :, 3], y, label)
+                                                 for rgba, y, label in layers), canvas_w, canvas_h)
+        return to_rgba_image(image, alpha), labels
+
+    comp = Image.new("RGBA", (canvas_w, canvas_h), (0, 0, 0, 0))
+    for rgba, y, _ in layers:
+        img = Image.fromarray(np.ascontiguousarray(rgba), mode="RGBA")
+        if y >= 0:
+            if y < canvas_h:
+                comp.alpha_composite(img, dest=(0, y))
+        elif -y < img.height:
+            comp.alpha_composite(img, dest=(0, 0), source=(0, -y))
+    # the label map only depends on the alpha channels
+    _, _, labels = composite_layers(((rgba[:, :, 3], rgba[:, :, 3], y, label) for rgba, y, label in layers),
+                                    canvas_w, canvas_h)
+    return comp, labels
+
+
+def make_background_layer(shape_k: float, scale_theta: float, canvas_w: int, canvas_h: int, rng=None) -> Image:
+    return to_rgba_image(gamma_noise_plane(shape_k, scale_theta, size=(canvas_h, canvas_w), rng=rng))
+
+
+def fill_layer_with_gamma(layer, shape_k: float, scale_theta: float, rng=None):
     """Fill a LayerItem (or PIL image) with gamma noise preserving alpha.
 
-    If `layer` has attributes `original_image`, `pil_image`, `tk_image` it will update them in-place.
+    If `layer` is LayerItem-like its pil_image is replaced in place (via set_image when
+    available); the GUI rebuilds the PhotoImage when it next draws the layer.
     Otherwise it returns a PIL Image with the filled data.
+    `rng` is an optional np.random.Generator; the global NumPy RNG is used when omitted.
+    Noise is only drawn for pixels the layer covers. No Tk calls are made.
     """
     # accept either a LayerItem-like or a PIL Image
     try:
-        arr = np.array(layer.original_image)
+        alpha = layer.alpha if hasattr(layer, "alpha") else np.array(layer.original_image.getchannel("A"))
     except Exception:
         # assume layer is a PIL.Image
-        arr = np.array(layer)
+        alpha = np.array(layer.getchannel("A"))
 
-    alpha = arr[:, :, 3]
-    mask = alpha > 0
-    if not mask.any():
+    if not alpha.any():
         # nothing to do
         if hasattr(layer, "pil_image"):
             return
         else:
-            return Image.fromarray(arr, mode="RGBA")
-
-    h, w = mask.shape
-    noise = np.random.gamma(shape_k, scale_theta, size=(h, w))
-    noise = (noise - noise.min()) / max(noise.max() - noise.min(), 1e-9)
-    noise = (noise * 255).astype(np.uint8)
+            return to_rgba_image(np.zeros_like(alpha), alpha)
 
-    out = np.zeros_like(arr)
-    for i in range(3):
-        out[:, :, i] = noise
-    out[:, :, 3] = alpha
-    out_img = Image.fromarray(out, mode="RGBA")
+    out_img = to_rgba_image(gamma_noise_plane(shape_k, scale_theta, mask=alpha, rng=rng), alpha)
 
     if hasattr(layer, "pil_image"):
-        layer.pil_image = out_img
-        # update tk image lazily; GUI should recreate ImageTk.PhotoImage when needed
-        layer.tk_image = ImageTk.PhotoImage(layer.pil_image)
+        if hasattr(layer, "set_image"):
+            layer.set_image(out_img)
+        else:
+            layer.pil_image = out_img
+            layer.tk_image = None
         return
 
     return out_img
 
 
-def gamma_noise_image(shape_k: float, scale_theta: float, width: int, height: int) -> Image:
-    noise = np.random.gamma(shape_k, scale_theta, size=(height, width))
-    noise = (noise - noise.min()) / max(noise.max() - noise.min(), 1e-9)
-    noise = (noise * 255).astype(np.uint8)
-    img_arr = np.stack([noise] * 3 + [np.full((height, width), 255, dtype=np.uint8)], axis=-1)
-    return Image.fromarray(img_arr, mode="RGBA")
+def gamma_noise_image(shape_k: float, scale_theta: float, width: int, height: int, rng=None) -> Image:
+    return to_rgba_image(gamma_noise_plane(shape_k, scale_theta, size=(height, width), rng=rng))
 
 
 def create_rotated_image(upper_params, lower_params, angle: float, expanded_size: int, img_size: int):
-    from PIL import Image
     img = Image.new("RGBA", (expanded_size, expanded_size))
     upper = gamma_noise_image(upper_params["shape"], upper_params["scale"], expanded_size, expanded_size // 2)
     img.paste(upper, (0, 0))
@@ -83,4 +200,3 @@ def create_rotated_image(upper_params, lower_params, angle: float, expanded_size
     left = (expanded_size - img_size) // 2
     upper_crop = (expanded_size - img_size) // 2
     return rotated.crop((left, upper_crop, left + img_size, upper_crop + img_size))
-
@@ -1,8 +1,12 @@
-from PIL import ImageTk
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, List, Optional, TYPE_CHECKING
+import numpy as np
 from PIL.Image import Image as PILImage
 
+if TYPE_CHECKING:
+    # ImageTk imports tkinter; keep it out of headless imports
+    from PIL import ImageTk
+
 
 @dataclass
 class LayerItem:
@@ -11,7 +15,7 @@ class LayerItem:
     y: int = 0
     draggable: bool = True
     original_image: PILImage = None
-    tk_image: Optional[ImageTk.PhotoImage] = None
+    tk_image: Optional["ImageTk.PhotoImage"] = None
     canvas_id: Optional[int] = None
 
     def __init__(self, name: str, pil_image: PILImage, init_y: int = None, y: int = None, draggable: bool = True):
@@ -29,3 +33,65 @@ class LayerItem:
         self.y = int(chosen_y)
         self.canvas_id = None
         self.draggable = bool(draggable)
+        self._alpha = None
+        self._profiles = None
+        # bumped whenever pil_image is replaced, so the GUI knows when tk_image is stale
+        self.version = 0
+        self.tk_version = -1
+        # gamma parameters the current pil_image was filled with (None = not filled)
+        self.filled_params = None
+
+    def set_image(self, pil_image: PILImage):
+        """Replace the displayed image (same size and alpha); the PhotoImage is rebuilt on next draw."""
+        self.pil_image = pil_image
+        self.version += 1
+
+    @property
+    def alpha(self) -> np.ndarray:
+        """(H, W) uint8 alpha mask of the layer, derived once from original_image.
+
+        Gamma refills only replace the intensities, so the mask stays valid for the layer's lifetime.
+        """
+        if self._alpha is None:
+            self._alpha = np.asarray(self.original_image.getchannel("A"))
+        return self._alpha
+
+    @property
+    def profiles(self):
+        """Cached alpha_boundaries(self.alpha), in layer (not canvas) rows."""
+        if self._profiles is None:
+            self._profiles = alpha_boundaries(self.alpha)
+        return self._profiles
+
+
+def alpha_boundaries(alpha: np.ndarray):
+    """First and last covered row of every column of an alpha mask, plus the span between them.
+
+    Returns (upper, lower, thickness) int arrays of length W; columns without any
+    covered pixel get -1 in upper/lower and 0 thickness.
+    """
+    covered = alpha > 0
+    h = covered.shape[0]
+    has_any = covered.any(axis=0)
+    upper = np.where(has_any, covered.argmax(axis=0), -1)
+    lower = np.where(has_any, h - 1 - covered[::-1].argmax(axis=0), -1)
+    thickness = np.where(has_any, lower - upper + 1, 0)
+    return upper, lower, thickness
+
+
+def layer_boundaries(alpha: np.ndarray, y: int, canvas_w: int, profiles=None) -> Dict[str, List[Optional[int]]]:
+    """Canvas-space boundary profiles of a layer mask placed at row `y`.
+
+    `profiles` may pass precomputed alpha_boundaries(alpha) (e.g. LayerItem.profiles).
+    Returns lists of length canvas_w under 'upper_boundary_px', 'lower_boundary_px' and
+    'thickness_px'; columns the layer does not cover are None (thickness 0), matching the
+    layer_positions.json format.
+    """
+    upper, lower, thickness = alpha_boundaries(alpha) if profiles is None else profiles
+    n = min(len(upper), canvas_w)
+    pad = [None] * (canvas_w - n)
+    return {
+        "upper_boundary_px": [None if u < 0 else int(u + y) for u in upper[:n].tolist()] + pad,
+        "lower_boundary_px": [None if b < 0 else int(b + y) for b in lower[:n].tolist()] + pad,
+        "thickness_px": thickness[:n].tolist() + [0] * (canvas_w - n),
+    }
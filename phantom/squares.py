@@ -0,0 +1,315 @@
+"""Synthetic two-layer square images for detector experiments.
+
+Samples are generated in memory as uint8 grayscale arrays together with their exact
+single-pixel boundary ground truth and the parameters that produced them, so they can
+be fed straight into `williams_2014_edge_detection.process_image` without a PNG round
+trip. Writing to disk is optional (`write_dir`).
+"""
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .image_utils import gamma_noise_plane
+
+IMG_SIZE = 512
+
+# (upper, lower) layer pairs in retinal order
+LAYER_PAIRS = [
+    ("background", "NFL"),
+    ("NFL", "GCL"),
+    ("GCL", "IPL"),
+    ("IPL", "INL"),
+    ("INL", "OPL"),
+    ("OPL", "ONL"),
+    ("ONL", "ELM"),
+    ("ELM", "OPR"),
+    ("OPR", "RPE"),
+]
+
+
+@dataclass
+class LayerPairSample:
+    name: str
+    image: np.ndarray
+    gt: np.ndarray
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def horizontal_pair(upper_params, lower_params, img_size: int = IMG_SIZE, rng=None) -> np.ndarray:
+    """Square uint8 image: upper layer noise in rows [0, size//2), lower layer noise below."""
+    upper = gamma_noise_plane(upper_params["shape"], upper_params["scale"], size=(img_size // 2, img_size), rng=rng)
+    lower = gamma_noise_plane(lower_params["shape"], lower_params["scale"], size=(img_size - img_size // 2, img_size), rng=rng)
+    return np.vstack([upper, lower])
+
+
+def horizontal_gt(img_size: int = IMG_SIZE) -> np.ndarray:
+    """Ground truth for horizontal_pair: single-pixel edge on row size//2 (first lower-layer row)."""
+    gt = np.zeros((img_size, img_size), dtype=np.uint8)
+    gt[img_size // 2, :] = 1
+    return gt
+
+
+def boundary_center(img_size: int) -> float:
+    """Row (and column) coordinate the boundary passes through at offset 0.
+
+    It lies between rows size//2 - 1 and size//2, where horizontal_pair switches layers, so
+    at angle 0 the first lower-layer row is size//2 for odd sizes too, as in horizontal_gt
+    and the detector's default ground truth.
+    """
+    return img_size // 2 - 0.5
+
+
+def boundary_distance(img_size: int, angles, offset: float = 0.0, subpixel=(0.0, 0.0)) -> np.ndarray:
+    """Signed distance of every pixel centre to the layer boundary, shape (n_angles, size, size).
+
+    The boundary is the horizontal line through boundary_center rotated counter-clockwise by each angle
+    (degrees, same convention as PIL's Image.rotate) and shifted by `offset` pixels
+    along its normal. Positive distances lie in the lower layer.
+    """
+    theta = np.deg2rad(np.atleast_1d(np.asarray(angles, dtype=float)))[:, None, None]
+    c = boundary_center(img_size)
+    coords = np.arange(img_size, dtype=float) - c
+    ys = coords[:, None] + subpixel[0]
+    xs = coords[None, :] + subpixel[1]
+    return xs * np.sin(theta) + ys * np.cos(theta) - offset
+
+
+def lower_coverage(img_size: int, angles, offset: float = 0.0, supersample: int = 1) -> np.ndarray:
+    """Fraction of each pixel lying in the lower layer, shape (n_angles, size, size), float32.
+
+    supersample=1 gives a hard 0/1 edge decided at pixel centres; supersample=k averages a
+    k x k grid of sub-pixel samples for anti-aliased boundary pixels.
+    """
+    if supersample <= 1:
+        return (boundary_distance(img_size, angles, offset) > 0).astype(np.float32)
+    steps = (np.arange(supersample) + 0.5) / supersample - 0.5
+    cov = np.zeros((len(np.atleast_1d(angles)), img_size, img_size), dtype=np.float32)
+    for dy in steps:
+        for dx in steps:
+            cov += boundary_distance(img_size, angles, offset, subpixel=(dy, dx)) > 0
+    cov /= supersample * supersample
+    return cov
+
+
+def boundary_gt(img_size: int, angles, offset: float = 0.0) -> np.ndarray:
+    """Single-pixel boundary ground truth per angle, shape (n_angles, size, size), uint8.
+
+    Marks the first lower-layer pixel along the boundary normal's dominant axis, so the
+    line is 8-connected and one pixel thick; at angle 0 this is row size//2 as in horizontal_gt.
+    """
+    theta = np.deg2rad(np.atleast_1d(np.asarray(angles, dtype=float)))[:, None, None]
+    step = np.maximum(np.abs(np.sin(theta)), np.abs(np.cos(theta)))
+    d = boundary_distance(img_size, angles, offset)
+    return ((d > 0) & (d <= step)).astype(np.uint8)
+
+
+def rotated_pairs(upper_params, lower_params, angles, img_size: int = IMG_SIZE, offset: float = 0.0,
+                  supersample: int = 1, rng=None) -> np.ndarray:
+    """Batch of two-layer squares with the boundary at each angle; returns (n_angles, size, size) uint8.
+
+    Every output pixel is assigned to the upper or lower layer analytically from its signed
+    distance to the boundary, so unlike create_rotated_image nothing is rotated, resampled
+    or cropped and gamma noise is drawn only for the output pixels of each layer.
+    Anti-aliased boundary pixels (supersample > 1) blend both layers by coverage.
+    `rng` may also be a list with one Generator per angle, making each image independently reproducible.
+    """
+    cov = lower_coverage(img_size, angles, offset, supersample)
+    rngs = rng if isinstance(rng, (list, tuple)) else [rng] * len(cov)
+    images = np.empty(cov.shape, dtype=np.uint8)
+    for k, c in enumerate(cov):
+        upper = gamma_noise_plane(upper_params["shape"], upper_params["scale"], mask=c < 1, rng=rngs[k])
+        lower = gamma_noise_plane(lower_params["shape"], lower_params["scale"], mask=c > 0, rng=rngs[k])
+        images[k] = np.rint(upper * (1.0 - c) + lower * c).astype(np.uint8)
+    return images
+
+
+def _write_sample(sample: LayerPairSample, write_dir: str) -> str:
+    os.makedirs(write_dir, exist_ok=True)
+    path = os.path.join(write_dir, f"{sample.name}.png")
+    # PNG is lossless and "L" keeps the single gray channel as is
+    Image.fromarray(sample.image, mode="L").save(path)
+    return path
+
+
+def iter_layer_pairs(gamma_params: Dict[str, Any], pairs: Sequence[Tuple[str, str]] = LAYER_PAIRS,
+                     img_size: int = IMG_SIZE, seed: int = 0, replicates: int = 1,
+                     write_dir: Optional[str] = None, angles: Optional[Sequence[float]] = None,
+                     supersample: int = 1) -> Iterator[LayerPairSample]:
+    """Yield one two-layer sample per (pair, replicate[, angle]).
+
+    Each (pair, replicate) has its own RNG seeded from (seed, pair index, replicate), so any
+    subset can be regenerated exactly. Without `angles` the boundary is horizontal; with
+    `angles` a batch of rotated boundaries is generated analytically (see rotated_pairs).
+    With write_dir every image is also saved as <pair_idx>_<upper>_<lower>[_r<rep>][_a<angle>].png.
+    """
+    for pair_idx, (upper, lower) in enumerate(pairs):
+        for rep in range(replicates):
+            rng = np.random.default_rng([seed, pair_idx, rep])
+            if angles is None:
+                batch = [(None, horizontal_pair(gamma_params[upper], gamma_params[lower], img_size, rng),
+                          horizontal_gt(img_size))]
+            else:
+                images = rotated_pairs(gamma_params[upper], gamma_params[lower], angles, img_size,
+                                       supersample=supersample, rng=rng)
+                batch = zip(angles, images, boundary_gt(img_size, angles))
+            for angle, image, gt in batch:
+                name = f"{pair_idx}_{upper}_{lower}" + (f"_r{rep}" if replicates > 1 else "")
+                if angle is not None:
+                    name += f"_a{angle:g}"
+                params = {
+                    "upper": upper,
+                    "lower": lower,
+                    "upper_params": dict(gamma_params[upper]),
+                    "lower_params": dict(gamma_params[lower]),
+                    "img_size": img_size,
+                    "angle": 0.0 if angle is None else float(angle),
+                    "seed": [seed, pair_idx, rep],
+                }
+                sample = LayerPairSample(name, image, gt.copy(), params)
+                if write_dir is not None:
+                    params["path"] = _write_sample(sample, write_dir)
+                yield sample
+
+
+def gamma_sweep(base_params: Dict[str, Any], layer: str, shapes: Optional[Iterable[float]] = None,
+                scales: Optional[Iterable[float]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield copies of base_params with `layer`'s shape/scale replaced by every grid combination.
+
+    Omitted axes keep the base value, so gamma_sweep(p, "NFL", shapes=[2, 4, 8]) varies shape only.
+    """
+    base = base_params[layer]
+    shapes = [base["shape"]] if shapes is None else list(shapes)
+    scales = [base["scale"]] if scales is None else list(scales)
+    for shape, scale in itertools.product(shapes, scales):
+        params = dict(base_params)
+        params[layer] = {"shape": float(shape), "scale": float(scale)}
+        yield params
+
+
+def boundary_geometry(img_size: int, angle: float, offset: float = 0.0) -> Dict[str, Any]:
+    """Exact boundary line of a rotated pair in pixel coordinates (x = column, y = row).
+
+    Points p on the line satisfy dot(p - center, normal) == offset; `endpoints` are where
+    the line leaves the image square [-0.5, size - 0.5]^2.
+    """
+    theta = np.deg2rad(angle)
+    nx, ny = float(np.sin(theta)), float(np.cos(theta))
+    c = boundary_center(img_size)
+    lo, hi = -0.5 - c, img_size - 0.5 - c
+    # intersect x*nx + y*ny = offset with the four borders (relative to the centre)
+    pts = []
+    for x in (lo, hi):
+        if abs(ny) > 1e-12:
+            y = (offset - x * nx) / ny
+            if lo - 1e-9 <= y <= hi + 1e-9:
+                pts.append((x, y))
+    for y in (lo, hi):
+        if abs(nx) > 1e-12:
+            x = (offset - y * ny) / nx
+            if lo - 1e-9 <= x <= hi + 1e-9:
+                pts.append((x, y))
+    uniq = []
+    for x, y in pts:
+        if all(abs(x - ux) > 1e-9 or abs(y - uy) > 1e-9 for ux, uy in uniq):
+            uniq.append((x, y))
+    return {
+        "angle": float(angle),
+        "offset": float(offset),
+        "center": [c, c],
+        "normal": [nx, ny],
+        "endpoints": [[x + c, y + c] for x, y in uniq[:2]],
+    }
+
+
+def square_filename(pair_idx: int, upper: str, lower: str, angle: float, offset: float, rep: int) -> str:
+    return f"{pair_idx}_{upper}_{lower}_a{angle:g}_o{offset:g}_r{rep}.png"
+
+
+def _generate_square_batch(out_dir, task):
+    """Worker: generate all angles of one (pair, offset, replicate) and write them; returns manifest entries."""
+    entries = {}
+    rngs = [np.random.default_rng(u["seed"]) for u in task["units"]]
+    # the jitter draw always happens first, so the noise does not depend on whether jitter is used
+    angles = [u["params"]["angle"] + r.uniform(-1.0, 1.0) * u["params"]["jitter"] for u, r in zip(task["units"], rngs)]
+    p = task["units"][0]["params"]
+    images = rotated_pairs(p["upper_params"], p["lower_params"], angles, p["img_size"], p["offset"],
+                           p["supersample"], rng=rngs)
+    for u, angle, image in zip(task["units"], angles, images):
+        Image.fromarray(image, mode="L").save(os.path.join(out_dir, u["file"]))
+        entries[u["file"]] = {"params": u["params"], "seed": u["seed"],
+                              "boundary": boundary_geometry(p["img_size"], angle, p["offset"])}
+    return entries
+
+
+def _json_normalized(obj):
+    return json.loads(json.dumps(obj))
+
+
+def generate_square_set(out_dir: str, gamma_params: Dict[str, Any], pairs: Sequence[Tuple[str, str]] = LAYER_PAIRS,
+                        angles: Sequence[float] = (0.0,), offsets: Sequence[float] = (0.0,), replicates: int = 1,
+                        seed: int = 0, img_size: int = IMG_SIZE, supersample: int = 1, jitter: float = 0.0,
+                        workers: Optional[int] = None) -> Dict[str, Any]:
+    """Generate the full pairs x angles x offsets x replicates sweep of rotated squares into out_dir.
+
+    Work is fanned out per (pair, offset, replicate) across a process pool; each image has its
+    own seed [seed, pair, angle, offset, replicate] (indices), is written once as a gray PNG and
+    is recorded in out_dir/manifest.json with its parameters and exact boundary geometry (the
+    jittered angle when jitter > 0). Images already on disk with identical parameters and seed
+    in the manifest are skipped, so reruns, and sweeps extended by appending angles, offsets or
+    replicates, only generate what is missing. Returns the manifest dict.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    manifest = {"images": {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    tasks = []
+    n_skipped = 0
+    for pair_idx, (upper, lower) in enumerate(pairs):
+        for off_idx, offset in enumerate(offsets):
+            for rep in range(replicates):
+                units = []
+                for ang_idx, angle in enumerate(angles):
+                    fname = square_filename(pair_idx, upper, lower, angle, offset, rep)
+                    params = _json_normalized({
+                        "upper": upper, "lower": lower,
+                        "upper_params": gamma_params[upper], "lower_params": gamma_params[lower],
+                        "angle": float(angle), "offset": float(offset), "replicate": rep,
+                        "img_size": img_size, "supersample": supersample, "jitter": float(jitter),
+                    })
+                    unit_seed = [seed, pair_idx, ang_idx, off_idx, rep]
+                    old = manifest["images"].get(fname)
+                    if (old is not None and old.get("params") == params and old.get("seed") == unit_seed
+                            and os.path.exists(os.path.join(out_dir, fname))):
+                        n_skipped += 1
+                        continue
+                    units.append({"file": fname, "params": params, "seed": unit_seed})
+                if units:
+                    tasks.append({"units": units})
+
+    n_todo = sum(len(t["units"]) for t in tasks)
+    print(f"Square set: {n_todo} images to generate, {n_skipped} up to date")
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_generate_square_batch, out_dir, task) for task in tasks]
+            done = 0
+            for fut in futures:
+                entries = fut.result()
+                manifest["images"].update(entries)
+                done += len(entries)
+                print(f"  {done}/{n_todo} images")
+
+    manifest["img_size"] = img_size
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, manifest_path)
+    return manifest
@@ -1,7 +1,12 @@
+"""Tangent-angle and curvature analysis of traced SVG layer paths.
+
+All cubic Bezier segments are gathered into one (n_segments, 4) complex array of control
+points (x + iy), so derivatives at every sample of every segment come from a single
+polynomial evaluation instead of one `seg.derivative(t)` call per sample.
+"""
 import math
 import numpy as np
-from svgpathtools import svg2paths
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 
 def angle_of(v) -> float:
@@ -9,38 +14,118 @@ def angle_of(v) -> float:
 
 
 def angles_for_segment(seg, samples: int = 50) -> List[float]:
-    ts = np.linspace(0, 1, samples)
-    return [angle_of(seg.derivative(t)) for t in ts]
+    ctrl = np.array([[seg.start, seg.control1, seg.control2, seg.end]], dtype=complex)
+    return np.degrees(np.angle(bezier_derivatives(ctrl, samples)[0])).tolist()
 
 
 def load_svg_paths(path: str):
+    # svgpathtools is only needed when SVGs are actually read
+    from svgpathtools import svg2paths
     return svg2paths(path)
 
 
+def cubic_control_points(paths) -> np.ndarray:
+    """(n_segments, 4) complex control points of every CubicBezier segment in `paths`."""
+    pts = [(seg.start, seg.control1, seg.control2, seg.end)
+           for path in paths for seg in path if seg.__class__.__name__ == "CubicBezier"]
+    return np.array(pts, dtype=complex).reshape(-1, 4)
+
+
+def _sample_ts(samples: int) -> np.ndarray:
+    return np.linspace(0, 1, samples)
+
+
+def bezier_derivatives(ctrl: np.ndarray, samples: int = 50) -> np.ndarray:
+    """B'(t) at `samples` evenly spaced t in [0, 1] for every segment; (n_segments, samples) complex."""
+    t = _sample_ts(samples)[:, None]
+    # B'(t) = 3 [(1-t)^2 (P1-P0) + 2 t (1-t) (P2-P1) + t^2 (P3-P2)]
+    basis = 3.0 * np.hstack([(1 - t) ** 2, 2 * t * (1 - t), t ** 2])
+    return np.diff(ctrl, axis=1) @ basis.T
+
+
+def bezier_second_derivatives(ctrl: np.ndarray, samples: int = 50) -> np.ndarray:
+    """B''(t) at the same samples as bezier_derivatives; (n_segments, samples) complex."""
+    t = _sample_ts(samples)[:, None]
+    # B''(t) = 6 [(1-t) (P2 - 2 P1 + P0) + t (P3 - 2 P2 + P1)]
+    basis = 6.0 * np.hstack([1 - t, t])
+    return np.diff(ctrl, n=2, axis=1) @ basis.T
+
+
+def segment_angles(ctrl: np.ndarray, samples: int = 50) -> np.ndarray:
+    """Tangent angles in degrees, in [-180, 180), at every sample of every segment."""
+    angles = np.degrees(np.angle(bezier_derivatives(ctrl, samples)))
+    return (angles + 180) % 360 - 180
+
+
+def arc_length_weights(ctrl: np.ndarray, samples: int = 50) -> np.ndarray:
+    """Arc length each sample stands for (trapezoid rule on |B'(t)|); rows sum to segment lengths."""
+    speed = np.abs(bezier_derivatives(ctrl, samples))
+    w = np.full(samples, 1.0 / max(samples - 1, 1))
+    w[[0, -1]] *= 0.5
+    return speed * w
+
+
+def curvature(ctrl: np.ndarray, samples: int = 50) -> np.ndarray:
+    """Signed curvature Im(conj(B') B'') / |B'|^3 at every sample; NaN where the tangent vanishes."""
+    d1 = bezier_derivatives(ctrl, samples)
+    d2 = bezier_second_derivatives(ctrl, samples)
+    speed = np.abs(d1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = (np.conj(d1) * d2).imag / speed ** 3
+    k[speed < 1e-12] = np.nan
+    return k
+
+
+def angle_histogram(ctrl: np.ndarray, bins: int = 36, samples: int = 50, axial: bool = False):
+    """Arc-length-weighted histogram of tangent angles, normalised to sum to 1.
+
+    With axial=True directions are folded to [-90, 90), treating a boundary traced left
+    to right and right to left alike (what an orientation prior needs).
+    Returns (hist, bin_edges).
+    """
+    angles = segment_angles(ctrl, samples)
+    lo, hi = (-90.0, 90.0) if axial else (-180.0, 180.0)
+    if axial:
+        angles = (angles + 90) % 180 - 90
+    hist, edges = np.histogram(angles, bins=bins, range=(lo, hi), weights=arc_length_weights(ctrl, samples))
+    total = hist.sum()
+    return (hist / total if total > 0 else hist), edges
+
+
+def curvature_stats(ctrl: np.ndarray, samples: int = 50) -> Dict[str, float]:
+    """Summary of |curvature| over all samples (plain and arc-length weighted) and total length."""
+    k = np.abs(curvature(ctrl, samples))
+    w = arc_length_weights(ctrl, samples)
+    ok = np.isfinite(k)
+    kv, wv = k[ok], w[ok]
+    if kv.size == 0:
+        return {"n_segments": int(len(ctrl)), "length": float(w.sum()), "mean_abs": float("nan"),
+                "weighted_mean_abs": float("nan"), "median_abs": float("nan"), "p95_abs": float("nan"),
+                "max_abs": float("nan")}
+    return {
+        "n_segments": int(len(ctrl)),
+        "length": float(w.sum()),
+        "mean_abs": float(kv.mean()),
+        "weighted_mean_abs": float((kv * wv).sum() / wv.sum()) if wv.sum() > 0 else float("nan"),
+        "median_abs": float(np.median(kv)),
+        "p95_abs": float(np.percentile(kv, 95)),
+        "max_abs": float(kv.max()),
+    }
+
+
 def collect_cubic_angles(paths, samples: int = 50):
-    all_angles = []
-    for path in paths:
-        for seg in path:
-            if seg.__class__.__name__ == "CubicBezier":
-                all_angles.extend(angles_for_segment(seg, samples=samples))
-    # can we normalize having angles only in [-180, 180] range
-    all_angles = [(a + 180) % 360 - 180 for a in all_angles]
-    return all_angles
+    # angles are normalised to the [-180, 180) range
+    return segment_angles(cubic_control_points(paths), samples).ravel().tolist()
 
 
 if __name__ == "__main__":
     paths, attrs = load_svg_paths("other_files/layer_paths.svg")
-    angles = collect_cubic_angles(paths)
-    print("Min angle:", min(angles))
-    print("Max angle:", max(angles))
-
-
-
-
-
-
-
-
-
-
-
+    ctrl = cubic_control_points(paths)
+    angles = segment_angles(ctrl)
+    print("Min angle:", angles.min())
+    print("Max angle:", angles.max())
+    hist, edges = angle_histogram(ctrl, axial=True)
+    print("Axial angle histogram (arc-length weighted):")
+    for h, e0, e1 in zip(hist, edges[:-1], edges[1:]):
+        print(f"  [{e0:6.1f}, {e1:6.1f}): {h:.4f}")
+    print("Curvature:", curvature_stats(ctrl))
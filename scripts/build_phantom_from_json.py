@@ -9,13 +9,17 @@ Defaults:
 
 The script uses `phantom.config` for canvas size, PNG file list and gamma parameters and
 `phantom.image_utils` to load and fill layers with gamma noise. It composites layers in the
-order defined by `LAYER_NAMES` so background should be first.
+order defined by `LAYER_NAMES` so background should be first. Filled (gray) layers are composited
+as single uint8 gray planes; unfilled colour layers keep their colours. `--labels-out`
+additionally saves the per-pixel layer index map (index into `LAYER_NAMES`, 255 where nothing
+is drawn).
 """
 from __future__ import annotations
 import json
 import argparse
 import sys
 from pathlib import Path
+import numpy as np
 from PIL import Image
 from typing import List, Dict, Any
 
@@ -25,7 +29,8 @@ if str(proj_root) not in sys.path:
     sys.path.insert(0, str(proj_root))
 
 from phantom.config import CANVAS_W, CANVAS_H, PNG_FILES, LAYER_NAMES, load_gamma_parameters
-from phantom.image_utils import load_png_as_rgba, make_background_layer, fill_layer_with_gamma
+from phantom.image_utils import (load_png_as_rgba, gamma_noise_plane, composite_layers, composite_rgba_layers,
+                                 layer_plane, to_rgba_image)
 
 
 def load_positions(path: Path) -> List[Dict[str, Any]]:
@@ -33,37 +38,32 @@ def load_positions(path: Path) -> List[Dict[str, Any]]:
         return json.load(f)
 
 
-def build_phantom_from_positions(positions: List[Dict[str, Any]], canvas_w: int, canvas_h: int,
-                                 png_files: List[str], layer_names: List[str], gamma_params: Dict[str, Any]) -> Image.Image:
-    """Return a composite PIL Image (RGBA) created from the positions list.
+def phantom_layers(positions: List[Dict[str, Any]], canvas_w: int, canvas_h: int,
+                   png_files: List[str], layer_names: List[str], gamma_params: Dict[str, Any]):
+    """Yield (rgba, y, label) for every layer, background first; label indexes layer_names.
 
-    positions is a list of dicts with at least keys: 'name', 'y'.
-    gamma_params maps layer name -> {'shape':..., 'scale':...}
-    png_files corresponds (in order) to layer_names[1:] (i.e. all layers except background)
+    Layers with gamma parameters are filled with gray gamma noise; the others keep the
+    colours of their PNG. See build_phantom_from_positions for the inputs.
     """
     # map names to position entries
     pos_by_name = {p['name']: p for p in positions if 'name' in p}
 
-    # Create blank canvas
-    comp = Image.new("RGBA", (canvas_w, canvas_h), (0, 0, 0, 0))
-
     # background first
     bg_params = gamma_params.get('background') if gamma_params else None
     if bg_params:
-        bg = make_background_layer(bg_params.get('shape', 1.0), bg_params.get('scale', 1.0), canvas_w, canvas_h)
-        comp.alpha_composite(bg, dest=(0, 0))
-    else:
-        # leave transparent background if no params
-        pass
+        noise = gamma_noise_plane(bg_params.get('shape', 1.0), bg_params.get('scale', 1.0), size=(canvas_h, canvas_w))
+        yield np.asarray(to_rgba_image(noise)), 0, 0
+    # else leave transparent background if no params
 
-    # For each non-background layer in order, load the PNG, place it at y, fill with gamma if possible and composite
-    for png_rel, layer_name in zip(png_files, layer_names[1:]):
+    # For each non-background layer in order, load the PNG, place it at y, fill with gamma if possible
+    for label, (png_rel, layer_name) in enumerate(zip(png_files, layer_names[1:]), start=1):
         try:
-            img = load_png_as_rgba(png_rel, target_width=canvas_w)
+            rgba = np.asarray(load_png_as_rgba(png_rel, target_width=canvas_w))
         except Exception as e:
             print(f"Warning: could not load PNG for layer '{layer_name}' from '{png_rel}': {e}")
-            # create a transparent placeholder
-            img = Image.new("RGBA", (canvas_w, canvas_h), (0, 0, 0, 0))
+            # a transparent placeholder draws nothing
+            continue
+        alpha = rgba[:, :, 3]
 
         entry = pos_by_name.get(layer_name)
         y = int(entry.get('y', 0)) if entry is not None and 'y' in entry else 0
@@ -72,25 +72,48 @@ def build_phantom_from_positions(positions: List[Dict[str, Any]], canvas_w: int,
         params = gamma_params.get(layer_name) if gamma_params else None
         if params:
             try:
-                img_filled = fill_layer_with_gamma(img, params.get('shape', 1.0), params.get('scale', 1.0))
-                # fill_layer_with_gamma returns an Image when given a PIL.Image
-                if img_filled is not None:
-                    img = img_filled
+                noise = gamma_noise_plane(params.get('shape', 1.0), params.get('scale', 1.0), mask=alpha)
+                rgba = np.asarray(to_rgba_image(noise, alpha))
             except Exception as e:
                 print(f"Warning: could not fill layer '{layer_name}' with gamma: {e}")
 
         # clip y to reasonable range to avoid errors
-        if y < -img.height + 1:
-            y = -img.height + 1
+        if y < -alpha.shape[0] + 1:
+            y = -alpha.shape[0] + 1
         if y > canvas_h - 1:
             y = canvas_h - 1
+        yield rgba, y, label
 
-        try:
-            comp.alpha_composite(img, dest=(0, y))
-        except Exception as e:
-            print(f"Warning: failed to composite layer '{layer_name}' at y={y}: {e}")
 
-    return comp
+def build_phantom_arrays(positions: List[Dict[str, Any]], canvas_w: int, canvas_h: int,
+                         png_files: List[str], layer_names: List[str], gamma_params: Dict[str, Any]):
+    """Return (image, alpha, labels) uint8 planes composited from the positions list.
+
+    Unfilled colour layers are converted to gray by luminance (phantom.image_utils.layer_plane).
+    labels holds the index in layer_names of the topmost layer at each pixel
+    (UNLABELED where nothing is drawn). See build_phantom_from_positions for the inputs.
+    """
+    layers = phantom_layers(positions, canvas_w, canvas_h, png_files, layer_names, gamma_params)
+    return composite_layers(((layer_plane(rgba), rgba[:, :, 3], y, label) for rgba, y, label in layers),
+                            canvas_w, canvas_h)
+
+
+def build_phantom_with_labels(positions: List[Dict[str, Any]], canvas_w: int, canvas_h: int,
+                              png_files: List[str], layer_names: List[str], gamma_params: Dict[str, Any]):
+    """Return (composite RGBA image, labels); see build_phantom_from_positions."""
+    layers = phantom_layers(positions, canvas_w, canvas_h, png_files, layer_names, gamma_params)
+    return composite_rgba_layers(layers, canvas_w, canvas_h)
+
+
+def build_phantom_from_positions(positions: List[Dict[str, Any]], canvas_w: int, canvas_h: int,
+                                 png_files: List[str], layer_names: List[str], gamma_params: Dict[str, Any]) -> Image.Image:
+    """Return a composite PIL Image (RGBA) created from the positions list.
+
+    positions is a list of dicts with at least keys: 'name', 'y'.
+    gamma_params maps layer name -> {'shape':..., 'scale':...}
+    png_files corresponds (in order) to layer_names[1:] (i.e. all layers except background)
+    """
+    return build_phantom_with_labels(positions, canvas_w, canvas_h, png_files, layer_names, gamma_params)[0]
 
 
 def main():
@@ -98,6 +121,7 @@ def main():
     parser.add_argument("--json", type=str, default="json_outputs/layer_positions.json", help="Path to positions JSON")
     parser.add_argument("--gamma", type=str, default="json_outputs/gamma_parameters.json", help="Path to gamma parameters JSON")
     parser.add_argument("--out", type=str, default="phantom_from_json.png", help="Output composite PNG path")
+    parser.add_argument("--labels-out", type=str, default=None, help="Optional PNG path for the per-pixel layer label map")
     parser.add_argument("--canvas-w", type=int, default=CANVAS_W)
     parser.add_argument("--canvas-h", type=int, default=CANVAS_H)
     args = parser.parse_args()
@@ -124,13 +148,19 @@ def main():
             print(f"Failed to load gamma parameters from {gamma_path}: {e}")
             gamma = {}
 
-    comp = build_phantom_from_positions(positions, args.canvas_w, args.canvas_h, PNG_FILES, LAYER_NAMES, gamma)
+    comp, labels = build_phantom_with_labels(positions, args.canvas_w, args.canvas_h, PNG_FILES, LAYER_NAMES, gamma)
 
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     comp.save(out_path)
     print(f"Saved composite to {out_path}")
 
+    if args.labels_out:
+        labels_path = Path(args.labels_out)
+        labels_path.parent.mkdir(parents=True, exist_ok=True)
+        Image.fromarray(labels, mode="L").save(labels_path)
+        print(f"Saved label map to {labels_path}")
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,60 @@
+"""Generate a dataset of randomized phantoms with per-pixel layer labels.
+
+Usage:
+  python scripts/generate_phantom_dataset.py --n 1000 --out phantom_dataset
+
+Defaults:
+  json : json_outputs/layer_positions.json
+  gamma: gamma_parameters.json resolved by `phantom.config.load_gamma_parameters`
+
+Each sample shifts every layer by a random offset of at most --max-offset pixels and is
+seeded from (--seed, sample index), so reruns reproduce the dataset exactly.
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# ensure project root is importable so `from phantom ...` works when running this script
+proj_root = Path(__file__).resolve().parents[1]
+if str(proj_root) not in sys.path:
+    sys.path.insert(0, str(proj_root))
+
+from phantom.config import CANVAS_W, CANVAS_H, load_gamma_parameters
+from phantom.dataset import generate_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a randomized phantom dataset")
+    parser.add_argument("--n", type=int, required=True, help="Number of phantoms")
+    parser.add_argument("--out", type=str, default="phantom_dataset", help="Output dataset directory")
+    parser.add_argument("--json", type=str, default="json_outputs/layer_positions.json", help="Base positions JSON")
+    parser.add_argument("--gamma", type=str, default=None, help="Gamma parameters JSON (default: load_gamma_parameters())")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-offset", type=int, default=10, help="Max per-layer vertical offset in pixels")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--canvas-w", type=int, default=CANVAS_W)
+    parser.add_argument("--canvas-h", type=int, default=CANVAS_H)
+    args = parser.parse_args()
+
+    json_path = Path(args.json)
+    if not json_path.exists():
+        print(f"Positions JSON not found: {json_path}")
+        return
+    with json_path.open("r", encoding="utf-8") as f:
+        positions = json.load(f)
+
+    if args.gamma:
+        with open(args.gamma, "r", encoding="utf-8") as f:
+            gamma = json.load(f)
+    else:
+        gamma = load_gamma_parameters()
+
+    manifest = generate_dataset(args.out, args.n, positions, gamma, seed=args.seed, max_offset=args.max_offset,
+                                canvas_w=args.canvas_w, canvas_h=args.canvas_h, workers=args.workers)
+    print(f"Saved dataset manifest to {manifest}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,66 +1,61 @@
-import os
-import json
-from PIL import Image
-from phantom.image_utils import gamma_noise_image, create_rotated_image
-
-IMG_SIZE = 512
-EXPANDED_SIZE = 1024
-
-PAIRS = [
-    ("background", "NFL"),
-    ("NFL", "GCL"),
-    ("GCL", "IPL"),
-    ("IPL", "INL"),
-    ("INL", "OPL"),
-    ("OPL", "ONL"),
-    ("ONL", "ELM"),
-    ("ELM", "OPR"),
-    ("OPR", "RPE"),
-]
-
-with open("gamma_parameters.json", "r") as f:
-    GAMMA_PARAMS = json.load(f)
-
-OUT_FOLDER = "gamma_layers_horizontal_squares"
-os.makedirs(OUT_FOLDER, exist_ok=True)
-
-
-def build_image(upper_params, lower_params):
-    canvas = Image.new("RGBA", (IMG_SIZE, IMG_SIZE))
-    upper = gamma_noise_image(upper_params["shape"], upper_params["scale"], IMG_SIZE, IMG_SIZE // 2)
-    canvas.paste(upper, (0, 0))
-    lower = gamma_noise_image(lower_params["shape"], lower_params["scale"], IMG_SIZE, IMG_SIZE // 2)
-    canvas.paste(lower, (0, IMG_SIZE // 2))
-    return canvas
-
-for pair_idx, (first, second) in enumerate(PAIRS):
-    p1 = GAMMA_PARAMS[first]
-    p2 = GAMMA_PARAMS[second]
-    img = build_image(p1, p2)
-    img.save(f"{OUT_FOLDER}/{pair_idx}_{first}_{second}.png")
-
-# angled
-OUT_FOLDER = "gamma_layer_squares"
-os.makedirs(OUT_FOLDER, exist_ok=True)
-POSITIVE_ANGLES = [0]
-NEGATIVE_ANGLES = [0]
-
-def random_angle_deviation(angle, max_deviation=3):
-    return 0
-
-for pair_idx, (first, second) in enumerate(PAIRS):
-    params1 = GAMMA_PARAMS[first]
-    params2 = GAMMA_PARAMS[second]
-
-    for angle_idx, angle in enumerate(POSITIVE_ANGLES):
-        rand_angle = random_angle_deviation(angle)
-        img = create_rotated_image(params1, params2, rand_angle, EXPANDED_SIZE, IMG_SIZE)
-        img.save(f"{OUT_FOLDER}/{pair_idx}_{first}_{second}_pos_{angle_idx}.png")
-
-    for angle_idx, angle in enumerate(NEGATIVE_ANGLES):
-        rand_angle = random_angle_deviation(angle)
-        img = create_rotated_image(params1, params2, rand_angle, EXPANDED_SIZE, IMG_SIZE)
-        img.save(f"{OUT_FOLDER}/{pair_idx}_{first}_{second}_neg_{angle_idx}.png")
-
-print("Generated square images")
-
+"""Generate two-layer gamma noise test squares.
+
+Usage:
+  python scripts/generate_squares.py horizontal
+  python scripts/generate_squares.py sweep --angles -10 -5 0 5 10 --offsets -20 0 20 --replicates 5 --workers 8
+
+`horizontal` writes one square per layer pair to gamma_layers_horizontal_squares/.
+`sweep` writes every layer pair x angle x offset x replicate to --out (default
+gamma_layer_squares/) across a process pool, with a manifest.json holding each image's
+parameters and exact boundary geometry. Rerunning a sweep only generates missing images.
+"""
+from __future__ import annotations
+import argparse
+import sys
+from pathlib import Path
+
+# ensure project root is importable so package imports work when running this script
+proj_root = Path(__file__).resolve().parents[1]
+if str(proj_root) not in sys.path:
+    sys.path.insert(0, str(proj_root))
+
+from phantom.config import load_gamma_parameters
+from phantom.squares import IMG_SIZE, LAYER_PAIRS, iter_layer_pairs, generate_square_set
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate two-layer gamma noise test squares")
+    parser.add_argument("mode", choices=["horizontal", "sweep"])
+    parser.add_argument("--gamma", type=str, default="gamma_parameters.json", help="Gamma parameters JSON name/path")
+    parser.add_argument("--out", type=str, default=None, help="Output folder")
+    parser.add_argument("--size", type=int, default=IMG_SIZE, help="Square image size in pixels")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--angles", type=float, nargs="+", default=[0.0], help="Boundary angles in degrees")
+    parser.add_argument("--offsets", type=float, nargs="+", default=[0.0],
+                        help="Boundary offsets from the image centre in pixels (positive = lower)")
+    parser.add_argument("--replicates", type=int, default=1, help="Independent noise draws per setting")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random angle deviation of up to +/- this many degrees")
+    parser.add_argument("--supersample", type=int, default=1, help="Anti-alias the boundary with NxN subpixels")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    try:
+        gamma = load_gamma_parameters(args.gamma)
+    except FileNotFoundError as e:
+        print(e)
+        return
+
+    if args.mode == "horizontal":
+        out = args.out or "gamma_layers_horizontal_squares"
+        n = sum(1 for _ in iter_layer_pairs(gamma, LAYER_PAIRS, args.size, seed=args.seed, write_dir=out))
+        print(f"Generated {n} horizontal squares in {out}")
+    else:
+        out = args.out or "gamma_layer_squares"
+        manifest = generate_square_set(out, gamma, LAYER_PAIRS, angles=args.angles, offsets=args.offsets,
+                                       replicates=args.replicates, seed=args.seed, img_size=args.size,
+                                       supersample=args.supersample, jitter=args.jitter, workers=args.workers)
+        print(f"Square set in {out}: {len(manifest['images'])} images")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,10 @@
+import argparse
 import json
 import logging
+import sys
 from pathlib import Path
-from typing import Tuple, Dict, Optional
+from typing import Callable, Tuple, Dict, Optional
 
-import cv2
 import numpy as np
 
 try:
@@ -11,17 +12,20 @@ try:
 except Exception as e:
     raise ImportError("Pillow is required (pip install pillow).") from e
 
-try:
-    from scipy.stats import gamma
-except Exception as e:
-    raise ImportError("scipy is required (pip install scipy).") from e
-
 try:
     import tkinter as tk
     from tkinter import filedialog, messagebox
 except Exception:
     tk = None
 
+# ensure project root is importable so package imports work when running this script
+proj_root = Path(__file__).resolve().parents[1]
+if str(proj_root) not in sys.path:
+    sys.path.insert(0, str(proj_root))
+
+from phantom.gamma_fit import GammaRegionFitter
+from phantom.gamma_batch import batch_estimate, write_parameters
+
 layer_names = [
     "background",
     "NFL",
@@ -44,37 +48,26 @@ def load_image(path: Path) -> np.ndarray:
     return np.asarray(img, dtype=np.float64)
 
 
-def inverse_log_transform(I: np.ndarray) -> np.ndarray:
-    """Apply inverse of the log-like transform."""
-    # I expected in [0,255]
-    I_clipped = np.clip(I, 0.0, 255.0)
-    return (10.0 ** (I_clipped / 255.0) - 1.0) / 9.0
-
-
-def estimate_gamma_params(region: np.ndarray) -> Tuple[float, float]:
-    """Estimate gamma shape (k) and scale (theta) with floc=0.
-
-    Raises:
-        ValueError: when no valid positive samples exist.
-        RuntimeError: when fitting fails.
-    """
-    data = region.flatten()
-    data = data[np.isfinite(data) & (data > 0)]
-    if data.size == 0:
-        raise ValueError("No positive data points in region for gamma fit.")
-    try:
-        k, loc, theta = gamma.fit(data, floc=0)
-    except Exception as e:
-        raise RuntimeError(f"Gamma fit failed: {e}") from e
-    return float(k), float(theta)
+def _normalized_rect(rect) -> Tuple[int, int, int, int]:
+    x1, y1, x2, y2 = rect
+    if x2 < x1:
+        x1, x2 = x2, x1
+    if y2 < y1:
+        y1, y2 = y2, y1
+    return x1, y1, x2 - x1, y2 - y1
 
 
-def select_rectangle(window_name: str, img: np.ndarray) -> Tuple[int, int, int, int]:
+def select_rectangle(window_name: str, img: np.ndarray,
+                     on_change: Optional[Callable[[int, int, int, int], str]] = None) -> Tuple[int, int, int, int]:
     """Interactive rectangle selection on a single-channel image.
 
     Returns (x, y, w, h) in image coordinates. Raises RuntimeError if the window
-    is closed/cancelled by the user.
+    is closed/cancelled by the user. If given, on_change(x, y, w, h) is called whenever
+    the rectangle changes and the text it returns is drawn in the window.
     """
+    # OpenCV is only needed for the interactive mode
+    import cv2
+
     display_base = img.copy()
     if display_base.ndim == 2:
         display_bgr = cv2.cvtColor(display_base.astype(np.uint8), cv2.COLOR_GRAY2BGR)
@@ -83,6 +76,8 @@ def select_rectangle(window_name: str, img: np.ndarray) -> Tuple[int, int, int,
 
     img_h, img_w = display_bgr.shape[:2]
     rect = [0, 0, 0, 0]
+    label = ""
+    last_rect = None
     selecting = False
     scale = 1.0
     dx = dy = 0
@@ -149,6 +144,12 @@ def select_rectangle(window_name: str, img: np.ndarray) -> Tuple[int, int, int,
                 ey = int(rect[3] * scale) + dy
                 cv2.rectangle(canvas, (sx, sy), (ex, ey), (0, 255, 0), 1)
 
+                if on_change is not None and rect != last_rect:
+                    last_rect = list(rect)
+                    label = on_change(*_normalized_rect(rect))
+                if label:
+                    cv2.putText(canvas, label, (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1, cv2.LINE_AA)
+
             cv2.imshow(window_name, canvas)
             key = cv2.waitKey(20) & 0xFF
             if key in (ord("q"), 13):  # q or Enter
@@ -157,14 +158,7 @@ def select_rectangle(window_name: str, img: np.ndarray) -> Tuple[int, int, int,
         if cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE) >= 1:
             cv2.destroyWindow(window_name)
 
-    x1, y1, x2, y2 = rect
-    if x2 < x1:
-        x1, x2 = x2, x1
-    if y2 < y1:
-        y1, y2 = y2, y1
-    w = x2 - x1
-    h = y2 - y1
-    return x1, y1, w, h
+    return _normalized_rect(rect)
 
 
 def resolve_output_path(path: Path) -> Optional[Path]:
@@ -224,9 +218,58 @@ def _pick_input_output_paths() -> Optional[tuple[Path, Path]]:
     return Path(inp), Path(out)
 
 
-def main():
+def run_batch(args):
+    """Headless mode: fit all layers of all images and write one consolidated JSON."""
+    rects = positions = None
+    try:
+        with open(args.regions if args.regions else args.positions, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+    except Exception as e:
+        logging.error("Failed to load region definitions: %s", e)
+        return
+    if args.regions:
+        rects = spec
+    else:
+        positions = spec
+
+    logging.info("Fitting %d images (%d bootstrap resamples)", len(args.batch), args.bootstrap)
+    params = batch_estimate(args.batch, rects=rects, positions=positions, margin=args.margin,
+                            n_boot=args.bootstrap, ci=args.ci, seed=args.seed, workers=args.workers)
+    try:
+        write_parameters(params, args.out)
+        logging.info("Saved results to %s", args.out)
+    except Exception as e:
+        logging.error("Failed to save output: %s", e)
+
+
+def main(argv=None):
     logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
+    parser = argparse.ArgumentParser(description="Estimate per-layer gamma parameters (interactive without --batch)")
+    parser.add_argument("--batch", nargs="+", metavar="IMAGE", help="Fit these images headlessly")
+    regions = parser.add_mutually_exclusive_group()
+    regions.add_argument("--regions", help="JSON of rectangles: {layer: [x, y, w, h]} or "
+                                           "{'default': {...}, 'images': {basename: {...}}}")
+    regions.add_argument("--positions", help="layer_positions.json; fit the band between layer boundaries")
+    parser.add_argument("--margin", type=int, default=2, help="Rows trimmed from each band edge (--positions)")
+    parser.add_argument("--bootstrap", type=int, default=1000, help="Bootstrap resamples for CIs (0 disables)")
+    parser.add_argument("--ci", type=float, default=0.95, help="Confidence level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--out", default="json_outputs/gamma_parameters_batch.json",
+                        help="Output JSON (--batch); pass json_outputs/gamma_parameters.json with --force to "
+                             "replace the parameters the editor uses")
+    parser.add_argument("--force", action="store_true", help="Overwrite --out if it exists (--batch)")
+    args = parser.parse_args(argv)
+
+    if args.batch:
+        if not (args.regions or args.positions):
+            parser.error("--batch needs --regions or --positions")
+        if Path(args.out).exists() and not args.force:
+            parser.error(f"{args.out} exists; pass --force to overwrite it or choose another --out")
+        run_batch(args)
+        return
+
     paths = _pick_input_output_paths()
     if paths is None:
         return
@@ -239,7 +282,15 @@ def main():
         logging.error("Failed to load image: %s", e)
         return
 
-    I_trans = inverse_log_transform(I)
+    # O(1) fits of any rectangle of the inverse-log-transformed image, so the fit follows the drag
+    fitter = GammaRegionFitter(I)
+
+    def live_fit(x, y, w, h):
+        try:
+            k, theta = fitter.fit(x, y, w, h)
+        except ValueError:
+            return ""
+        return f"shape={k:.3f} scale={theta:.4f}"
 
     params: Dict[str, Dict[str, float]] = {}
     display = np.clip(I, 0, 255).astype(np.uint8)
@@ -251,7 +302,7 @@ def main():
 
         while True:
             try:
-                x, y, w, h = select_rectangle(title, display)
+                x, y, w, h = select_rectangle(title, display, on_change=live_fit)
             except RuntimeError as e:
                 logging.warning("Selection cancelled: %s", e)
                 return
@@ -260,15 +311,11 @@ def main():
                 logging.warning("Empty selection — please click and drag to select a non-empty rectangle.")
                 continue
 
-            region = I_trans[y : y + h, x : x + w]
             try:
-                shape, scale = estimate_gamma_params(region)
+                shape, scale = fitter.fit(x, y, w, h)
             except ValueError as e:
                 logging.warning("Selection contains no valid positive data (%s). Please reselect.", e)
                 continue
-            except RuntimeError as e:
-                logging.warning("Gamma fit failed: %s. Please reselect.", e)
-                continue
 
             params[name] = {"shape": shape, "scale": scale}
             logging.debug("Stored params for %s: shape=%s scale=%s", name, shape, scale)
@@ -1,5 +1,7 @@
+import sys
+
 from phantom.editor import main
 
 if __name__ == "__main__":
-    main(run=True)
-
+    # --preview overlays a live DoB edge map while dragging layers
+    main(run=True, preview="--preview" in sys.argv[1:])
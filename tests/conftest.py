@@ -1,7 +1,31 @@
 import sys
 import os
 
+import numpy as np
+import pytest
+
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+
+# keep backend tuning results, catalogued runs and decoded images out of the project root while testing
+if any(v not in os.environ for v in ("WILLIAMS_TUNING_CACHE", "WILLIAMS_CATALOG", "WILLIAMS_IMAGE_STORE")):
+    import atexit
+    import shutil
+    import tempfile
+    _tmp = tempfile.mkdtemp(prefix="williams-tests-")
+    atexit.register(shutil.rmtree, _tmp, ignore_errors=True)
+    os.environ.setdefault("WILLIAMS_TUNING_CACHE", os.path.join(_tmp, "tuning.json"))
+    os.environ.setdefault("WILLIAMS_CATALOG", os.path.join(_tmp, "catalog.sqlite"))
+    os.environ.setdefault("WILLIAMS_IMAGE_STORE", os.path.join(_tmp, "images"))
+
+
+@pytest.fixture
+def two_layer_image():
+    """Factory for the small two-layer test image: uint8 noise in [20, 60), +120 from row h // 2."""
+    def make(seed=0, shape=(10, 9)):
+        im = np.random.default_rng(seed).integers(20, 60, size=shape).astype(np.uint8)
+        im[shape[0] // 2:] += 120
+        return im
+    return make
@@ -0,0 +1,23 @@
+import numpy as np
+from williams_2014_edge_detection.processing import process_image, RunningStats
+
+
+def test_running_stats_matches_numpy():
+    x = np.random.default_rng(1).normal(50, 5, size=20)
+    st = RunningStats()
+    for v in x:
+        st.add(v)
+    assert np.isclose(st.mean, x.mean()) and np.isclose(st.std, x.std(ddof=1))
+
+
+def test_adaptive_mc_matches_fixed_runs_and_stops_early(two_layer_image):
+    im = two_layer_image()
+    fixed, _, _ = process_image(im, [5], n_mc=3, seed=7, name="x.png")
+    df, _, _ = process_image(im, [5], seed=7, name="x.png", target_halfwidth=1e-9, min_mc=3, max_mc=3,
+                             workers=2)
+    assert (df.n_mc_used == 3).all()
+    assert np.allclose(df.pcm_mean, fixed.pcm_mean) and np.allclose(df.pcm_std, fixed.pcm_std)
+
+    # a loose target stops every pair at min_mc
+    loose, _, _ = process_image(im, [5], seed=7, name="x.png", target_halfwidth=1e6, min_mc=2, max_mc=10)
+    assert (loose.n_mc_used == 2).all() and (loose.ci_halfwidth <= 1e6).all()
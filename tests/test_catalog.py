@@ -0,0 +1,42 @@
+import os
+import numpy as np
+from PIL import Image
+from williams_2014_edge_detection import catalog
+from williams_2014_edge_detection.checkpoint import RunCheckpoint, save_run_config, make_run_config
+from williams_2014_edge_detection.processing import process_image
+from williams_2014_edge_detection.constants import HIGHS
+
+
+def test_record_attempt_and_query(tmp_path, two_layer_image):
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    Image.fromarray(two_layer_image()).save(image_dir / "a.png")
+    attempt_dir = tmp_path / "attempt_004"
+    attempt_dir.mkdir()
+    save_run_config(str(attempt_dir), make_run_config(["a.png"], [5], 2, 1))
+    df, _, _ = process_image(str(image_dir / "a.png"), [5], n_mc=2, seed=1, out_dir=str(attempt_dir),
+                             attempt_num=4, checkpoint=RunCheckpoint(str(attempt_dir), 4, 2))
+
+    conn = catalog.connect(str(tmp_path / "c.sqlite"))
+    run_id = catalog.record_attempt(str(attempt_dir), image_dir=str(image_dir), conn=conn)
+    # re-recording replaces the run instead of duplicating it
+    assert catalog.record_attempt(str(attempt_dir), image_dir=str(image_dir), conn=conn) == run_id
+
+    values = catalog.pcm_values(test="KS", mask_size=5, conn=conn)
+    assert len(values) == 2 * len(HIGHS) and set(values.image) == {"a"}
+    best = catalog.best_thresholds("KS", 5, last=10, conn=conn)
+    per_th = values.groupby("threshold_idx").pcm.mean()
+    assert best.threshold_idx.iloc[0] == per_th.idxmax() and np.isclose(best.mean_pcm.iloc[0], per_th.max())
+
+    summ = catalog.summaries(conn=conn)
+    assert np.allclose(summ.sort_values("test").pcm_mean.to_numpy(), df.sort_values("test").pcm_mean.to_numpy())
+    binaries = catalog.artifacts(run_id, kind="images", best_only=True, conn=conn)
+    assert len(binaries) == 2 * 7 and all(os.path.exists(p) for p in binaries.path)
+    assert catalog.runs(conn=conn).attempt_num.tolist() == [4]
+    assert np.allclose(np.sort(values.high.unique()), np.sort(HIGHS))
+
+    # attempts started before the thresholds were stored get NULL instead of today's constants
+    save_run_config(str(attempt_dir), {"filenames": ["a.png"], "mask_sizes": [5], "n_mc": 2, "seed": 1})
+    catalog.record_attempt(str(attempt_dir), image_dir=str(image_dir), conn=conn)
+    old = catalog.pcm_values(test="KS", mask_size=5, conn=conn)
+    assert len(old) == 2 * len(HIGHS) and old.high.isna().all() and old.low.isna().all()
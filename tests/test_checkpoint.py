@@ -0,0 +1,34 @@
+import os
+import pytest
+from williams_2014_edge_detection import processing
+from williams_2014_edge_detection.checkpoint import RunCheckpoint
+from williams_2014_edge_detection.constants import TESTS
+
+
+def test_resumed_run_matches_uninterrupted(tmp_path, monkeypatch, two_layer_image):
+    im = two_layer_image()
+    full_ckpt = RunCheckpoint(str(tmp_path / "attempt_001"), 1, 2)
+    full, _, _ = processing.process_image(im, [5], n_mc=2, name="img", seed=3, checkpoint=full_ckpt)
+
+    ckpt = RunCheckpoint(str(tmp_path / "attempt_002"), 2, 2)
+    real_score = processing.score_test
+    calls = {"n": 0}
+
+    def dying_score(*args, **kwargs):
+        calls["n"] += 1
+        if calls["n"] == len(TESTS) + 3:
+            raise KeyboardInterrupt
+        return real_score(*args, **kwargs)
+
+    monkeypatch.setattr(processing, "score_test", dying_score)
+    with pytest.raises(KeyboardInterrupt):
+        processing.process_image(im, [5], n_mc=2, name="img", seed=3, checkpoint=ckpt)
+    # the first MC iteration is complete, the second has its maps and two tests on disk
+    assert ckpt.load_pcm("img", 2, 5, TESTS[1]) is not None and ckpt.load_pcm("img", 2, 5, TESTS[2]) is None
+    assert ckpt.load_maps("img", 2, 5) is not None and ckpt.load_maps("img", 1, 5) is None
+
+    monkeypatch.setattr(processing, "compute_response_maps", None)  # nothing may be recomputed
+    calls["n"] = -100
+    resumed, _, _ = processing.process_image(im, [5], n_mc=2, name="img", seed=3, checkpoint=ckpt)
+    assert resumed.to_csv(index=False) == full.to_csv(index=False)
+    assert not os.listdir(ckpt.maps_dir)
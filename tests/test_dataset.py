@@ -0,0 +1,28 @@
+import json
+import numpy as np
+from phantom.dataset import generate_dataset
+
+GAMMA = {name: {"shape": 2.0 + i, "scale": 0.05} for i, name in enumerate(
+    ["background", "NFL", "GCL", "IPL", "INL", "OPL", "ONL", "ELM", "OPR", "RPE"])}
+POSITIONS = [{"name": name, "y": 4 + 3 * i} for i, name in enumerate(
+    ["NFL", "GCL", "IPL", "INL", "OPL", "ONL", "ELM", "OPR", "RPE"])]
+
+
+def test_dataset_is_deterministic_across_worker_counts(tmp_path):
+    out_a = str(tmp_path / "a")
+    out_b = str(tmp_path / "b")
+    generate_dataset(out_a, 3, POSITIONS, GAMMA, seed=7, max_offset=2, canvas_w=48, canvas_h=40, workers=1, chunk_size=3)
+    generate_dataset(out_b, 3, POSITIONS, GAMMA, seed=7, max_offset=2, canvas_w=48, canvas_h=40, workers=2, chunk_size=1)
+    for name in ("images.npy", "labels.npy"):
+        a = np.load(f"{out_a}/{name}")
+        b = np.load(f"{out_b}/{name}")
+        assert a.shape == (3, 40, 48) and a.dtype == np.uint8
+        assert np.array_equal(a, b)
+
+    labels = np.load(f"{out_a}/labels.npy")
+    # background covers the whole canvas, later layers paint over it
+    assert labels.max() < 10 and (labels == 0).any() and (labels > 0).any()
+    with open(f"{out_a}/manifest.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert [s["index"] for s in manifest["samples"]] == [0, 1, 2]
+    assert all(abs(s["positions"]["NFL"] - 4) <= 2 for s in manifest["samples"])
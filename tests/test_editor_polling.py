@@ -0,0 +1,53 @@
+import queue
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+editor = pytest.importorskip("phantom.editor")
+from phantom.layer import LayerItem
+
+
+class _Root:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, fn):
+        self.scheduled.append(fn)
+
+
+def _app():
+    app = editor.LayerEditorApp.__new__(editor.LayerEditorApp)
+    app.root = _Root()
+    app.preview = False
+    app._fill_results = queue.Queue()
+    return app
+
+
+def test_failed_fill_is_reported_and_polling_stops(monkeypatch):
+    monkeypatch.setattr(editor.messagebox, "showerror", lambda *a: None)
+    arr = np.zeros((4, 5, 4), np.uint8)
+    arr[2:, :, 3] = 255
+    ok, bad = LayerItem("ok", Image.fromarray(arr, mode="RGBA")), LayerItem("bad", Image.fromarray(arr, mode="RGBA"))
+    app = _app()
+    app.refresh_layer = lambda li: None
+    jobs = [(ok, {"shape": 2.0, "scale": 1.0}), (bad, {"shape": -1.0, "scale": 1.0})]
+    app._fill_pending = len(jobs)
+    app._fill_thread = threading.Thread(target=app._fill_worker, args=(jobs,))
+    app._fill_thread.start()
+    app._fill_thread.join()
+    app._poll_fills()
+    assert app._fill_pending == 0 and app.root.scheduled == []
+    assert ok.filled_params == jobs[0][1] and bad.filled_params is None
+
+
+def test_failed_preview_update_stops_polling():
+    app = _app()
+    app.canvas_w, app.canvas_h = 8, 8
+    app._preview_map = None
+    app._preview_again = False
+    app._preview_results = queue.Queue()
+    app._preview_worker([("not", "a layer")], (0, 8))
+    app._poll_preview()
+    assert app.root.scheduled == [] and app._preview_results.empty()
@@ -0,0 +1,31 @@
+import numpy as np
+from PIL import Image
+from williams_2014_edge_detection import experiments
+from williams_2014_edge_detection.processing import process_image
+
+
+def test_grid_shares_maps_and_matches_process_image(tmp_path, capsys, two_layer_image):
+    im = two_layer_image()
+    Image.fromarray(im).save(tmp_path / "a.png")
+    spec = {"name": "t", "images": ["a.png"], "seed": 2,
+            "grid": {"mask_size": [5], "n_mc": [1, 2], "low_ratio": [0.3, 0.4], "g_pcm": [1, 2],
+                     "tests": ["all", ["KS"]]}}
+    cache = str(tmp_path / "cache")
+
+    df = experiments.run_experiment(spec, cache_dir=cache, workers=1, image_dir=str(tmp_path))
+    plan = experiments.ExperimentPlan(experiments.expand_grid(spec["grid"]), {"a.png": im}, 2)
+    # 16 configurations, but only 3 distinct noise replicates (no noise, mc 1 and mc 2) need maps
+    assert plan.naive["maps"] == 24 and plan.planned()["maps"] == 3
+    assert plan.planned()["nms"] == 3 * 7
+    assert len(df) == 8 * 7 + 8 * 1
+
+    local, _, _ = process_image(str(tmp_path / "a.png"), [5], n_mc=2, seed=2)
+    sel = df[(df.n_mc == 2) & (df.low_ratio == 0.4) & (df.g_pcm == 1) & (df.tests == "all")]
+    assert np.allclose(sel.pcm_mean.to_numpy(), local.pcm_mean.to_numpy())
+    assert np.allclose(sel.pcm_std.to_numpy(), local.pcm_std.to_numpy())
+
+    # a rerun is served entirely from the node cache
+    capsys.readouterr()
+    again = experiments.run_experiment(spec, cache_dir=cache, workers=1, image_dir=str(tmp_path))
+    assert "nothing to compute" in capsys.readouterr().out
+    assert again.equals(df)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from scipy.stats import gamma
+from phantom.gamma_fit import GammaRegionFitter, INVERSE_LOG_LUT, gamma_mle
+
+
+def test_region_fit_matches_scipy_gamma_fit():
+    rng = np.random.default_rng(0)
+    img = np.clip(rng.gamma(3.0, 20.0, size=(60, 80)), 0, 255).astype(np.uint8)
+    fitter = GammaRegionFitter(img)
+    for x, y, w, h in [(0, 0, 80, 60), (5, 7, 30, 20), (70, 50, 4, 3)]:
+        data = INVERSE_LOG_LUT[img[y:y + h, x:x + w]].ravel()
+        k, _, theta = gamma.fit(data[data > 0], floc=0)
+        k_fast, theta_fast = fitter.fit(x, y, w, h)
+        assert k_fast == pytest.approx(k, rel=1e-6)
+        assert theta_fast == pytest.approx(theta, rel=1e-6)
+
+
+def test_region_fit_rejects_empty_or_flat_regions():
+    img = np.zeros((10, 10), dtype=np.uint8)
+    img[5:, :] = 100
+    fitter = GammaRegionFitter(img)
+    with pytest.raises(ValueError):
+        fitter.fit(0, 0, 10, 5)
+    with pytest.raises(ValueError):
+        fitter.fit(0, 5, 10, 5)
+    with pytest.raises(ValueError):
+        gamma_mle(0, 0.0, 0.0)
+
+
+def test_bootstrap_ci_brackets_estimate():
+    from phantom.gamma_fit import bootstrap_gamma_ci, histogram_mle
+    rng = np.random.default_rng(1)
+    img = np.clip(rng.gamma(3.0, 20.0, size=2000), 0, 255).astype(np.uint8)
+    counts = np.bincount(img, minlength=256)
+    k, theta = histogram_mle(counts)
+    (k_lo, k_hi), (t_lo, t_hi) = bootstrap_gamma_ci(counts, 300, rng=np.random.default_rng(0))
+    assert k_lo < k < k_hi and t_lo < theta < t_hi
+
+
+def test_batch_estimate_rects_and_bands(tmp_path):
+    from PIL import Image
+    from phantom.gamma_batch import batch_estimate, band_masks
+    rng = np.random.default_rng(2)
+    paths = []
+    for i in range(2):
+        img = np.clip(rng.gamma(3.0, 20.0, size=(40, 30)), 0, 255).astype(np.uint8)
+        img[20:] = np.clip(rng.gamma(8.0, 5.0, size=(20, 30)), 0, 255)
+        paths.append(str(tmp_path / f"s{i}.png"))
+        Image.fromarray(img).save(paths[-1])
+
+    positions = [{"name": "NFL", "y": 20, "upper_boundary_px": [20] * 30}]
+    masks = band_masks(positions, (40, 30), margin=2)
+    assert masks["background"][:18].all() and not masks["background"][18:].any()
+    assert masks["NFL"][22:].all() and masks["NFL"].sum() == 18 * 30
+
+    by_band = batch_estimate(paths, positions=positions, n_boot=50, workers=1)
+    by_rect = batch_estimate(paths, rects={"background": [0, 0, 30, 18], "NFL": [0, 22, 30, 18]}, n_boot=50, workers=1)
+    for name in ("background", "NFL"):
+        assert by_band[name]["shape"] == pytest.approx(by_rect[name]["shape"])
+        assert by_band[name]["n_images"] == 2 and set(by_band[name]["per_image"]) == {"s0.png", "s1.png"}
+        lo, hi = by_band[name]["shape_ci"]
+        assert lo <= by_band[name]["shape"] <= hi
+
+
+def test_batch_cli_refuses_to_overwrite_without_force(tmp_path):
+    import importlib.util
+    import os
+    spec = importlib.util.spec_from_file_location(
+        "get_shape_scale", os.path.join(os.path.dirname(__file__), "..", "scripts", "get_shape_scale.py"))
+    script = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(script)
+    out = tmp_path / "gamma_parameters.json"
+    out.write_text("{}")
+    with pytest.raises(SystemExit):
+        script.main(["--batch", "x.png", "--regions", "r.json", "--out", str(out)])
+    assert out.read_text() == "{}"
@@ -0,0 +1,38 @@
+import os
+import numpy as np
+from skimage import io
+
+from williams_2014_edge_detection import image_store
+from williams_2014_edge_detection.io_utils import decode_gray, load_gray
+
+
+def test_store_hands_out_readonly_memmaps_and_tracks_changes(tmp_path, monkeypatch):
+    root = str(tmp_path / "store")
+    monkeypatch.setenv(image_store.STORE_ENV, root)
+    path = str(tmp_path / "a.png")
+    rgb = np.random.default_rng(0).integers(0, 255, size=(6, 7, 3)).astype(np.uint8)
+    io.imsave(path, rgb, check_contrast=False)
+
+    im = load_gray(path)
+    assert isinstance(im, np.memmap) and not im.flags.writeable
+    assert np.array_equal(im, decode_gray(path))
+
+    # same content under another name shares the stored image
+    copy = str(tmp_path / "b.png")
+    with open(path, "rb") as src, open(copy, "wb") as dst:
+        dst.write(src.read())
+    assert np.array_equal(load_gray(copy), im)
+    assert len([n for n in os.listdir(root) if n.endswith(".npy")]) == 1
+
+    # a rewritten file is decoded again
+    io.imsave(path, rgb[::-1].copy(), check_contrast=False)
+    os.utime(path, ns=(1, 1))
+    assert np.array_equal(load_gray(path), decode_gray(path))
+
+    image_store.purge([copy], root)
+    assert len([n for n in os.listdir(root) if n.endswith(".npy")]) == 1
+    image_store.purge(None, root)
+    assert not os.path.exists(root)
+
+    monkeypatch.setenv(image_store.STORE_ENV, "off")
+    assert not isinstance(load_gray(path), np.memmap)
@@ -0,0 +1,91 @@
+import numpy as np
+from PIL import Image
+from phantom.image_utils import UNLABELED, composite_layers, gamma_noise_plane, to_rgba_image
+
+
+def test_composite_layers_matches_pil_alpha_composite():
+    rng = np.random.default_rng(0)
+    H, W = 30, 20
+    layers = []
+    comp = Image.new("RGBA", (W, H), (0, 0, 0, 0))
+    for label in range(4):
+        h = int(rng.integers(5, 40))
+        intensity = rng.integers(0, 256, size=(h, W)).astype(np.uint8)
+        alpha = rng.integers(0, 256, size=(h, W)).astype(np.uint8)
+        alpha[alpha < 60] = 0
+        alpha[alpha > 200] = 255
+        y = int(rng.integers(-3, H - 2))
+        layers.append((intensity, alpha, y, label))
+        if y >= 0:
+            comp.alpha_composite(to_rgba_image(intensity, alpha), dest=(0, y))
+        else:
+            comp.alpha_composite(to_rgba_image(intensity, alpha), dest=(0, 0), source=(0, -y))
+
+    image, alpha_out, labels = composite_layers(layers, W, H)
+    ref = np.asarray(comp)
+    assert np.array_equal(image, ref[:, :, 0])
+    assert np.array_equal(alpha_out, ref[:, :, 3])
+    assert ((labels == UNLABELED) == (alpha_out == 0)).all()
+
+
+def test_labels_hold_topmost_layer():
+    bottom = np.ones((4, 3), dtype=bool)
+    top = np.zeros((2, 3), dtype=bool)
+    top[:, 1] = True
+    image, _, labels = composite_layers([
+        (np.full((4, 3), 10, np.uint8), bottom, 0, 0),
+        (np.full((2, 3), 200, np.uint8), top, 1, 1),
+    ], 3, 5)
+    assert labels[1, 1] == 1 and labels[2, 1] == 1 and image[1, 1] == 200
+    assert labels[1, 0] == 0 and image[1, 0] == 10
+    assert (labels[4] == UNLABELED).all()
+
+
+def test_gamma_noise_plane_fills_only_covered_pixels():
+    mask = np.zeros((6, 8), dtype=np.uint8)
+    mask[2:5, 1:7] = 128
+    plane = gamma_noise_plane(2.0, 0.5, mask=mask, rng=np.random.default_rng(1))
+    assert plane.dtype == np.uint8
+    assert (plane[mask == 0] == 0).all()
+    assert plane[mask > 0].max() == 255
+
+
+def test_fill_layer_marks_photo_image_stale_without_tk():
+    from phantom.image_utils import fill_layer_with_gamma
+    from phantom.layer import LayerItem
+    arr = np.zeros((6, 8, 4), dtype=np.uint8)
+    arr[3:, :, 3] = 255
+    li = LayerItem("test", Image.fromarray(arr, mode="RGBA"))
+    version = li.version
+    fill_layer_with_gamma(li, 2.0, 0.5, rng=np.random.default_rng(0))
+    assert li.version == version + 1 and li.tk_version != li.version
+    filled = np.asarray(li.pil_image)
+    assert (filled[..., 3] == arr[..., 3]).all() and filled[3:, :, 0].max() == 255
+
+
+def test_unfilled_colour_layers_match_baseline_rgba_composite():
+    from phantom.config import PNG_FILES
+    from phantom.image_utils import composite_rgba_layers, load_png_as_rgba
+    W, H = 300, 120
+    imgs = [load_png_as_rgba(p, target_width=W) for p in PNG_FILES[:3]]
+    ys = [-5, 40, 90]
+    # baseline: PIL alpha_composite of the colour layer PNGs
+    ref = Image.new("RGBA", (W, H), (0, 0, 0, 0))
+    for img, y in zip(imgs, ys):
+        if y >= 0:
+            ref.alpha_composite(img, dest=(0, y))
+        else:
+            ref.alpha_composite(img, dest=(0, 0), source=(0, -y))
+    comp, labels = composite_rgba_layers([(np.asarray(img), y, i) for i, (img, y) in enumerate(zip(imgs, ys))], W, H)
+    assert np.array_equal(np.asarray(comp), np.asarray(ref))
+    assert ((labels == UNLABELED) == (np.asarray(ref)[:, :, 3] == 0)).all()
+
+
+def test_layer_plane_uses_luminance_for_colour_layers():
+    from phantom.image_utils import layer_plane
+    from williams_2014_edge_detection.io_utils import to_gray_uint8
+    rgba = np.random.default_rng(2).integers(0, 256, size=(5, 6, 4)).astype(np.uint8)
+    assert np.abs(layer_plane(rgba).astype(int) - to_gray_uint8(rgba).astype(int)).max() <= 1
+    gray = rgba.copy()
+    gray[:, :, 1] = gray[:, :, 2] = gray[:, :, 0]
+    assert np.array_equal(layer_plane(gray), gray[:, :, 0])
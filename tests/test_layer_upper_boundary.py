@@ -25,3 +25,18 @@ def test_get_layer_upper_boundary_small():
     assert all(out[i] is None for i in range(15) if i not in (2, 5))
     root.destroy()
 
+
+
+def test_layer_boundaries_headless():
+    from phantom.layer import layer_boundaries
+    arr = np.zeros((6, 10, 4), dtype=np.uint8)
+    arr[2:5, 2, 3] = 255
+    arr[3:, 5, 3] = 255
+    li = LayerItem("test", Image.fromarray(arr, mode="RGBA"), y=4)
+    assert li.alpha is li.alpha and li.alpha.shape == (6, 10)
+    geo = layer_boundaries(li.alpha, li.y, 15)
+    assert geo["upper_boundary_px"][2] == 6 and geo["upper_boundary_px"][5] == 7
+    assert geo["lower_boundary_px"][2] == 8 and geo["lower_boundary_px"][5] == 9
+    assert geo["thickness_px"][2] == 3 and geo["thickness_px"][5] == 3
+    assert all(geo["upper_boundary_px"][i] is None for i in range(15) if i not in (2, 5))
+    assert len(geo["thickness_px"]) == 15 and geo["thickness_px"][12] == 0
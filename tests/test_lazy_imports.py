@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _loaded_after(statement, modules):
+    """Run `statement` in a fresh interpreter; return (modules it loaded, startup seconds)."""
+    code = (
+        f"import sys; {statement}; "
+        f"print(','.join(m for m in {modules!r} if m in sys.modules))"
+    )
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    loaded = [m for m in out.stdout.strip().split(",") if m]
+    return loaded, elapsed
+
+
+def test_phantom_image_utils_does_not_load_tkinter():
+    loaded, elapsed = _loaded_after("import phantom.image_utils", ["tkinter", "PIL.ImageTk"])
+    print(f"import phantom.image_utils: {elapsed * 1000:.0f} ms")
+    assert loaded == []
+
+
+def test_phantom_package_does_not_load_editor():
+    loaded, _ = _loaded_after("import phantom, phantom.config, phantom.layer", ["tkinter", "phantom.editor"])
+    assert loaded == []
+
+
+def test_williams_package_defers_heavy_dependencies():
+    heavy = ["pandas", "scipy.stats", "skimage.morphology", "skimage.filters", "skimage.io"]
+    loaded, elapsed = _loaded_after("import williams_2014_edge_detection", heavy)
+    print(f"import williams_2014_edge_detection: {elapsed * 1000:.0f} ms")
+    assert loaded == []
+    # the re-exports still resolve on first access
+    loaded, _ = _loaded_after("import williams_2014_edge_detection as w; w.process_image", ["williams_2014_edge_detection.processing"])
+    assert loaded == ["williams_2014_edge_detection.processing"]
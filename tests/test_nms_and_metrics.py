@@ -28,3 +28,14 @@ def test_hysteresis_and_binary_and_pcm():
     pcm = compute_pcm_binary(det, gt, g=1)
     assert pcm == 100.0
 
+
+
+def test_non_max_suppression_angle_index_matches_degrees():
+    rng = np.random.default_rng(0)
+    resp = rng.integers(0, 255, size=(8, 8)).astype(np.uint8)
+    angles = np.linspace(0, 180, 12, endpoint=False)
+    idx = rng.integers(0, 12, size=(8, 8)).astype(np.uint8)
+    idx[0, :] = 255
+    deg = angles[np.minimum(idx, 11)]
+    deg[0, :] = np.nan
+    assert np.array_equal(non_max_suppression(resp, idx, angles), non_max_suppression(resp, deg))
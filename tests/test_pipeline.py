@@ -0,0 +1,27 @@
+import os
+from PIL import Image
+from williams_2014_edge_detection.pipeline import run_pipeline
+from williams_2014_edge_detection.processing import process_image
+from williams_2014_edge_detection.checkpoint import RunCheckpoint
+
+
+def test_pipeline_matches_process_image_and_resumes(tmp_path, two_layer_image):
+    paths = []
+    for seed, name in enumerate(("a.png", "b.png")):
+        Image.fromarray(two_layer_image(seed)).save(tmp_path / name)
+        paths.append(str(tmp_path / name))
+    attempt_dir = str(tmp_path / "attempt_001")
+    os.makedirs(attempt_dir)
+    checkpoint = RunCheckpoint(attempt_dir, 1, 2)
+
+    frames, report = run_pipeline(paths, [5], n_mc=2, seed=4, checkpoint=checkpoint, workers=2, queue_size=1)
+    for path in paths:
+        local, _, _ = process_image(path, [5], n_mc=2, seed=4)
+        assert frames[path].equals(local)
+    assert list(report) == ["reader", "noise", "compute", "postprocess", "writer"]
+    assert report["compute"]["items"] == 4 and report["writer"]["items"] == 4
+
+    # everything is checkpointed now, so nothing reaches the pool
+    again, report = run_pipeline(paths, [5], n_mc=2, seed=4, checkpoint=checkpoint, workers=2)
+    assert report["compute"]["items"] == 0
+    assert all(again[p].equals(frames[p]) for p in paths)
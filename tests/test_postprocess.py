@@ -0,0 +1,28 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from williams_2014_edge_detection.processing import compute_response_maps, process_image, score_test
+from williams_2014_edge_detection.postprocess import score_tests_parallel
+from williams_2014_edge_detection.masks import default_angles
+
+
+def test_parallel_scores_match_serial(two_layer_image):
+    im = two_layer_image(seed=3, shape=(11, 10))
+    angles = default_angles(5)
+    resp, angle_idx = compute_response_maps(im, 5, angles, backend="vectorized")
+    gt = np.zeros_like(im)
+    gt[5, :] = 1
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        scored = score_tests_parallel(resp, angle_idx, angles, gt, pool, [0, 5], keep_binaries=True)
+    assert sorted(scored) == [0, 5]
+    for t_idx, (pcm_scores, bw_thin_list) in scored.items():
+        ref_scores, ref_thin = score_test(resp[t_idx], angle_idx, angles, gt)
+        assert pcm_scores == ref_scores
+        assert all(np.array_equal(a, b) for a, b in zip(bw_thin_list, ref_thin))
+
+
+def test_process_image_workers_same_table(two_layer_image):
+    im = two_layer_image(seed=3, shape=(11, 10))
+    serial, _, _ = process_image(im, [5], n_mc=2, seed=1, name="x.png", backend="vectorized")
+    parallel, _, _ = process_image(im, [5], n_mc=2, seed=1, name="x.png", backend="vectorized", workers=2)
+    assert serial.equals(parallel)
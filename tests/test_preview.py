@@ -0,0 +1,23 @@
+import numpy as np
+from phantom.preview import dob_response, band_response, edge_overlay
+
+
+def test_dob_response_matches_box_means():
+    im = np.random.default_rng(0).random((20, 17)) * 255
+    r = dob_response(im, 3, 2)
+    assert np.isclose(r[8, 7], abs(im[5:8, 5:10].mean() - im[8:11, 5:10].mean()))
+    assert (r[:3] == 0).all() and (r[:, :2] == 0).all()
+
+
+def test_band_response_matches_full_map_and_finds_boundary():
+    W, H = 64, 48
+    bg = (np.full((H, W), 40, np.uint8), np.full((H, W), 255, np.uint8), 0, 0)
+    layer = (np.full((10, W), 200, np.uint8), np.full((10, W), 255, np.uint8), 20, 1)
+    d0, full = band_response([bg, layer], W, H)
+    b0, band = band_response([bg, layer], W, H, rows=(16, 26))
+    assert d0 == 0 and full.shape == (H // 2, W // 2)
+    assert np.allclose(full[b0:b0 + len(band)], band)
+    overlay = np.asarray(edge_overlay(full, (W, H)))
+    assert overlay.shape == (H, W, 4)
+    # edges at the layer's top (row 20) and bottom (row 30) boundaries
+    assert set(np.nonzero(overlay[:, W // 2, 3])[0]) == {20, 21, 30, 31}
@@ -1 +1,34 @@
+import numpy as np
+from williams_2014_edge_detection.processing import compute_response_maps, normalize_response
+from williams_2014_edge_detection.constants import TESTS, NO_ANGLE
 
+
+def _two_layer_image(h=12, w=10, seed=0):
+    rng = np.random.default_rng(seed)
+    im = np.empty((h, w), dtype=np.uint8)
+    im[:h // 2] = rng.integers(20, 60, size=(h // 2, w))
+    im[h // 2:] = rng.integers(150, 200, size=(h - h // 2, w))
+    return im
+
+
+def test_compute_response_maps_layout_and_dtype():
+    im = _two_layer_image()
+    resp, angle_idx = compute_response_maps(im, 5)
+    assert resp.shape == (len(TESTS), 12, 10)
+    assert resp.dtype == np.float32 and resp.flags['C_CONTIGUOUS']
+    assert angle_idx.dtype == np.uint8
+    # border pixels have no orientation, interior ones index into the 12-angle bank
+    assert (angle_idx[:2] == NO_ANGLE).all() and (angle_idx[:, :2] == NO_ANGLE).all()
+    assert (angle_idx[2:-2, 2:-2] < 12).all()
+
+
+def test_compute_response_maps_float32_matches_float64():
+    im = _two_layer_image(seed=1)
+    r32, a32 = compute_response_maps(im, 5)
+    r64, a64 = compute_response_maps(im, 5, dtype=np.float64)
+    assert np.array_equal(a32, a64)
+    assert np.allclose(r32, r64, rtol=1e-6, atol=1e-6)
+    # DoB responds most strongly along the layer boundary
+    dob = normalize_response(r64[TESTS.index("DoB")])
+    assert dob.dtype == np.uint8
+    assert dob[5:7, 2:-2].mean() > dob[2:4, 2:-2].mean()
@@ -0,0 +1,19 @@
+import json
+from williams_2014_edge_detection import regression
+
+
+def test_vectorized_backend_matches_golden_outputs():
+    failures, perf = regression.check_golden(backends=["vectorized"], repeats=2)
+    assert failures == []
+    assert perf["vectorized"]["pixel_angles_per_s"] > 0
+
+
+def test_history_flags_regressions(tmp_path):
+    history = tmp_path / "history.jsonl"
+    perf = {"vectorized": {"wall_s": 1.0, "peak_mb": 10.0, "pixel_angles_per_s": 1000.0}}
+    assert regression.record_history(perf, str(history), max_regression=20) == []
+    slower = {"vectorized": {"wall_s": 1.5, "peak_mb": 10.5, "pixel_angles_per_s": 700.0}}
+    found = regression.record_history(slower, str(history), max_regression=20)
+    assert len(found) == 2 and any("wall_s" in f for f in found) and any("pixel_angles" in f for f in found)
+    assert len(history.read_text().splitlines()) == 2
+    assert json.loads(history.read_text().splitlines()[-1])["metrics"] == slower["vectorized"]
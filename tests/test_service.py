@@ -0,0 +1,34 @@
+import os
+import threading
+import pandas as pd
+from williams_2014_edge_detection import service
+from williams_2014_edge_detection.processing import process_image
+
+
+def test_service_streams_progress_and_caches(tmp_path, two_layer_image):
+    sock = str(tmp_path / "svc.sock")
+    server = service._Server(sock, service._Handler)
+    server.service = service.WarmService()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = service.ServiceClient(sock, timeout=60)
+        assert client.ping()["pong"]
+        im = two_layer_image()
+
+        progress = []
+        rows = client.process_image(im, [5], n_mc=2, seed=3, name="x.png", on_progress=progress.append)
+        assert any("mask size 5" in p for p in progress)
+        local, _, _ = process_image(im, [5], n_mc=2, seed=3, name="x.png")
+        pd.testing.assert_frame_equal(pd.DataFrame(rows), local, check_dtype=False)
+
+        # the repeat is answered from the response cache
+        hits = client.stats()["cache"]["hits"]
+        assert client.process_image(im, [5], n_mc=2, seed=3, name="x.png") == rows
+        assert client.stats()["cache"]["hits"] - hits == 2 * 7
+        assert client.stats()["jobs"] == 2
+    finally:
+        client.shutdown()
+        thread.join(10)
+        server.server_close()
+        os.unlink(sock)
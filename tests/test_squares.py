@@ -0,0 +1,74 @@
+import numpy as np
+from phantom.squares import iter_layer_pairs, gamma_sweep
+from williams_2014_edge_detection.processing import process_image
+
+GAMMA = {"background": {"shape": 2.0, "scale": 0.02}, "NFL": {"shape": 8.0, "scale": 0.06}}
+
+
+def test_iter_layer_pairs_is_reproducible_and_carries_gt():
+    a = list(iter_layer_pairs(GAMMA, [("background", "NFL")], img_size=10, seed=3, replicates=2))
+    b = list(iter_layer_pairs(GAMMA, [("background", "NFL")], img_size=10, seed=3, replicates=2))
+    assert [s.name for s in a] == ["0_background_NFL_r0", "0_background_NFL_r1"]
+    assert all(np.array_equal(x.image, y.image) for x, y in zip(a, b))
+    assert not np.array_equal(a[0].image, a[1].image)
+    assert a[0].image.dtype == np.uint8 and a[0].image.shape == (10, 10)
+    assert a[0].gt[5].all() and a[0].gt.sum() == 10
+    assert a[0].params["lower_params"] == GAMMA["NFL"]
+
+
+def test_gamma_sweep_grid():
+    sets = list(gamma_sweep(GAMMA, "NFL", shapes=[1, 2], scales=[0.1, 0.2, 0.3]))
+    assert len(sets) == 6
+    assert sets[-1]["NFL"] == {"shape": 2.0, "scale": 0.3}
+    assert all(s["background"] == GAMMA["background"] for s in sets)
+
+
+def test_process_image_accepts_in_memory_sample():
+    sample = next(iter_layer_pairs(GAMMA, [("background", "NFL")], img_size=12))
+    df, im, gt = process_image(sample.image, [5], n_mc=1, gt=sample.gt, name=sample.name)
+    assert im is sample.image and gt is sample.gt
+    assert len(df) == 7 and df["pcm_mean"].notna().all()
+
+
+def test_rotated_pairs_assign_layers_by_boundary_side():
+    from phantom.squares import rotated_pairs, boundary_gt, lower_coverage, horizontal_gt
+    upper = {"shape": 1.0, "scale": 1.0}
+    lower = {"shape": 1.0, "scale": 1.0}
+    imgs = rotated_pairs(upper, lower, [0, 30, -45], img_size=16, rng=np.random.default_rng(0))
+    assert imgs.shape == (3, 16, 16) and imgs.dtype == np.uint8
+    # at 0 degrees the layout is the horizontal pair: 8 rows each, boundary on row 8
+    cov = lower_coverage(16, [0, 30, -45])
+    assert (cov[0, :8] == 0).all() and (cov[0, 8:] == 1).all()
+    assert np.array_equal(boundary_gt(16, [0])[0], horizontal_gt(16))
+    # odd sizes use the same centre convention as horizontal_gt and the default gt
+    from williams_2014_edge_detection.processing import _default_gt
+    assert np.array_equal(boundary_gt(11, [0])[0], horizontal_gt(11))
+    assert np.array_equal(horizontal_gt(11), _default_gt(np.zeros((11, 11), np.uint8)))
+    assert (lower_coverage(11, [0])[0, 5:] == 1).all() and (lower_coverage(11, [0])[0, :5] == 0).all()
+    # ground truth lies on the lower side and is one pixel per column for shallow angles
+    gt = boundary_gt(16, [30])[0]
+    assert (cov[1][gt > 0] == 1).all()
+    assert (gt.sum(axis=0) == 1).all()
+    # anti-aliasing only softens pixels the boundary crosses
+    soft = lower_coverage(16, [30], supersample=4)[0]
+    assert ((soft > 0) & (soft < 1)).any()
+    assert (soft[cov[1] == 1] > 0).all()
+
+
+
+def test_generate_square_set_writes_manifest_and_skips_existing(tmp_path):
+    import json
+    from phantom.squares import generate_square_set, boundary_geometry
+    kw = dict(pairs=[("background", "NFL")], angles=[0, 20], offsets=[0, 3], img_size=12, seed=1, workers=1)
+    m = generate_square_set(str(tmp_path), GAMMA, **kw)
+    assert len(m["images"]) == 4
+    entry = m["images"]["0_background_NFL_a20_o3_r0.png"]
+    assert entry["boundary"] == json.loads(json.dumps(boundary_geometry(12, 20, 3)))
+    assert len(entry["boundary"]["endpoints"]) == 2
+    path = tmp_path / "0_background_NFL_a0_o0_r0.png"
+    mtime = path.stat().st_mtime_ns
+    # appending a replicate only generates the new images; identical settings are skipped
+    m2 = generate_square_set(str(tmp_path), GAMMA, replicates=2, **kw)
+    assert len(m2["images"]) == 8 and path.stat().st_mtime_ns == mtime
+    on_disk = json.loads((tmp_path / "manifest.json").read_text())
+    assert on_disk["images"].keys() == m2["images"].keys()
@@ -0,0 +1,28 @@
+import math
+import numpy as np
+import pytest
+from svgpathtools import CubicBezier, Line, Path
+from phantom.svg_analysis import (angle_of, collect_cubic_angles, cubic_control_points, segment_angles,
+                                  arc_length_weights, angle_histogram, curvature)
+
+
+def test_vectorized_angles_match_per_sample_derivatives():
+    segs = [CubicBezier(0 + 0j, 3 + 4j, 6 - 2j, 10 + 1j), CubicBezier(10 + 1j, 8 + 5j, 4 + 7j, 1 + 3j)]
+    paths = [Path(*segs), Path(Line(0j, 5 + 5j))]
+    ts = np.linspace(0, 1, 7)
+    expected = [(angle_of(s.derivative(t)) + 180) % 360 - 180 for s in segs for t in ts]
+    assert np.allclose(collect_cubic_angles(paths, samples=7), expected)
+    ctrl = cubic_control_points(paths)
+    assert ctrl.shape == (2, 4)
+    assert arc_length_weights(ctrl, 400).sum(axis=1) == pytest.approx([s.length() for s in segs], rel=1e-4)
+
+
+def test_quarter_circle_curvature_and_axial_histogram():
+    # standard cubic approximation of a unit quarter circle
+    c = 4 * (math.sqrt(2) - 1) / 3
+    ctrl = np.array([[1 + 0j, 1 + c * 1j, c + 1j, 1j]])
+    assert np.allclose(curvature(ctrl, 20), 1.0, atol=0.03)
+    hist, edges = angle_histogram(ctrl, bins=2, axial=True)
+    # tangent turns from 90 to 180 degrees, which folds to [-90, 0] (180 itself lands on 0)
+    assert edges[0] == -90 and hist.sum() == pytest.approx(1.0) and hist[0] > 0.98
+    assert segment_angles(ctrl, 3)[0] == pytest.approx([90, 135, -180])
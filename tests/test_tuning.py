@@ -0,0 +1,32 @@
+import json
+import numpy as np
+from williams_2014_edge_detection import tuning
+from williams_2014_edge_detection.processing import compute_response_maps
+
+
+def test_vectorized_backend_matches_loop(two_layer_image):
+    for seed in range(2):
+        im = two_layer_image(seed, shape=(14, 13))
+        r1, a1 = compute_response_maps(im, 5, backend="loop")
+        r2, a2 = compute_response_maps(im, 5, backend="vectorized")
+        assert np.array_equal(a1, a2)
+        assert np.allclose(r1, r2, rtol=1e-6, atol=1e-6)
+
+
+def test_backend_is_tuned_once_and_can_be_forced(tmp_path, monkeypatch, two_layer_image):
+    cache = tmp_path / "tuning.json"
+    monkeypatch.setenv(tuning.CACHE_ENV, str(cache))
+    monkeypatch.delenv(tuning.BACKEND_ENV, raising=False)
+    im = two_layer_image(shape=(14, 13))
+    angles = np.linspace(0, 180, 12, endpoint=False)
+    choice = tuning.select_backend(im, 5, angles, np.float32)
+    entry = json.loads(cache.read_text())[tuning.workload_key(im, 5, 12, np.float32)]
+    assert entry["backend"] == choice and set(entry["us_per_px"]) == {"loop", "vectorized"}
+
+    # the cached decision is reused without benchmarking again
+    monkeypatch.setattr(tuning, "benchmark_backends", lambda *a: 1 / 0)
+    tuning._decisions.clear()
+    assert tuning.select_backend(im, 5, angles, np.float32) == choice
+
+    monkeypatch.setenv(tuning.BACKEND_ENV, "loop")
+    assert tuning.select_backend(im, 5, angles, np.float32) == "loop"
@@ -0,0 +1,43 @@
+import numpy as np
+from williams_2014_edge_detection.volume import open_volume, process_volume
+from williams_2014_edge_detection.processing import compute_response_maps
+
+
+def test_tiled_volume_matches_whole_slice_and_resumes(tmp_path):
+    rng = np.random.default_rng(0)
+    vol = rng.integers(0, 255, size=(2, 11, 9)).astype(np.uint8)
+    vol[:, 6:] //= 3
+    vol_path = str(tmp_path / "stack.npy")
+    np.save(vol_path, vol)
+    out_dir = str(tmp_path / "out")
+
+    res = process_volume(vol_path, out_dir, 5, tile=(4, 5))
+    assert res["tiles_processed"] == 2 * 3 * 2
+    for s in range(2):
+        resp, angle_idx = compute_response_maps(vol[s], 5)
+        assert np.array_equal(res["responses"][s], resp)
+        assert np.array_equal(res["angle_idx"][s], angle_idx)
+    assert res["binary"].shape == (2, 7, 11, 9)
+
+    # a second call finds every slice finished and computes nothing
+    again = process_volume(vol_path, out_dir, 5, tile=(4, 5))
+    assert again["tiles_processed"] == 0
+    assert np.array_equal(again["binary"], res["binary"])
+
+
+def test_open_volume_memmaps_npy(tmp_path):
+    path = str(tmp_path / "single.npy")
+    np.save(path, np.zeros((6, 7), dtype=np.uint8))
+    vol = open_volume(path)
+    assert vol.shape == (1, 6, 7)
+    assert isinstance(vol.base, np.memmap) or isinstance(vol, np.memmap)
+
+
+def test_open_volume_treats_rgb_tiff_as_one_colour_slice(tmp_path):
+    import tifffile
+    path = str(tmp_path / "rgb.tif")
+    rgb = np.random.default_rng(1).integers(0, 255, size=(8, 9, 3)).astype(np.uint8)
+    tifffile.imwrite(path, rgb)
+    assert open_volume(path).shape == (1, 8, 9, 3)
+    res = process_volume(path, str(tmp_path / "out"), 5, tile=(8, 9))
+    assert res["responses"].shape[0] == 1 and res["responses"].shape[2:] == (8, 9)
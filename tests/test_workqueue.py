@@ -0,0 +1,66 @@
+import os
+import time
+from PIL import Image
+from williams_2014_edge_detection import workqueue
+from williams_2014_edge_detection.processing import process_image
+
+
+def test_queue_plan_work_expire_reduce(tmp_path, two_layer_image):
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    for seed, name in enumerate(("a.png", "b.png")):
+        Image.fromarray(two_layer_image(seed)).save(image_dir / name)
+    attempt_dir = str(tmp_path / "attempt_007")
+    os.makedirs(attempt_dir)
+
+    _, n = workqueue.plan(attempt_dir, seed=1, filenames=["a.png", "b.png"], mask_sizes=[5], n_mc=2,
+                          image_dir=str(image_dir))
+    assert n == 4 and workqueue.status(attempt_dir)["pending"] == 4
+
+    # a worker that dies holding a lease: the unit is requeued once the lease is stale
+    unit, lease = workqueue.claim(attempt_dir, "dead-worker")
+    os.utime(lease, (time.time() - 100, time.time() - 100))
+    assert workqueue.requeue_expired(attempt_dir, lease_seconds=50) == 1
+
+    assert workqueue.work(attempt_dir, "w1", max_units=3) == 3
+    assert workqueue.work(attempt_dir, "w2") == 1
+    assert workqueue.status(attempt_dir) == {"pending": 0, "leased": 0, "done": 4}
+    # replanning a finished attempt queues nothing
+    assert workqueue.plan(attempt_dir, seed=1, filenames=["a.png", "b.png"], mask_sizes=[5], n_mc=2,
+                          image_dir=str(image_dir))[1] == 0
+
+    all_df = workqueue.reduce_results(attempt_dir, image_dir=str(image_dir))
+    local, _, _ = process_image(str(image_dir / "b.png"), [5], n_mc=2, seed=1)
+    assert all_df.iloc[7:].reset_index(drop=True).equals(local)
+    assert len(os.listdir(os.path.join(attempt_dir, "tables"))) == 3
+
+
+def test_claim_of_old_pending_unit_starts_a_fresh_lease_and_writes_do_not_collide(tmp_path):
+    import threading
+    from williams_2014_edge_detection.checkpoint import write_json_atomic
+    attempt_dir = str(tmp_path)
+    dirs = workqueue._queue_dirs(attempt_dir)
+    for d in dirs.values():
+        os.makedirs(d)
+    pending = os.path.join(dirs["pending"], "u.json")
+    write_json_atomic(pending, {"id": "u"})
+    os.utime(pending, (time.time() - 100, time.time() - 100))
+    unit, lease = workqueue.claim(attempt_dir, "w")
+    assert unit == {"id": "u"} and workqueue.requeue_expired(attempt_dir, lease_seconds=50) == 0
+
+    # two hosts finishing the same unit write the same file at the same time
+    target = str(tmp_path / "unit.json")
+    errors = []
+
+    def writer():
+        try:
+            for _ in range(50):
+                write_json_atomic(target, {"pcm": [1.0]})
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=writer) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors and not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
@@ -1,11 +1,35 @@
-"""williams_2014_edge_detection package re-exports for compatibility with original single-file module."""
-from .processing import process_image
-from .io_utils import load_gray
-from .display import show_edge_on_black, build_ks_binary_for_display
+"""williams_2014_edge_detection package re-exports for compatibility with original single-file module.
+
+Only constants are imported eagerly; the re-exported functions are resolved on first
+attribute access (PEP 562) so `import williams_2014_edge_detection` does not pull in
+scipy, skimage or pandas.
+"""
+from importlib import import_module
+
 from .constants import *
 
+# re-exported name -> submodule defining it
+_LAZY_ATTRS = {
+    'process_image': 'processing',
+    'load_gray': 'io_utils',
+    'show_edge_on_black': 'display',
+    'build_ks_binary_for_display': 'display',
+}
+
 __all__ = [
     'process_image', 'load_gray', 'show_edge_on_black', 'build_ks_binary_for_display',
     # constants exported via wildcard from constants
 ]
 
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
@@ -0,0 +1,4 @@
+"""`python -m williams_2014_edge_detection serve|submit|ping|stats|stop` (see service.py)."""
+from .service import main
+
+main()
@@ -0,0 +1,329 @@
+"""SQLite catalog of results across attempts.
+
+Every recorded attempt becomes one row in `runs`, along with:
+- its configuration and code version (git commit, with "-dirty" for uncommitted changes);
+- the PCM of every (image, test, mask size, MC iteration, threshold), taken from the
+  attempt's checkpoint units;
+- the per-image summary tables;
+- the location of every output file, with the metadata parsed from its
+  format_image_filename / format_table_filename name.
+
+Images are identified by their file stem, as in output file names. runner and the work
+queue reducer record their attempt automatically. Older attempts can be imported:
+
+    python -m williams_2014_edge_detection.catalog import attempt_002 attempt_003
+    python -m williams_2014_edge_detection.catalog best KS 19 --last 10
+
+The catalog is $WILLIAMS_CATALOG, default results_catalog.sqlite in the project root.
+Query helpers return pandas DataFrames.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import argparse
+import platform
+import subprocess
+
+from .constants import PROJECT_ROOT, TESTS
+
+CATALOG_ENV = "WILLIAMS_CATALOG"
+DEFAULT_CATALOG = os.path.join(PROJECT_ROOT, "results_catalog.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    attempt_dir TEXT UNIQUE NOT NULL,
+    attempt_num INTEGER,
+    kind TEXT,
+    recorded TEXT,
+    code_version TEXT,
+    host TEXT,
+    n_mc INTEGER,
+    seed INTEGER,
+    config TEXT
+);
+CREATE TABLE IF NOT EXISTS pcm (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    image TEXT NOT NULL,
+    test TEXT NOT NULL,
+    mask_size INTEGER NOT NULL,
+    mc INTEGER NOT NULL,
+    threshold_idx INTEGER NOT NULL,
+    high REAL,
+    low REAL,
+    pcm REAL,
+    PRIMARY KEY (run_id, image, test, mask_size, mc, threshold_idx)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS summaries (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    image TEXT NOT NULL,
+    test TEXT NOT NULL,
+    mask_size INTEGER NOT NULL,
+    pcm_mean REAL,
+    pcm_std REAL,
+    PRIMARY KEY (run_id, image, test, mask_size)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS artifacts (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    kind TEXT NOT NULL,
+    what TEXT,
+    image TEXT,
+    test TEXT,
+    mask_size INTEGER,
+    mc INTEGER,
+    threshold_idx INTEGER,
+    best INTEGER,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pcm_by_test_mask ON pcm (test, mask_size, run_id, threshold_idx);
+CREATE INDEX IF NOT EXISTS pcm_by_image ON pcm (image, run_id);
+CREATE INDEX IF NOT EXISTS summaries_by_test_mask ON summaries (test, mask_size, run_id);
+CREATE INDEX IF NOT EXISTS artifacts_by_run ON artifacts (run_id, kind, image);
+"""
+
+# <what>_src-<stem>_attempt-<NNN>_mcTotal-<n>[_mc-<i>_mask-<m>].<ext>
+_FILENAME = re.compile(r"^(?P<what>.+?)_src-(?P<src>.+)_attempt-(?P<attempt>\d+)_mcTotal-(?P<total>\d+)"
+                       r"(?:_mc-(?P<mc>\d+)_mask-(?P<mask>\d+))?\.(?P<ext>[\w.]+)$")
+_BINARY = re.compile(r"^bw_(?P<test>.+)_th(?P<th>\d+)(?P<best>_best)?$")
+
+
+def catalog_path():
+    return os.environ.get(CATALOG_ENV) or DEFAULT_CATALOG
+
+
+def connect(path=None):
+    """Open (creating if needed) the catalog database."""
+    conn = sqlite3.connect(path or catalog_path())
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def code_version():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+        if not commit:
+            return "unknown"
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=PROJECT_ROOT,
+                               capture_output=True, text=True, timeout=10).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def parse_output_filename(fname):
+    """Metadata encoded in an output file name, or None if it does not follow the naming scheme."""
+    m = _FILENAME.match(fname)
+    if m is None:
+        return None
+    info = {"what": m["what"], "image": m["src"], "attempt_num": int(m["attempt"]), "n_mc": int(m["total"]),
+            "mc": int(m["mc"]) if m["mc"] else None, "mask_size": int(m["mask"]) if m["mask"] else None,
+            "test": None, "threshold_idx": None, "best": None}
+    b = _BINARY.match(m["what"])
+    if b is not None:
+        # file names number thresholds from 1
+        info.update(test=b["test"], threshold_idx=int(b["th"]) - 1, best=int(bool(b["best"])))
+    elif m["what"].startswith("pcm_"):
+        info["test"] = m["what"][4:]
+    return info
+
+
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def record_attempt(attempt_dir, kind="runner", image_dir=None, conn=None):
+    """Record (or re-record) one attempt directory; returns its run_id.
+
+    PCM values of every threshold come from the checkpoint units listed by run_config.json
+    (attempts without one only get summaries and artifacts). Their high/low thresholds are
+    the run's own (highs, low_ratio in run_config.json); attempts started before those were
+    stored get NULL.
+    """
+    import pandas as pd
+    from .checkpoint import RunCheckpoint, attempt_number, load_run_config
+    from .constants import IMAGE_DIR
+
+    attempt_dir = os.path.abspath(attempt_dir)
+    attempt_num = attempt_number(attempt_dir)
+    config = load_run_config(attempt_dir) or {}
+    image_dir = image_dir or IMAGE_DIR
+    own = conn is None
+    conn = conn or connect()
+    start = time.perf_counter()
+    highs = config.get("highs") or []
+    low_ratio = config.get("low_ratio")
+
+    pcm_rows, summary_rows, artifact_rows = [], [], []
+    if config:
+        checkpoint = RunCheckpoint(attempt_dir, attempt_num, config["n_mc"])
+        for fname in config["filenames"]:
+            path = os.path.join(image_dir, fname)
+            for mc in range(1, config["n_mc"] + 1):
+                for msize in config["mask_sizes"]:
+                    for t in TESTS:
+                        unit = checkpoint.load_pcm(path, mc, msize, t)
+                        if unit is None:
+                            continue
+                        for th_idx, value in enumerate(unit["pcm"]):
+                            high = highs[th_idx] if th_idx < len(highs) else None
+                            pcm_rows.append((_stem(fname), t, msize, mc, th_idx, high,
+                                             None if high is None or low_ratio is None else low_ratio * high, value))
+
+    n_mc_seen = None
+    for root, _, files in os.walk(attempt_dir):
+        for fname in sorted(files):
+            info = parse_output_filename(fname)
+            if info is None:
+                continue
+            path = os.path.join(root, fname)
+            sub = os.path.relpath(root, attempt_dir).split(os.sep)
+            kind_dir = sub[-1] if sub != ["."] else "root"
+            artifact_rows.append((kind_dir, info["what"], info["image"], info["test"], info["mask_size"],
+                                  info["mc"], info["threshold_idx"], info["best"], path))
+            n_mc_seen = info["n_mc"]
+            if kind_dir == "tables" and info["what"] == "results" and fname.endswith(".csv"):
+                try:
+                    df = pd.read_csv(path)
+                except Exception as e:
+                    print(f"  Could not read table {path}: {e}")
+                    continue
+                for r in df.itertuples(index=False):
+                    summary_rows.append((info["image"], r.test, int(r.mask_size), float(r.pcm_mean), float(r.pcm_std)))
+
+    with conn:
+        row = conn.execute("SELECT run_id FROM runs WHERE attempt_dir = ?", (attempt_dir,)).fetchone()
+        values = (attempt_num, kind, time.strftime("%Y-%m-%d %H:%M:%S"), code_version(), platform.node(),
+                  config.get("n_mc", n_mc_seen), config.get("seed"), json.dumps(config))
+        if row is None:
+            run_id = conn.execute("INSERT INTO runs (attempt_dir, attempt_num, kind, recorded, code_version, host, "
+                                  "n_mc, seed, config) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                  (attempt_dir,) + values).lastrowid
+        else:
+            run_id = row[0]
+            conn.execute("UPDATE runs SET attempt_num = ?, kind = ?, recorded = ?, code_version = ?, host = ?, "
+                         "n_mc = ?, seed = ?, config = ? WHERE run_id = ?", values + (run_id,))
+            for table in ("pcm", "summaries", "artifacts"):
+                conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+        conn.executemany("INSERT INTO pcm VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [(run_id,) + r for r in pcm_rows])
+        conn.executemany("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?)",
+                         [(run_id,) + r for r in summary_rows])
+        conn.executemany("INSERT INTO artifacts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         [(run_id,) + r for r in artifact_rows])
+    if own:
+        conn.close()
+    print(f"Catalogued {os.path.basename(attempt_dir)} as run {run_id}: {len(pcm_rows)} PCM values, "
+          f"{len(summary_rows)} summary rows, {len(artifact_rows)} artifacts ({time.perf_counter() - start:.1f}s)")
+    return run_id
+
+
+def _query(sql, params=(), conn=None):
+    import pandas as pd
+
+    own = conn is None
+    conn = conn or connect()
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        if own:
+            conn.close()
+
+
+def _last_runs_clause(last, column="run_id"):
+    if last is None:
+        return "", ()
+    return f" AND {column} IN (SELECT run_id FROM runs ORDER BY run_id DESC LIMIT ?)", (int(last),)
+
+
+def runs(last=None, conn=None):
+    """Recorded runs, newest first."""
+    sql = "SELECT * FROM runs ORDER BY run_id DESC"
+    return _query(sql + (" LIMIT ?" if last is not None else ""), (int(last),) if last is not None else (), conn)
+
+
+def pcm_values(test=None, mask_size=None, image=None, last=None, conn=None):
+    """Per-threshold PCM rows, filtered by any of test, mask size, image stem and the last N runs."""
+    where, params = ["1 = 1"], []
+    for col, val in (("test", test), ("mask_size", mask_size), ("image", image)):
+        if val is not None:
+            where.append(f"{col} = ?")
+            params.append(val)
+    clause, extra = _last_runs_clause(last)
+    return _query(f"SELECT * FROM pcm WHERE {' AND '.join(where)}{clause}", tuple(params) + extra, conn)
+
+
+def best_thresholds(test, mask_size, last=None, conn=None):
+    """Threshold with the highest PCM averaged over images and MC iterations, per run.
+
+    Columns: run_id, attempt_num, threshold_idx, high, low, mean_pcm, n.
+    """
+    clause, extra = _last_runs_clause(last)
+    sql = f"""
+        WITH per_threshold AS (
+            SELECT run_id, threshold_idx, high, low, AVG(pcm) AS mean_pcm, COUNT(*) AS n
+            FROM pcm WHERE test = ? AND mask_size = ?{clause}
+            GROUP BY run_id, threshold_idx
+        ), ranked AS (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY run_id ORDER BY mean_pcm DESC, threshold_idx) AS rank
+            FROM per_threshold
+        )
+        SELECT ranked.run_id, runs.attempt_num, threshold_idx, high, low, mean_pcm, n
+        FROM ranked JOIN runs USING (run_id) WHERE rank = 1 ORDER BY ranked.run_id DESC
+    """
+    return _query(sql, (test, int(mask_size)) + extra, conn)
+
+
+def summaries(test=None, mask_size=None, last=None, conn=None):
+    """Summary-table rows (pcm_mean, pcm_std per image, test and mask size) with the run's attempt number."""
+    where, params = ["1 = 1"], []
+    for col, val in (("test", test), ("mask_size", mask_size)):
+        if val is not None:
+            where.append(f"{col} = ?")
+            params.append(val)
+    clause, extra = _last_runs_clause(last, "summaries.run_id")
+    sql = (f"SELECT summaries.*, runs.attempt_num FROM summaries JOIN runs USING (run_id) "
+           f"WHERE {' AND '.join(where)}{clause}")
+    return _query(sql, tuple(params) + extra, conn)
+
+
+def artifacts(run_id=None, kind=None, image=None, best_only=False, conn=None):
+    """Output files with their parsed metadata."""
+    where, params = ["1 = 1"], []
+    for col, val in (("run_id", run_id), ("kind", kind), ("image", image)):
+        if val is not None:
+            where.append(f"{col} = ?")
+            params.append(val)
+    if best_only:
+        where.append("best = 1")
+    return _query(f"SELECT * FROM artifacts WHERE {' AND '.join(where)}", tuple(params), conn)
+
+
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Results catalog across attempts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="Record attempt directories")
+    p_import.add_argument("attempts", nargs="+")
+    p_runs = sub.add_parser("runs", help="List recorded runs")
+    p_runs.add_argument("--last", type=int, default=None)
+    p_best = sub.add_parser("best", help="Best threshold per run for a test and mask size")
+    p_best.add_argument("test", choices=TESTS)
+    p_best.add_argument("mask_size", type=int)
+    p_best.add_argument("--last", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    with pd.option_context("display.width", 160, "display.max_columns", 20):
+        if args.command == "import":
+            for a in args.attempts:
+                record_attempt(a if os.path.isabs(a) else os.path.join(PROJECT_ROOT, a), kind="import")
+        elif args.command == "runs":
+            print(runs(args.last).drop(columns=["config"]).to_string(index=False))
+        else:
+            print(best_thresholds(args.test, args.mask_size, args.last).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
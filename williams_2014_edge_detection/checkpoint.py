@@ -0,0 +1,170 @@
+"""Work-unit checkpoints inside an attempt directory, so interrupted runs can resume.
+
+A run is split into units:
+  maps  (image, MC iteration, mask size)        -> stacked response maps + angle map
+  pcm   (image, MC iteration, mask size, test)  -> PCM score for every high threshold
+
+Each finished unit is written atomically (temporary file + os.replace) under
+<attempt_dir>/checkpoints/, so a unit file either exists complete or not at all. A
+resumed run skips every unit whose pcm file exists and recomputes response maps only
+when neither the maps nor all of the unit's test scores are on disk; maps units are
+deleted once every test of the unit is scored. The run
+configuration is stored in <attempt_dir>/run_config.json and must match on resume.
+With a fixed seed the MC noise of every (image, iteration) is reproducible, so resumed
+and uninterrupted runs give identical tables.
+"""
+import json
+import os
+import re
+import uuid
+import zlib
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .constants import HIGHS, LOW_RATIO, G_PCM
+from .saving import format_image_filename
+
+CHECKPOINT_DIR = "checkpoints"
+RUN_CONFIG = "run_config.json"
+# scoring parameters stored in the run configuration; attempts started before they were stored lack them
+SCORING_KEYS = ("highs", "low_ratio", "g_pcm")
+
+
+def _tmp_path(path: str) -> str:
+    # unique per writer: after a lease expiry two hosts may finish the same unit at once
+    return f"{path}.{uuid.uuid4().hex}.tmp"
+
+
+def write_json_atomic(path: str, obj):
+    tmp = _tmp_path(path)
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def mc_noise_rng(seed: int, source_path: str, mc_idx: int) -> np.random.Generator:
+    """RNG of the MC noise for one (image, iteration), independent of processing order."""
+    key = zlib.crc32(os.path.basename(str(source_path)).encode("utf-8"))
+    return np.random.default_rng([seed, key, mc_idx])
+
+
+def attempt_number(attempt_dir: str) -> int:
+    """Attempt number from a directory named like attempt_002."""
+    m = re.search(r'_(\d+)$', os.path.basename(os.path.normpath(attempt_dir)))
+    if m is None:
+        raise ValueError(f"Not an attempt directory: {attempt_dir}")
+    return int(m.group(1))
+
+
+class RunCheckpoint:
+    """Reads and writes the unit files of one attempt directory."""
+
+    def __init__(self, attempt_dir: str, attempt_num: int, n_mc: int):
+        self.attempt_dir = attempt_dir
+        self.attempt_num = attempt_num
+        self.n_mc = n_mc
+        self.maps_dir = os.path.join(attempt_dir, CHECKPOINT_DIR, "maps")
+        self.pcm_dir = os.path.join(attempt_dir, CHECKPOINT_DIR, "pcm")
+        os.makedirs(self.maps_dir, exist_ok=True)
+        os.makedirs(self.pcm_dir, exist_ok=True)
+
+    def maps_path(self, source_path: str, mc_idx: int, msize: int) -> str:
+        fname = format_image_filename("maps", source_path, self.attempt_num, self.n_mc, mc_idx, msize, ext=".npz")
+        return os.path.join(self.maps_dir, fname)
+
+    def pcm_path(self, source_path: str, mc_idx: int, msize: int, test: str) -> str:
+        fname = format_image_filename(f"pcm_{test}", source_path, self.attempt_num, self.n_mc, mc_idx, msize,
+                                      ext=".json")
+        return os.path.join(self.pcm_dir, fname)
+
+    def load_pcm(self, source_path: str, mc_idx: int, msize: int, test: str) -> Optional[Dict[str, Any]]:
+        path = self.pcm_path(source_path, mc_idx, msize, test)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_pcm(self, source_path: str, mc_idx: int, msize: int, test: str, pcm_scores):
+        scores = [float(v) for v in pcm_scores]
+        best_idx = int(np.nanargmax(scores)) if scores else 0
+        best_pcm = float(np.max(scores)) if scores else float("nan")
+        write_json_atomic(self.pcm_path(source_path, mc_idx, msize, test),
+                          {"pcm": scores, "best_idx": best_idx, "best_pcm": best_pcm})
+
+    def load_maps(self, source_path: str, mc_idx: int, msize: int):
+        """(resp, angle_idx) of a finished maps unit, or None."""
+        path = self.maps_path(source_path, mc_idx, msize)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return data["resp"], data["angle_idx"]
+
+    def save_maps(self, source_path: str, mc_idx: int, msize: int, resp, angle_idx, angles):
+        path = self.maps_path(source_path, mc_idx, msize)
+        tmp = _tmp_path(path)
+        try:
+            # a file object, so np.savez does not append .npz to the temporary name
+            with open(tmp, "wb") as f:
+                np.savez(f, resp=np.ascontiguousarray(resp), angle_idx=angle_idx,
+                         angles=np.asarray(angles, dtype=float))
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def drop_maps(self, source_path: str, mc_idx: int, msize: int):
+        """Remove a maps unit once all of its tests are scored; it is only needed to resume them."""
+        try:
+            os.remove(self.maps_path(source_path, mc_idx, msize))
+        except FileNotFoundError:
+            pass
+
+
+def load_run_config(attempt_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(attempt_dir, RUN_CONFIG)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def make_run_config(filenames, mask_sizes, n_mc: int, seed) -> Dict[str, Any]:
+    """Run configuration of a new attempt, including the thresholds and PCM tolerance it is scored with."""
+    return {"filenames": list(filenames), "mask_sizes": list(mask_sizes), "n_mc": n_mc, "seed": seed,
+            "highs": [float(h) for h in HIGHS], "low_ratio": float(LOW_RATIO), "g_pcm": G_PCM}
+
+
+def same_run_config(saved: Dict[str, Any], config: Dict[str, Any]) -> bool:
+    """Whether a stored run configuration matches `config`; scoring keys the stored one lacks are not compared."""
+    return saved == {k: v for k, v in config.items() if k in saved or k not in SCORING_KEYS}
+
+
+def save_run_config(attempt_dir: str, config: Dict[str, Any]):
+    write_json_atomic(os.path.join(attempt_dir, RUN_CONFIG), config)
+
+
+def load_results(checkpoint: RunCheckpoint, source_path: str, tests, mask_sizes, n_mc: int):
+    """results[test][mask_size] lists of best PCMs from pcm units, in MC order, plus missing units.
+
+    Returns (results, missing) where missing lists (mc_idx, mask_size, test) without a file.
+    """
+    results = {t: {m: [] for m in mask_sizes} for t in tests}
+    missing = []
+    for mc_idx in range(1, n_mc + 1):
+        for m in mask_sizes:
+            for t in tests:
+                unit = checkpoint.load_pcm(source_path, mc_idx, m, t)
+                if unit is None:
+                    missing.append((mc_idx, m, t))
+                else:
+                    results[t][m].append(unit["best_pcm"])
+    return results, missing
@@ -31,3 +31,9 @@ LOW_RATIO = 0.4
 N_CHI_BINS = 16
 # whether to display figures
 DISPLAY = True
+# statistical tests, in the order of the stacked response maps
+TESTS = ["DoB", "T", "F", "L", "U", "KS", "v2"]
+# dtype of the (n_tests, H, W) response maps; use np.float64 for validation runs
+RESPONSE_DTYPE = np.float32
+# angle-map index marking pixels with no orientation (mask does not fit)
+NO_ANGLE = 255
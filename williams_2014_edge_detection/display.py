@@ -1,5 +1,4 @@
 import numpy as np
-from skimage.morphology import thin
 from .masks import make_dual_region_mask
 from .stats_tests import compute_tests_region
 from .nms_and_thresh import non_max_suppression, hysteresis_and_binary
@@ -36,6 +35,8 @@ def build_ks_binary_for_display(image_path, display_mask, high_threshold=None, a
     Optional `angles` list can be provided to restrict orientations (e.g., [90] for top/bottom split).
     Returns binary thin edge image (uint8).
     """
+    from skimage.morphology import thin
+
     im = load_gray(image_path)
     H, W = im.shape
     responses = np.zeros_like(im, dtype=float)
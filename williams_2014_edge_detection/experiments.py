@@ -0,0 +1,334 @@
+"""Experiment grids: run every combination of a parameter grid while computing shared work once.
+
+A spec is a JSON (or TOML) file:
+
+    {"name": "low_ratio_sweep",
+     "images": ["0_background_NFL.png", "1_NFL_GCL.png"],   # default: FILENAMES in IMAGE_DIR
+     "seed": 0,
+     "grid": {"mask_size": [15, 19],
+              "n_mc": [5],
+              "highs": [{"linspace": [240, 20, 12]}],        # or explicit lists of thresholds
+              "low_ratio": [0.3, 0.4, 0.5],
+              "g_pcm": [1, 2],
+              "angles": ["default", 8],                       # "default", a count, or a list of degrees
+              "tests": ["all", ["DoB", "KS"]]}}
+
+Grid keys left out use the values in constants.py. Every configuration is expanded into
+a DAG of stage nodes
+
+    load -> noise replicate -> response maps -> NMS -> threshold sweep -> PCM
+
+where a node is identified by its parameters and its parent, so configurations that
+agree up to some stage share those nodes: a LOW_RATIO or G_PCM sweep reuses the
+response maps and NMS, an N_MC sweep reuses the first replicates, and a test subset reuses
+the maps of the full run. Each noise replicate with everything below it is one pool
+task. Maps, NMS, sweep and PCM nodes are cached on disk under `cache_dir` by a hash
+of their key. Rerunning or extending a spec only computes the new nodes.
+
+    python -m williams_2014_edge_detection.experiments spec.json --workers 8
+"""
+import os
+import json
+import hashlib
+import argparse
+import itertools
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .constants import (PROJECT_ROOT, IMAGE_DIR, FILENAMES, MASK_SIZES, N_MC, G_PCM, HIGHS, LOW_RATIO,
+                        TESTS)
+from .checkpoint import write_json_atomic
+
+STAGES = ("load", "noise", "maps", "nms", "sweep", "pcm")
+CACHED_STAGES = ("maps", "nms", "sweep", "pcm")
+CACHE_DIR = os.path.join(PROJECT_ROOT, "experiment_cache")
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "experiments")
+
+
+def load_spec(path):
+    """Read a JSON or (by extension) TOML experiment spec."""
+    if path.lower().endswith(".toml"):
+        import tomllib
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _highs(value):
+    if isinstance(value, dict):
+        start, stop, num = value["linspace"]
+        value = np.linspace(start, stop, int(num))
+    return tuple(float(h) for h in value)
+
+
+def _angles(value, msize):
+    from .masks import default_angles
+
+    if value is None or value == "default":
+        value = default_angles(msize)
+    elif isinstance(value, int):
+        value = np.linspace(0, 180, value, endpoint=False)
+    return tuple(float(a) for a in value)
+
+
+def _tests(value):
+    if value is None or value == "all":
+        return tuple(TESTS)
+    unknown = [t for t in value if t not in TESTS]
+    if unknown:
+        raise ValueError(f"Unknown tests {unknown}; expected a subset of {TESTS}")
+    return tuple(value)
+
+
+def expand_grid(grid):
+    """All configurations of a grid dict, with defaults from constants and values normalized."""
+    defaults = {"mask_size": list(MASK_SIZES), "n_mc": [N_MC], "highs": [HIGHS], "low_ratio": [LOW_RATIO],
+                "g_pcm": [G_PCM], "angles": ["default"], "tests": ["all"]}
+    unknown = set(grid) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown grid keys: {sorted(unknown)}")
+    axes = {k: grid.get(k, v) for k, v in defaults.items()}
+    configs = []
+    for values in itertools.product(*axes.values()):
+        c = dict(zip(axes, values))
+        msize = int(c["mask_size"])
+        configs.append({"mask_size": msize, "n_mc": int(c["n_mc"]), "highs": _highs(c["highs"]),
+                        "low_ratio": float(c["low_ratio"]), "g_pcm": int(c["g_pcm"]),
+                        "angles": _angles(c["angles"], msize), "tests": _tests(c["tests"])})
+    return configs
+
+
+def _node_file(cache_dir, key):
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:24]
+    ext = ".json" if key[0] == "pcm" else ".npz"
+    return os.path.join(cache_dir, key[0], digest + ext)
+
+
+def _cache_load(cache_dir, key):
+    path = _node_file(cache_dir, key)
+    if not os.path.exists(path):
+        return None
+    if key[0] == "pcm":
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    with np.load(path) as data:
+        if key[0] == "maps":
+            return data["resp"], data["angle_idx"]
+        return data["value"]
+
+
+def _cache_save(cache_dir, key, value):
+    path = _node_file(cache_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if key[0] == "pcm":
+        write_json_atomic(path, value)
+        return
+    tmp = path + ".tmp.npz"
+    if key[0] == "maps":
+        np.savez(tmp, resp=value[0], angle_idx=value[1])
+    else:
+        np.savez(tmp, value=value)
+    os.replace(tmp, path)
+
+
+def _compute(key, parent_value):
+    from .checkpoint import mc_noise_rng
+    from .metrics import compute_pcm_binary
+    from .processing import mc_image, compute_response_maps, nms_map, threshold_sweep
+
+    stage = key[0]
+    if stage == "noise":
+        name, _, seed, mc_idx = key[2:]
+        if mc_idx == 0:
+            return parent_value.copy()
+        return mc_image(parent_value, mc_idx, 2, mc_noise_rng(seed, name, mc_idx))
+    if stage == "maps":
+        msize, angles = key[2:]
+        return compute_response_maps(parent_value, msize, np.asarray(angles))
+    if stage == "nms":
+        resp, angle_idx = parent_value
+        angles = np.asarray(key[1][3])
+        return nms_map(resp[TESTS.index(key[2])], angle_idx, angles)
+    if stage == "sweep":
+        highs, low_ratio = key[2:]
+        return np.stack(threshold_sweep(parent_value, highs, low_ratio))
+    if stage == "pcm":
+        # default ground truth: single-pixel horizontal edge on the middle row, as in process_image
+        gt = np.zeros(parent_value.shape[1:], dtype=np.uint8)
+        gt[gt.shape[0] // 2, :] = 1
+        return [float(compute_pcm_binary(bw, gt, g=key[2])) for bw in parent_value]
+    raise ValueError(f"Unknown stage {stage!r}")
+
+
+def _evaluate(key, memo, cache_dir, image):
+    if key in memo:
+        return memo[key]
+    value = _cache_load(cache_dir, key) if key[0] in CACHED_STAGES else None
+    if value is None:
+        if key[0] == "load":
+            value = image
+        else:
+            value = _compute(key, _evaluate(key[1], memo, cache_dir, image))
+        if key[0] in CACHED_STAGES:
+            _cache_save(cache_dir, key, value)
+    memo[key] = value
+    return value
+
+
+def _run_task(pcm_keys, image, cache_dir):
+    """Evaluate the PCM nodes below one noise replicate; shared parents are computed once."""
+    memo = {}
+    return {key: _evaluate(key, memo, cache_dir, image) for key in pcm_keys}
+
+
+class ExperimentPlan:
+    """Deduplicated stage DAG of all configurations x images x MC replicates."""
+
+    def __init__(self, configs, images, seed):
+        # images: {name: uint8 array}
+        self.configs = configs
+        self.images = images
+        self.seed = seed
+        self.nodes = set()
+        self.naive = Counter()
+        # (config index, image name, test, mc index, pcm key) per leaf of every configuration
+        self.targets = []
+        loads = {name: ("load", None, name, hashlib.sha1(im.tobytes() + repr(im.shape).encode()).hexdigest())
+                 for name, im in images.items()}
+        for c_idx, c in enumerate(configs):
+            for name in images:
+                self._add(loads[name])
+                for mc_idx in range(1, c["n_mc"] + 1):
+                    noise = self._add(("noise", loads[name], name, loads[name][3], seed,
+                                       mc_idx if c["n_mc"] > 1 else 0))
+                    maps = self._add(("maps", noise, c["mask_size"], c["angles"]))
+                    for t in c["tests"]:
+                        nms = self._add(("nms", maps, t))
+                        sweep = self._add(("sweep", nms, c["highs"], c["low_ratio"]))
+                        pcm = self._add(("pcm", sweep, c["g_pcm"]))
+                        self.targets.append((c_idx, name, t, mc_idx, pcm))
+
+    def _add(self, key):
+        self.naive[key[0]] += 1
+        self.nodes.add(key)
+        return key
+
+    def planned(self):
+        return Counter(key[0] for key in self.nodes)
+
+    def cached(self, cache_dir):
+        return Counter(key[0] for key in self.nodes
+                       if key[0] in CACHED_STAGES and os.path.exists(_node_file(cache_dir, key)))
+
+    def summary(self, cache_dir=None):
+        planned = self.planned()
+        cached = self.cached(cache_dir) if cache_dir is not None else Counter()
+        lines = [f"{'stage':<8}{'naive':>10}{'planned':>10}{'cached':>10}"]
+        for stage in STAGES:
+            lines.append(f"{stage:<8}{self.naive[stage]:>10}{planned[stage]:>10}{cached[stage]:>10}")
+        return "\n".join(lines)
+
+    def tasks(self, cache_dir):
+        """{noise key: PCM keys not cached yet}, one pool task per noise replicate."""
+        by_noise = defaultdict(set)
+        for *_, pcm in self.targets:
+            if not os.path.exists(_node_file(cache_dir, pcm)):
+                # pcm -> sweep -> nms -> maps -> noise
+                by_noise[pcm[1][1][1][1]].add(pcm)
+        return {noise: sorted(keys, key=repr) for noise, keys in by_noise.items()}
+
+
+def _config_columns(c):
+    angles = c["angles"]
+    return {"mask_size": c["mask_size"], "n_mc": c["n_mc"], "low_ratio": c["low_ratio"], "g_pcm": c["g_pcm"],
+            "n_angles": len(angles), "tests": "all" if c["tests"] == tuple(TESTS) else "+".join(c["tests"]),
+            "highs": f"{c['highs'][0]:g}..{c['highs'][-1]:g}/{len(c['highs'])}"}
+
+
+def run_experiment(spec, cache_dir=CACHE_DIR, workers=None, image_dir=None, dry_run=False):
+    """Plan and run an experiment spec (dict); returns the results DataFrame (None for dry runs).
+
+    One row per (configuration, image, test) with the configuration columns and the mean
+    and standard deviation over MC replicates of the best PCM across thresholds, like
+    process_image's table.
+    """
+    import pandas as pd
+    from .io_utils import load_gray
+
+    image_dir = image_dir or spec.get("image_dir") or IMAGE_DIR
+    seed = int(spec.get("seed", 0))
+    configs = expand_grid(spec.get("grid", {}))
+    images = {}
+    for fname in spec.get("images", FILENAMES):
+        path = os.path.join(image_dir, fname)
+        if not os.path.exists(path):
+            print(f"File not found: {path}. Skipping.")
+            continue
+        images[fname] = load_gray(path)
+
+    plan = ExperimentPlan(configs, images, seed)
+    print(f"Experiment '{spec.get('name', 'experiment')}': {len(configs)} configurations x {len(images)} images")
+    print(plan.summary(cache_dir))
+    if dry_run:
+        return None
+
+    tasks = plan.tasks(cache_dir)
+    scores = {}
+    if tasks:
+        print(f"Running {len(tasks)} replicate tasks")
+        # noise key -> ("load", None, image name, digest) -> image array
+        args = [(keys, images[noise[1][2]], cache_dir) for noise, keys in tasks.items()]
+        if workers == 1:
+            for done, a in enumerate(args, start=1):
+                scores.update(_run_task(*a))
+                print(f"  {done}/{len(args)} tasks finished")
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_run_task, *a) for a in args]
+                for done, fut in enumerate(futures, start=1):
+                    scores.update(fut.result())
+                    print(f"  {done}/{len(futures)} tasks finished")
+    else:
+        print("All nodes cached; nothing to compute")
+
+    best = defaultdict(list)
+    for c_idx, name, t, mc_idx, pcm in plan.targets:
+        values = scores.get(pcm)
+        if values is None:
+            values = _cache_load(cache_dir, pcm)
+        best[(c_idx, name, t)].append(float(np.max(values)) if values else np.nan)
+
+    rows = []
+    for (c_idx, name, t), vals in best.items():
+        arr = np.array(vals, dtype=float)
+        rows.append({"config": c_idx, **_config_columns(configs[c_idx]), "image": name, "test": t,
+                     "pcm_mean": np.mean(arr), "pcm_std": np.std(arr, ddof=1) if arr.size > 1 else 0.0})
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a deduplicated experiment grid")
+    parser.add_argument("spec", help="JSON or TOML experiment spec")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--cache", default=CACHE_DIR, help="Node cache directory")
+    parser.add_argument("--out", default=None, help="Results CSV (default: experiments/<name>.csv)")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the planned vs naive counts")
+    args = parser.parse_args(argv)
+
+    spec = load_spec(args.spec)
+    df = run_experiment(spec, cache_dir=args.cache, workers=args.workers, dry_run=args.dry_run)
+    if df is None:
+        return
+    out = args.out or os.path.join(RESULTS_DIR, f"{spec.get('name', 'experiment')}.csv")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    tmp = out + ".tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, out)
+    print(f"Saved results to: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Store of decoded 8-bit grayscale images, handed out as read-only memory maps.
+
+io_utils.load_gray decodes each PNG with skimage and, for colour images, converts it to
+gray in float64. With the store, the uint8 result is kept as a .npy file, and later loads
+memory-map that file, so repeated loads do no decoding and are served from the page cache.
+
+Layout (default .image_cache/ in the project root):
+
+    index/<sha1 of the source path>.json   source path, size, mtime and content hash
+    <content sha256>-v<FORMAT_VERSION>.npy  the decoded image
+
+A load whose file size and mtime match the index uses the .npy directly. If they changed,
+the file is hashed again: identical content reuses the stored image, and anything else is
+decoded again. Files with the same content share one .npy. Writes are atomic (temporary
+file + os.replace), so runs that share the store can load and warm it at the same time.
+
+Set $WILLIAMS_IMAGE_STORE to another directory to move the store, or to "off" to disable it.
+
+    python -m williams_2014_edge_detection.image_store warm [paths or directories ...]
+    python -m williams_2014_edge_detection.image_store purge [paths ...]
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+import tempfile
+
+import numpy as np
+
+from .constants import PROJECT_ROOT, IMAGE_DIR
+
+STORE_ENV = "WILLIAMS_IMAGE_STORE"
+DEFAULT_STORE = os.path.join(PROJECT_ROOT, ".image_cache")
+# bump when io_utils.to_gray_uint8 changes its output
+FORMAT_VERSION = 1
+IMAGE_EXTENSIONS = (".png", ".tif", ".tiff", ".jpg", ".jpeg", ".bmp")
+
+
+def store_dir():
+    """Store directory, or None when the store is disabled."""
+    value = os.environ.get(STORE_ENV)
+    if value is not None and value.strip().lower() in ("off", "0", "no", "false", "none"):
+        return None
+    return value or DEFAULT_STORE
+
+
+def file_sha256(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _index_path(root, source):
+    return os.path.join(root, "index", hashlib.sha1(source.encode("utf-8")).hexdigest() + ".json")
+
+
+def _npy_path(root, digest):
+    return os.path.join(root, f"{digest}-v{FORMAT_VERSION}.npy")
+
+
+def _replace_atomic(path, write):
+    # unique temporary name, so concurrent writers of the same entry do not collide
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _read_index(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load(path, root=None):
+    """Grayscale uint8 image of `path` as a read-only memmap, decoding it only when not stored."""
+    from .io_utils import decode_gray
+
+    root = root or store_dir()
+    source = os.path.abspath(path)
+    st = os.stat(source)
+    index_path = _index_path(root, source)
+    entry = _read_index(index_path)
+    if entry is not None and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns \
+            and entry.get("version") == FORMAT_VERSION:
+        npy = _npy_path(root, entry["sha256"])
+        if os.path.exists(npy):
+            return np.load(npy, mmap_mode="r")
+
+    digest = file_sha256(source)
+    npy = _npy_path(root, digest)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    if not os.path.exists(npy):
+        im = np.ascontiguousarray(decode_gray(source))
+        _replace_atomic(npy, lambda f: np.save(f, im))
+    entry = {"source": source, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest,
+             "version": FORMAT_VERSION}
+    _replace_atomic(index_path, lambda f: f.write(json.dumps(entry).encode("utf-8")))
+    return np.load(npy, mmap_mode="r")
+
+
+def _image_files(paths):
+    for p in paths:
+        if os.path.isdir(p):
+            for name in sorted(os.listdir(p)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(p, name)
+        else:
+            yield p
+
+
+def warm(paths, root=None):
+    """Decode and store every image in `paths` (files or directories); returns the number stored."""
+    root = root or store_dir() or DEFAULT_STORE
+    n = 0
+    for path in _image_files(paths):
+        try:
+            im = load(path, root)
+            n += 1
+            print(f"  {path}: {im.shape[0]}x{im.shape[1]}")
+        except Exception as e:
+            print(f"  {path}: failed ({e})")
+    print(f"Stored {n} images in {root}")
+    return n
+
+
+def purge(paths=None, root=None):
+    """Drop the entries of `paths` (files or directories), or the whole store; returns files removed."""
+    import shutil
+
+    root = root or store_dir() or DEFAULT_STORE
+    if not os.path.isdir(root):
+        return 0
+    if not paths:
+        n = sum(len(files) for _, _, files in os.walk(root))
+        shutil.rmtree(root)
+        print(f"Removed {root} ({n} files)")
+        return n
+
+    removed = 0
+    for path in _image_files(paths):
+        index_path = _index_path(root, os.path.abspath(path))
+        if os.path.exists(index_path):
+            os.remove(index_path)
+            removed += 1
+    # images no longer referenced by any index entry
+    index_dir = os.path.join(root, "index")
+    live = set()
+    if os.path.isdir(index_dir):
+        for name in os.listdir(index_dir):
+            entry = _read_index(os.path.join(index_dir, name))
+            if entry is not None:
+                live.add(os.path.basename(_npy_path(root, entry["sha256"])))
+    for name in os.listdir(root):
+        if name.endswith(".npy") and name not in live:
+            os.remove(os.path.join(root, name))
+            removed += 1
+    print(f"Removed {removed} files from {root}")
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decoded image store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("warm", help="Decode and store images (default: the demo image directory)")
+    p.add_argument("paths", nargs="*", default=[IMAGE_DIR])
+    p = sub.add_parser("purge", help="Remove the entries of these images, or the whole store")
+    p.add_argument("paths", nargs="*")
+    args = parser.parse_args(argv)
+
+    if args.command == "warm":
+        warm(args.paths)
+    else:
+        purge(args.paths)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
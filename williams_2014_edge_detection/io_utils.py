@@ -1,12 +1,12 @@
-from skimage import io, color, util
+import os
 import numpy as np
 
 
-def load_gray(path):
-    """Load image as 8-bit grayscale (0..255).
-    Keeps behavior from original module: handles RGB/RGBA and already grayscale images.
+def to_gray_uint8(im):
+    """Convert an already decoded image array to 8-bit grayscale (0..255).
+    Handles RGB/RGBA and already grayscale images of any dtype.
     """
-    im = io.imread(path)
+    from skimage import color, util
 
     # if image is RGBA (4 channels), drop alpha
     if im.ndim == 3 and im.shape[2] == 4:
@@ -21,3 +21,28 @@ def load_gray(path):
 
     return im
 
+
+def decode_gray(path):
+    """Decode an image file to 8-bit grayscale, without the image store."""
+    from skimage import io
+
+    return to_gray_uint8(io.imread(path))
+
+
+def load_gray(path):
+    """Load image as 8-bit grayscale (0..255).
+    Keeps behavior from original module: handles RGB/RGBA and already grayscale images.
+
+    Files go through the decoded image store (see image_store.py) and come back as
+    read-only memmaps; with the store disabled, or if it fails, the file is decoded.
+    """
+    from . import image_store
+
+    if isinstance(path, (str, os.PathLike)) and image_store.store_dir() is not None:
+        try:
+            return image_store.load(path)
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            print(f"Image store unavailable for {path} ({e}); decoding directly")
+    return decode_gray(path)
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 import numpy as np
 
 
@@ -26,3 +28,31 @@ def make_dual_region_mask(size, angle_deg):
     B = (dot < 0) & (~center_mask)
     return A, B
 
+
+@lru_cache(maxsize=32)
+def _cached_bank(size, angles):
+    bank = []
+    for ang in angles:
+        A, B = make_dual_region_mask(size, ang)
+        # shared between callers, so keep them read-only
+        A.flags.writeable = False
+        B.flags.writeable = False
+        bank.append((A, B))
+    return tuple(bank)
+
+
+def mask_bank(size, angles=None):
+    """(A_mask, B_mask) pairs for every angle, built once per (size, angles) and cached.
+
+    The returned masks are read-only; copy them before modifying.
+    """
+    if angles is None:
+        angles = default_angles(size)
+    return _cached_bank(int(size), tuple(float(a) for a in angles))
+
+
+def default_angles(size):
+    """Angle bank (degrees) used for a given mask size."""
+    if size == 5:
+        return np.linspace(0, 180, 12, endpoint=False)
+    return np.linspace(0, 180, 20, endpoint=False)
@@ -1,25 +1,40 @@
 import numpy as np
-from skimage.filters import apply_hysteresis_threshold
 
 
-def non_max_suppression(response, angle_map):
+def non_max_suppression(response, angle_map, angles=None):
     """
     Simple non-maximal suppression along orientation vector (angle_map in degrees).
     Compares pixel to neighbors at +/-1 along the angle and keeps if local maximum.
+
+    If `angles` is given, angle_map holds uint8 indices into that angle bank
+    (as produced by processing.compute_response_maps); out-of-range indices
+    (NO_ANGLE) are treated like NaN.
     """
     H, W = response.shape
     out = np.zeros_like(response)
 
+    if angles is not None:
+        # neighbour offsets per angle index, looked up instead of recomputed per pixel
+        theta = np.deg2rad(np.asarray(angles, dtype=float))
+        offsets = [(int(round(dy)), int(round(dx))) for dy, dx in zip(np.sin(theta), np.cos(theta))]
+        n_angles = len(offsets)
+
     for i in range(H):
         for j in range(W):
-            ang = angle_map[i, j]
-            if np.isnan(ang):
-                continue
-            theta = np.deg2rad(ang)
-            dx = np.cos(theta)
-            dy = np.sin(theta)
-            p1 = (i + int(round(dy)), j + int(round(dx)))
-            p2 = (i - int(round(dy)), j - int(round(dx)))
+            if angles is not None:
+                idx = angle_map[i, j]
+                if idx >= n_angles:
+                    continue
+                ddy, ddx = offsets[idx]
+            else:
+                ang = angle_map[i, j]
+                if np.isnan(ang):
+                    continue
+                theta = np.deg2rad(ang)
+                ddy = int(round(np.sin(theta)))
+                ddx = int(round(np.cos(theta)))
+            p1 = (i + ddy, j + ddx)
+            p2 = (i - ddy, j - ddx)
             val = response[i, j]
             v1 = response[p1] if 0 <= p1[0] < H and 0 <= p1[1] < W else -np.inf
             v2 = response[p2] if 0 <= p2[0] < H and 0 <= p2[1] < W else -np.inf
@@ -30,8 +45,9 @@ def non_max_suppression(response, angle_map):
 
 def hysteresis_and_binary(nms_img, high, low):
     """Apply hysteresis thresholding and return binary image (uint8)."""
+    from skimage.filters import apply_hysteresis_threshold
+
     high = np.clip(high, 0, 255)
     low = np.clip(low, 0, 255)
     bw = apply_hysteresis_threshold(nms_img.astype(float), low, high)
     return bw.astype(np.uint8)
-
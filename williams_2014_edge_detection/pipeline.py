@@ -0,0 +1,301 @@
+"""Staged pipeline that overlaps image I/O, MC noise, response computation and output writing.
+
+    reader -> noise -> compute -> post-process -> writer
+
+Stages are connected by bounded queues. The reader (image decoding), noise and writer
+stages are threads. Compute (response maps) and post-process (NMS, threshold sweep, PCM)
+are submitted to a shared process pool by their own dispatcher threads. Each of these
+keeps at most `workers` jobs in flight, so the cores always have queued work while
+disk and RNG run alongside. Units are (image, MC iteration, mask size), as in
+checkpoint.py.
+
+At the end a per-stage report shows busy time, utilisation and time spent waiting for
+input or blocked on a full output queue. The stage that is busy while the others wait is
+the bottleneck. Compute and post-process utilisation are shares of the pool's capacity.
+
+With a checkpoint (checkpoint.RunCheckpoint) units whose tests are all scored are
+skipped and finished units are recorded; response maps are not checkpointed here, so a
+partly scored unit is recomputed from its image.
+"""
+import os
+import time
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+from .constants import N_MC, TESTS, RESPONSE_DTYPE
+
+QUEUE_SIZE = 4
+_DONE = None
+
+
+class _Stopped(Exception):
+    pass
+
+
+class StageStats:
+    """Time accounting of one stage."""
+
+    def __init__(self, name, capacity=1):
+        self.name = name
+        self.capacity = capacity
+        self.items = 0
+        self.busy = 0.0
+        self.wait_in = 0.0
+        self.wait_out = 0.0
+
+    def report(self, wall):
+        util = self.busy / (wall * self.capacity) if wall > 0 else 0.0
+        return {"items": self.items, "busy_s": self.busy, "utilisation": util,
+                "wait_in_s": self.wait_in, "wait_out_s": self.wait_out}
+
+
+def _put(q, item, stop, stats):
+    start = time.perf_counter()
+    while True:
+        try:
+            q.put(item, timeout=0.1)
+            break
+        except queue.Full:
+            if stop.is_set():
+                raise _Stopped()
+    stats.wait_out += time.perf_counter() - start
+
+
+def _get(q, stop, stats):
+    start = time.perf_counter()
+    while True:
+        try:
+            item = q.get(timeout=0.1)
+            break
+        except queue.Empty:
+            if stop.is_set():
+                raise _Stopped()
+    stats.wait_in += time.perf_counter() - start
+    return item
+
+
+def _compute_job(im_mc, msize, angles, dtype, backend):
+    from .processing import compute_response_maps
+
+    start = time.perf_counter()
+    resp, angle_idx = compute_response_maps(im_mc, msize, angles, dtype=dtype, backend=backend)
+    return resp, angle_idx, time.perf_counter() - start
+
+
+def _score_job(resp, angle_idx, angles, gt, keep_binaries):
+    from .processing import score_test
+
+    start = time.perf_counter()
+    scored = {}
+    for t_idx, t in enumerate(TESTS):
+        pcm_scores, bw_thin_list = score_test(resp[t_idx], angle_idx, angles, gt)
+        scored[t] = (pcm_scores, bw_thin_list if keep_binaries else None)
+    return scored, time.perf_counter() - start
+
+
+def run_pipeline(image_paths, mask_sizes, n_mc=N_MC, out_dir=None, attempt_num=None, seed=None,
+                 checkpoint=None, workers=None, queue_size=QUEUE_SIZE, dtype=RESPONSE_DTYPE):
+    """Run process_image over many images with overlapped stages.
+
+    Writes the same per-image tables, binaries and checkpoint units as process_image when
+    out_dir/attempt_num/checkpoint are given. Returns ({path: summary DataFrame}, {stage:
+    report dict}); tables are identical to process_image's for the same seed.
+    """
+    from .io_utils import load_gray
+    from .masks import default_angles
+    from .processing import mc_image, summarize_results, save_binary_image, save_table, _save_binaries
+    from .checkpoint import mc_noise_rng
+    from .tuning import select_backend
+
+    workers = workers or os.cpu_count() or 1
+    save_outputs = out_dir is not None and attempt_num is not None and save_binary_image is not None
+    save_tables = out_dir is not None and attempt_num is not None and save_table is not None
+    stats = {name: StageStats(name, cap) for name, cap in
+             (("reader", 1), ("noise", 1), ("compute", workers), ("postprocess", workers), ("writer", 1))}
+    q_read, q_noise, q_maps, q_scored = (queue.Queue(queue_size) for _ in range(4))
+    stop = threading.Event()
+    errors = []
+    frames = {}
+
+    def stage(fn):
+        def run():
+            try:
+                fn()
+            except _Stopped:
+                pass
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+        return threading.Thread(target=run, daemon=True)
+
+    def reader():
+        s = stats["reader"]
+        for path in image_paths:
+            start = time.perf_counter()
+            im = load_gray(path)
+            s.busy += time.perf_counter() - start
+            s.items += 1
+            _put(q_read, (path, im), stop, s)
+        _put(q_read, _DONE, stop, s)
+
+    def noise():
+        s = stats["noise"]
+        while True:
+            item = _get(q_read, stop, s)
+            if item is _DONE:
+                break
+            path, im = item
+            gt = np.zeros_like(im, dtype=np.uint8)
+            gt[im.shape[0] // 2, :] = 1
+            for mc_idx in range(1, n_mc + 1):
+                start = time.perf_counter()
+                todo = []
+                for msize in mask_sizes:
+                    done = None
+                    if checkpoint is not None:
+                        units = {t: checkpoint.load_pcm(path, mc_idx, msize, t) for t in TESTS}
+                        if all(u is not None for u in units.values()):
+                            done = {t: u["best_pcm"] for t, u in units.items()}
+                    todo.append((msize, done))
+                im_mc = None
+                if any(done is None for _, done in todo):
+                    rng = mc_noise_rng(seed, path, mc_idx) if seed is not None else np.random.default_rng()
+                    im_mc = mc_image(im, mc_idx, n_mc, rng)
+                s.busy += time.perf_counter() - start
+                for msize, done in todo:
+                    s.items += 1
+                    _put(q_noise, {"path": path, "mc": mc_idx, "msize": msize, "im": im_mc if done is None else None,
+                                   "gt": gt, "done": done}, stop, s)
+        _put(q_noise, _DONE, stop, s)
+
+    def dispatcher(name, q_in, q_out, submit, finish):
+        # feeds the pool from q_in with at most `workers` jobs in flight; finished jobs go to q_out
+        def run():
+            s = stats[name]
+            inflight = {}
+
+            def drain(block):
+                if not inflight:
+                    return
+                finished, _ = wait(list(inflight), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    unit = inflight.pop(fut)
+                    result = fut.result()
+                    s.busy += result[-1]
+                    s.items += 1
+                    _put(q_out, finish(unit, result), stop, s)
+
+            while True:
+                start = time.perf_counter()
+                while True:
+                    try:
+                        item = q_in.get(timeout=0.05)
+                        break
+                    except queue.Empty:
+                        if stop.is_set():
+                            raise _Stopped()
+                        # pass finished jobs on while waiting for input
+                        drain(block=False)
+                s.wait_in += time.perf_counter() - start
+                if item is _DONE:
+                    break
+                if item["done"] is not None:
+                    _put(q_out, item, stop, s)
+                    continue
+                while len(inflight) >= workers:
+                    drain(block=True)
+                inflight[submit(item)] = item
+                drain(block=False)
+            while inflight:
+                drain(block=True)
+            _put(q_out, _DONE, stop, s)
+        return run
+
+    def submit_compute(unit):
+        angles = default_angles(unit["msize"])
+        backend = select_backend(unit["im"], unit["msize"], angles, dtype)
+        return pool.submit(_compute_job, unit["im"], unit["msize"], angles, dtype, backend)
+
+    def finish_compute(unit, result):
+        resp, angle_idx, _ = result
+        return dict(unit, im=None, resp=resp, angle_idx=angle_idx)
+
+    def submit_score(unit):
+        return pool.submit(_score_job, unit["resp"], unit["angle_idx"], default_angles(unit["msize"]), unit["gt"],
+                           save_outputs)
+
+    def finish_score(unit, result):
+        return dict(unit, resp=None, angle_idx=None, scored=result[0])
+
+    def writer():
+        s = stats["writer"]
+        results = {p: {t: {m: {} for m in mask_sizes} for t in TESTS} for p in image_paths}
+        remaining = {p: n_mc * len(mask_sizes) for p in image_paths}
+        while True:
+            unit = _get(q_scored, stop, s)
+            if unit is _DONE:
+                break
+            start = time.perf_counter()
+            path, mc_idx, msize = unit["path"], unit["mc"], unit["msize"]
+            if unit["done"] is not None:
+                for t, best in unit["done"].items():
+                    results[path][t][msize][mc_idx] = best
+            else:
+                for t, (pcm_scores, bw_thin_list) in unit["scored"].items():
+                    best_idx = int(np.nanargmax(pcm_scores)) if len(pcm_scores) > 0 else 0
+                    results[path][t][msize][mc_idx] = float(np.max(pcm_scores)) if len(pcm_scores) > 0 else np.nan
+                    if save_outputs:
+                        _save_binaries(bw_thin_list, best_idx, t, out_dir, path, attempt_num, n_mc, mc_idx, msize)
+                    if checkpoint is not None:
+                        checkpoint.save_pcm(path, mc_idx, msize, t, pcm_scores)
+            remaining[path] -= 1
+            if remaining[path] == 0:
+                in_order = {t: {m: [v[k] for k in sorted(v)] for m, v in by_m.items()}
+                            for t, by_m in results[path].items()}
+                df = summarize_results(in_order, TESTS, mask_sizes)
+                frames[path] = df
+                print(f"  Finished {os.path.basename(path)}")
+                if save_tables:
+                    try:
+                        saved = save_table(df, os.path.join(out_dir, 'tables'), 'results', path, attempt_num, n_mc)
+                        print(f"    Saved results table to: {saved}")
+                    except Exception as e:
+                        print("    Failed to save results table:", e)
+            s.busy += time.perf_counter() - start
+            s.items += 1
+
+    wall_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        threads = [stage(reader), stage(noise),
+                   stage(dispatcher("compute", q_noise, q_maps, submit_compute, finish_compute)),
+                   stage(dispatcher("postprocess", q_maps, q_scored, submit_score, finish_score)),
+                   stage(writer)]
+        for th in threads:
+            th.start()
+        try:
+            for th in threads:
+                while th.is_alive():
+                    th.join(0.2)
+        except KeyboardInterrupt:
+            stop.set()
+            raise
+        if errors:
+            pool.shutdown(cancel_futures=True)
+            raise errors[0]
+    wall = time.perf_counter() - wall_start
+
+    report = {name: st.report(wall) for name, st in stats.items()}
+    print(format_report(report, wall))
+    return frames, report
+
+
+def format_report(report, wall):
+    lines = [f"Pipeline finished in {wall:.1f}s",
+             f"  {'stage':<12}{'items':>7}{'busy s':>9}{'util':>7}{'wait in s':>11}{'blocked s':>11}"]
+    for name, r in report.items():
+        lines.append(f"  {name:<12}{r['items']:>7}{r['busy_s']:>9.2f}{r['utilisation'] * 100:>6.0f}%"
+                     f"{r['wait_in_s']:>11.2f}{r['wait_out_s']:>11.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,138 @@
+"""Post-processing of one unit's response maps on a process pool over shared memory.
+
+Once the response maps of one (MC iteration, mask size) exist, each test needs NMS. After
+that come hysteresis, thinning and PCM at every threshold in HIGHS, so there are 7 x 12
+independent jobs. score_tests_parallel runs them on a process pool in two rounds: NMS per
+test, then one job per (test, threshold).
+
+The response maps, angle map and ground truth are copied once into
+multiprocessing.shared_memory blocks. Workers attach to these blocks by name and read
+them without copying. Workers also write the NMS maps and thin binaries into shared
+output blocks, so only block names, shapes and PCM values are pickled. Results are the
+same as score_test's.
+"""
+import numpy as np
+from multiprocessing import shared_memory
+
+from .constants import G_PCM, HIGHS, LOW_RATIO, TESTS
+
+
+class SharedArrays:
+    """Arrays in named shared memory blocks; the blocks are unlinked on close."""
+
+    def __init__(self):
+        self.specs = {}
+        self._blocks = {}
+
+    def put(self, key, arr=None, shape=None, dtype=None):
+        """Copy `arr` into a new block, or allocate a zeroed one of `shape` and `dtype`."""
+        if arr is not None:
+            arr = np.ascontiguousarray(arr)
+            shape, dtype = arr.shape, arr.dtype
+        dtype = np.dtype(dtype)
+        shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+        self._blocks[key] = shm
+        self.specs[key] = (shm.name, tuple(shape), dtype.str)
+        view = self.array(key)
+        if arr is not None:
+            view[...] = arr
+        else:
+            view.fill(0)
+        return view
+
+    def array(self, key):
+        name, shape, dtype = self.specs[key]
+        return np.ndarray(shape, dtype=dtype, buffer=self._blocks[key].buf)
+
+    def close(self):
+        for shm in self._blocks.values():
+            shm.close()
+            shm.unlink()
+        self._blocks.clear()
+        self.specs.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _attach(specs):
+    blocks = {key: shared_memory.SharedMemory(name=name) for key, (name, _, _) in specs.items()}
+    arrays = {key: np.ndarray(shape, dtype=dtype, buffer=blocks[key].buf)
+              for key, (_, shape, dtype) in specs.items()}
+    return blocks, arrays
+
+
+def _detach(blocks, arrays):
+    # the views must go before their blocks can be closed
+    arrays.clear()
+    for shm in blocks.values():
+        shm.close()
+
+
+def _nms_job(specs, t_idx, angles):
+    from .processing import nms_map
+
+    blocks, a = _attach(specs)
+    try:
+        a["nms"][t_idx] = nms_map(a["resp"][t_idx], a["angle_idx"], angles)
+    finally:
+        _detach(blocks, a)
+
+
+def _threshold_job(specs, t_idx, th_idx, high, low_ratio, g, keep_binaries):
+    from skimage.morphology import thin
+    from .nms_and_thresh import hysteresis_and_binary
+    from .metrics import compute_pcm_binary
+
+    blocks, a = _attach(specs)
+    try:
+        bw = hysteresis_and_binary(a["nms"][t_idx], high, low_ratio * high)
+        bw_thin = thin(bw > 0).astype(np.uint8)
+        if keep_binaries:
+            a["thin"][t_idx, th_idx] = bw_thin
+        return compute_pcm_binary(bw_thin, a["gt"], g=g)
+    finally:
+        _detach(blocks, a)
+
+
+def score_tests_parallel(resp, angle_idx, angles, gt, pool, test_indices=None, keep_binaries=False,
+                         highs=None, low_ratio=None, g=None):
+    """score_test for each test index in `test_indices` (default: all tests), run on `pool`.
+
+    `pool` is a concurrent.futures.ProcessPoolExecutor. Returns {t_idx: (pcm_scores, thin
+    binaries)}; the binaries are None unless keep_binaries.
+    """
+    highs = list(HIGHS if highs is None else highs)
+    low_ratio = LOW_RATIO if low_ratio is None else low_ratio
+    g = G_PCM if g is None else g
+    test_indices = list(range(len(TESTS)) if test_indices is None else test_indices)
+    if not test_indices:
+        return {}
+
+    with SharedArrays() as shared:
+        shared.put("resp", resp)
+        shared.put("angle_idx", angle_idx)
+        shared.put("gt", gt)
+        shared.put("nms", shape=resp.shape, dtype=np.uint8)
+        if keep_binaries:
+            shared.put("thin", shape=(resp.shape[0], len(highs)) + resp.shape[1:], dtype=np.uint8)
+        specs = shared.specs
+
+        for fut in [pool.submit(_nms_job, specs, t_idx, angles) for t_idx in test_indices]:
+            fut.result()
+        futures = {(t_idx, th_idx): pool.submit(_threshold_job, specs, t_idx, th_idx, high, low_ratio, g,
+                                                keep_binaries)
+                   for t_idx in test_indices for th_idx, high in enumerate(highs)}
+        pcm = {key: fut.result() for key, fut in futures.items()}
+
+        scored = {}
+        thin = shared.array("thin") if keep_binaries else None
+        for t_idx in test_indices:
+            pcm_scores = [pcm[(t_idx, th_idx)] for th_idx in range(len(highs))]
+            bw_thin_list = [thin[t_idx, th_idx].copy() for th_idx in range(len(highs))] if keep_binaries else None
+            scored[t_idx] = (pcm_scores, bw_thin_list)
+        del thin
+    return scored
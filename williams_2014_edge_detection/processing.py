@@ -1,15 +1,14 @@
 import os
 import time
 import numpy as np
-import pandas as pd
-from skimage.morphology import thin
 
 from .io_utils import load_gray
-from .masks import make_dual_region_mask
-from .stats_tests import compute_tests_region
+from .masks import mask_bank, default_angles
+from .stats_tests import compute_tests_region, compute_tests_batch
 from .nms_and_thresh import non_max_suppression, hysteresis_and_binary
 from .metrics import compute_pcm_binary
-from .constants import N_MC, G_PCM, HIGHS, LOW_RATIO
+from .postprocess import score_tests_parallel
+from .constants import N_MC, G_PCM, HIGHS, LOW_RATIO, TESTS, RESPONSE_DTYPE, NO_ANGLE
 
 # import saving helper but keep optional to avoid hard dependency in tests
 try:
@@ -22,161 +21,236 @@ try:
 except Exception:
     save_table = None
 
+try:
+    from .saving import save_response_maps
+except Exception:
+    save_response_maps = None
 
-def process_image(image_path, mask_sizes, n_mc=N_MC, out_dir: str = None, attempt_num: int = None):
-    """Process image and optionally save per-MC, per-mask best thin binaries when out_dir and attempt_num are provided.
 
-    Returns (df, im, gt) as before.
+def _format_eta(eta):
+    hrs = int(eta // 3600)
+    mins = int((eta % 3600) // 60)
+    secs = int(eta % 60)
+    if hrs > 0:
+        return f"{hrs}h{mins:02d}m{secs:02d}s"
+    elif mins > 0:
+        return f"{mins}m{secs:02d}s"
+    return f"{secs}s"
+
+
+def compute_response_maps(im, msize, angles=None, dtype=RESPONSE_DTYPE, progress_label=None, backend=None):
+    """Compute the best response of every test in TESTS for each pixel of `im`.
+
+    Returns (resp, angle_idx): resp is a contiguous (len(TESTS), H, W) array of `dtype`
+    (float32 by default, float64 for validation), angle_idx is a uint8 (H, W) index into
+    `angles` of the orientation with the best average response (NO_ANGLE where the mask
+    does not fit). Pixels closer than msize // 2 to the border are left at 0.
+
+    `backend` is a name in BACKENDS; by default the fastest one for this workload is
+    picked by tuning.select_backend (override with $WILLIAMS_BACKEND).
     """
-    save_outputs = out_dir is not None and attempt_num is not None and save_binary_image is not None
-    save_tables = out_dir is not None and attempt_num is not None and save_table is not None
+    if angles is None:
+        angles = default_angles(msize)
+    angles = np.asarray(angles, dtype=float)
+    if len(angles) >= NO_ANGLE:
+        raise ValueError(f"angle bank too large for uint8 angle map: {len(angles)} angles")
+    if backend is None:
+        from .tuning import select_backend
+        backend = select_backend(im, msize, angles, dtype)
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown response backend {backend!r}; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](im, msize, angles, dtype, progress_label)
 
-    print(f"  Loading image: {os.path.basename(image_path)}")
-    im = load_gray(image_path)
+
+def _responses_loop(im, msize, angles, dtype, progress_label):
+    # reference implementation: compute_tests_region for every pixel and angle
     H, W = im.shape
-    # create ground-truth: horizontal single-pixel edge at middle row
-    gt = np.zeros_like(im, dtype=np.uint8)
-    mid_row = H // 2
-    gt[mid_row, :] = 1
+    n_tests = len(TESTS)
+    # Masks for all angles of this mask size, built once per process and reused across calls.
+    # Each entry is a pair of boolean masks (A_mask, B_mask) of shape (msize, msize).
+    masks_per_angle = mask_bank(msize, angles)
 
-    tests = ["DoB", "T", "F", "L", "U", "KS", "v2"]
-    results = {t: {m: [] for m in mask_sizes} for t in tests}
+    resp = np.zeros((n_tests, H, W), dtype=dtype)
+    angle_idx = np.full((H, W), NO_ANGLE, dtype=np.uint8)
+    half = msize // 2
 
-    for mc in range(n_mc):
-        print(f"    Monte Carlo iteration {mc+1}/{n_mc}")
-        if n_mc > 1:
-            noise = np.random.normal(loc=0.0, scale=0.5, size=im.shape)
-            im_mc = np.clip(im.astype(float) + noise, 0, 255).astype(np.uint8)
-        else:
-            im_mc = im.copy()
-
-        for msize in mask_sizes:
-            print(f"      Processing mask size {msize}x{msize}")
-            start_time = time.time()
-            if msize == 5:
-                angles = np.linspace(0, 180, 12, endpoint=False)
-            else:
-                angles = np.linspace(0, 180, 20, endpoint=False)
-
-            # Precompute masks for all angles for this mask size to avoid recomputing inside the pixel loop.
-            # make_dual_region_mask returns two boolean masks (A_mask, B_mask) of shape (msize, msize).
-            masks_per_angle = [make_dual_region_mask(msize, ang) for ang in angles]
-
-            resp_maps = {t: np.zeros_like(im_mc, dtype=float) for t in tests}
-            angle_map = np.full(im_mc.shape, np.nan)
-            half = msize // 2
-
-            total_pixels = (H - 2*half) * (W - 2*half)
-            pixels_processed = 0
-            # EWMA state for per-pixel timing estimator
-            ewma_per_pixel = None
-            print(f"        Processing {total_pixels} pixels...")
-
-            for i in range(half, H - half):
-                for j in range(half, W - half):
-                    best_vals = {t: -np.inf for t in tests}
-                    best_angle = None
-                    patch = im_mc[i - half:i + half + 1, j - half:j + half + 1]
-
-                    # iterate over precomputed masks for each angle
-                    for ang_idx, ang in enumerate(angles):
-                        A_mask, B_mask = masks_per_angle[ang_idx]
-                        A_vals = patch[A_mask]
-                        B_vals = patch[B_mask]
-                        stats_dict = compute_tests_region(A_vals, B_vals)
-                        # update bests for each test
-                        for t in tests:
-                            v = stats_dict[t]
-                            if v > best_vals[t]:
-                                best_vals[t] = v
-                        # average response across tests to pick best angle
-                        avg_resp = np.mean(list(stats_dict.values()))
-                        if best_angle is None or avg_resp > best_angle[0]:
-                            best_angle = (avg_resp, ang)
+    total_pixels = max(H - 2*half, 0) * max(W - 2*half, 0)
+    pixels_processed = 0
+    start_time = time.time()
+    if progress_label is not None:
+        print(f"        Processing {total_pixels} pixels...")
 
-                    for t in tests:
-                        resp_maps[t][i, j] = best_vals[t]
-                    angle_map[i, j] = best_angle[1] if best_angle is not None else np.nan
-
-                    pixels_processed += 1
-                    # report progress periodically; use a smaller interval for responsiveness
-                    if pixels_processed % 100 == 0 or pixels_processed == total_pixels:
-                        now = time.time()
-                        elapsed = now - start_time
-                        # compute average time per processed pixel and use it to estimate remaining time
-                        if pixels_processed > 0 and elapsed > 0:
-                            avg_per_pixel = elapsed / float(pixels_processed)
-                            # use instantaneous average per-pixel as estimator (keeps code simple and deterministic)
-                            ewma_per_pixel = avg_per_pixel
-                            remaining = total_pixels - pixels_processed
-                            eta = avg_per_pixel * remaining
-                        else:
-                            eta = 0.0
-
-                        # format ETA in H:M:S
-                        hrs = int(eta // 3600)
-                        mins = int((eta % 3600) // 60)
-                        secs = int(eta % 60)
-                        if hrs > 0:
-                            eta_str = f"{hrs}h{mins:02d}m{secs:02d}s"
-                        elif mins > 0:
-                            eta_str = f"{mins}m{secs:02d}s"
-                        else:
-                            eta_str = f"{secs}s"
-
-                        print(
-                            f"          MC {mc + 1}/{n_mc}, "
-                            f"Image {os.path.basename(image_path)}, "
-                            f"Mask {msize} | "
-                            f"{pixels_processed}/{total_pixels} px "
-                            f"({(pixels_processed / total_pixels) * 100:.1f}% ) "
-                            f"ETA {eta_str}"
-                        )
-
-            print("100% - done")
-
-            print(f"        Post-processing for {len(tests)} tests...")
-            for t_idx, t in enumerate(tests):
-                print(f"          Test {t_idx+1}/{len(tests)}: {t}")
-                rmap = resp_maps[t]
-                mn, mx = np.nanmin(rmap), np.nanmax(rmap)
-                if mx - mn < 1e-9:
-                    norm = np.zeros_like(rmap, dtype=np.uint8)
+    best_vals = np.empty(n_tests, dtype=float)
+    vals = np.empty(n_tests, dtype=float)
+    for i in range(half, H - half):
+        for j in range(half, W - half):
+            best_vals.fill(-np.inf)
+            best_avg = None
+            best_idx = NO_ANGLE
+            patch = im[i - half:i + half + 1, j - half:j + half + 1]
+
+            # iterate over precomputed masks for each angle
+            for ang_idx, (A_mask, B_mask) in enumerate(masks_per_angle):
+                stats_dict = compute_tests_region(patch[A_mask], patch[B_mask])
+                for t_idx, t in enumerate(TESTS):
+                    vals[t_idx] = stats_dict[t]
+                # update bests for each test
+                np.maximum(best_vals, vals, out=best_vals)
+                # average response across tests to pick best angle
+                avg_resp = vals.mean()
+                if best_avg is None or avg_resp > best_avg:
+                    best_avg = avg_resp
+                    best_idx = ang_idx
+
+            resp[:, i, j] = best_vals
+            angle_idx[i, j] = best_idx
+
+            pixels_processed += 1
+            # report progress periodically; use a smaller interval for responsiveness
+            if progress_label is not None and (pixels_processed % 100 == 0 or pixels_processed == total_pixels):
+                elapsed = time.time() - start_time
+                # average time per processed pixel is used to estimate remaining time
+                if elapsed > 0:
+                    eta = elapsed / float(pixels_processed) * (total_pixels - pixels_processed)
                 else:
-                    norm = ((rmap - mn) / (mx - mn) * 255.0).astype(np.uint8)
-                nms = non_max_suppression(norm, angle_map)
-                pcm_scores = []
-                bw_thin_list = []
-                for th_idx, ThH in enumerate(HIGHS):
-                    ThL = LOW_RATIO * ThH
-                    bw = hysteresis_and_binary(nms, ThH, ThL)
-                    bw_thin = thin(bw > 0).astype(np.uint8)
-                    bw_thin_list.append(bw_thin)
-                    pcm_val = compute_pcm_binary(bw_thin, gt, g=G_PCM)
-                    pcm_scores.append(pcm_val)
-                best_idx = int(np.nanargmax(pcm_scores)) if len(pcm_scores) > 0 else 0
-                best_pcm = float(np.max(pcm_scores)) if len(pcm_scores) > 0 else np.nan
-                results[t][msize].append(best_pcm)
-
-                # optionally save the best thin binary for this test/mask/mc
-                if save_outputs:
-                    try:
-                        best_bw = bw_thin_list[best_idx]
-                        images_out = os.path.join(out_dir, 'images')
-                        # save all thin binaries and mark the best one with a _best suffix
-                        for th_idx, bw_thin in enumerate(bw_thin_list):
-                            is_best = (th_idx == best_idx)
-                            what = f"bw_{t}_th{th_idx+1}"
-                            if is_best:
-                                what = what + "_best"
-                            saved = save_binary_image(bw_thin, images_out, what, image_path, attempt_num, n_mc, mc+1, msize)
-                            # log saved path for the best one to avoid too much console spam
-                            if is_best:
-                                print(f"            Saved best bw for test={t}, mask={msize}, mc={mc+1} -> {saved}")
-                    except Exception as e:
-                        print("            Failed to save binary image:", e)
+                    eta = 0.0
+                print(
+                    f"          {progress_label} | "
+                    f"{pixels_processed}/{total_pixels} px "
+                    f"({(pixels_processed / total_pixels) * 100:.1f}% ) "
+                    f"ETA {_format_eta(eta)}"
+                )
+
+    return resp, angle_idx
+
+
+
+def _responses_vectorized(im, msize, angles, dtype, progress_label, chunk_pixels=4096):
+    # all pixels of a block of rows at once: gather the A/B values of every window and score
+    # them with compute_tests_batch; same results as the loop up to float rounding (which can
+    # flip the angle of a pixel whose two best angles tie to the last bit)
+    if im.dtype != np.uint8:
+        return _responses_loop(im, msize, angles, dtype, progress_label)
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    H, W = im.shape
+    n_tests = len(TESTS)
+    masks_per_angle = mask_bank(msize, angles)
+    resp = np.zeros((n_tests, H, W), dtype=dtype)
+    angle_idx = np.full((H, W), NO_ANGLE, dtype=np.uint8)
+    half = msize // 2
+    if H < msize or W < msize:
+        return resp, angle_idx
+
+    # small masks repeat across nearby angles; a repeat can never beat the first occurrence
+    # (ties keep the earliest angle), so only distinct masks are scored
+    distinct, seen = [], set()
+    for ang_idx, (A_mask, B_mask) in enumerate(masks_per_angle):
+        sig = (A_mask.tobytes(), B_mask.tobytes())
+        if sig not in seen:
+            seen.add(sig)
+            distinct.append((ang_idx, A_mask, B_mask))
+
+    windows = sliding_window_view(im, (msize, msize))
+    out_h, out_w = windows.shape[:2]
+    rows_per_chunk = max(1, chunk_pixels // out_w)
+    if progress_label is not None:
+        print(f"        Processing {out_h * out_w} pixels...")
+    start_time = time.time()
+    for r0 in range(0, out_h, rows_per_chunk):
+        block = windows[r0:r0 + rows_per_chunk]
+        n_rows = block.shape[0]
+        best_vals = np.full((n_tests, n_rows * out_w), -np.inf)
+        best_avg = None
+        best_idx = np.full(n_rows * out_w, distinct[0][0], dtype=np.uint8)
+        for ang_idx, A_mask, B_mask in distinct:
+            vals = compute_tests_batch(block[:, :, A_mask].reshape(-1, A_mask.sum()),
+                                       block[:, :, B_mask].reshape(-1, B_mask.sum()))
+            np.maximum(best_vals, vals, out=best_vals)
+            avg_resp = vals.mean(axis=0)
+            if best_avg is None:
+                best_avg = avg_resp
+            else:
+                better = avg_resp > best_avg
+                best_avg = np.where(better, avg_resp, best_avg)
+                best_idx[better] = ang_idx
+        rows = slice(half + r0, half + r0 + n_rows)
+        resp[:, rows, half:half + out_w] = best_vals.reshape(n_tests, n_rows, out_w)
+        angle_idx[rows, half:half + out_w] = best_idx.reshape(n_rows, out_w)
+        if progress_label is not None:
+            done = min(r0 + n_rows, out_h)
+            elapsed = time.time() - start_time
+            eta = elapsed / done * (out_h - done)
+            print(f"          {progress_label} | {done * out_w}/{out_h * out_w} px "
+                  f"({done / out_h * 100:.1f}% ) ETA {_format_eta(eta)}")
+    return resp, angle_idx
+
+
+# response backends by name; all return identical maps up to float rounding
+BACKENDS = {
+    "loop": _responses_loop,
+    "vectorized": _responses_vectorized,
+}
+
+
+def normalize_response(rmap):
+    """Min-max scale a single response map to uint8 0..255 (all zeros for a flat map)."""
+    mn, mx = float(np.nanmin(rmap)), float(np.nanmax(rmap))
+    if mx - mn < 1e-9:
+        return np.zeros(rmap.shape, dtype=np.uint8)
+    return ((rmap - mn) / (mx - mn) * 255.0).astype(np.uint8)
+
+
+def mc_image(im, mc_idx, n_mc, rng=None):
+    """Image of MC iteration `mc_idx` (1-based): `im` plus N(0, 0.5) noise when n_mc > 1.
+
+    `rng` is an optional np.random.Generator; the global NumPy RNG is used when omitted.
+    """
+    if n_mc <= 1:
+        return im.copy()
+    gen = np.random if rng is None else rng
+    noise = gen.normal(loc=0.0, scale=0.5, size=im.shape)
+    return np.clip(im.astype(float) + noise, 0, 255).astype(np.uint8)
+
+
+def nms_map(resp_t, angle_idx, angles):
+    """Non-maximum suppression of one test's response map after min-max scaling to uint8."""
+    return non_max_suppression(normalize_response(resp_t), angle_idx, angles)
+
+
+def threshold_sweep(nms, highs=None, low_ratio=None):
+    """Thin binaries from hysteresis at every high threshold (low = low_ratio * high).
+
+    `highs` and `low_ratio` default to HIGHS and LOW_RATIO.
+    """
+    from skimage.morphology import thin
+
+    highs = HIGHS if highs is None else highs
+    low_ratio = LOW_RATIO if low_ratio is None else low_ratio
+    bw_thin_list = []
+    for ThH in highs:
+        ThL = low_ratio * ThH
+        bw = hysteresis_and_binary(nms, ThH, ThL)
+        bw_thin_list.append(thin(bw > 0).astype(np.uint8))
+    return bw_thin_list
+
+
+def score_test(resp_t, angle_idx, angles, gt, highs=None, low_ratio=None, g=None):
+    """NMS, hysteresis at every high threshold in HIGHS, thinning and PCM for one test map.
+
+    `highs`, `low_ratio` and `g` override HIGHS, LOW_RATIO and G_PCM.
+    Returns (pcm_scores, thin binaries), one entry per threshold.
+    """
+    g = G_PCM if g is None else g
+    bw_thin_list = threshold_sweep(nms_map(resp_t, angle_idx, angles), highs, low_ratio)
+    pcm_scores = [compute_pcm_binary(bw_thin, gt, g=g) for bw_thin in bw_thin_list]
+    return pcm_scores, bw_thin_list
+
+
+def summarize_results(results, tests, mask_sizes):
+    """Summary table (test, mask_size, pcm_mean, pcm_std) from results[test][mask_size] lists of best PCMs."""
+    import pandas as pd
 
-    print("    Computing statistics...")
     summary_rows = []
     for t in tests:
         for m in mask_sizes:
@@ -189,7 +263,321 @@ def process_image(image_path, mask_sizes, n_mc=N_MC, out_dir: str = None, attemp
                 "pcm_mean": mean_pcm,
                 "pcm_std": std_pcm
             })
-    df = pd.DataFrame(summary_rows)
+    return pd.DataFrame(summary_rows)
+
+
+def _save_binaries(bw_thin_list, best_idx, t, out_dir, image_path, attempt_num, n_mc, mc_idx, msize):
+    try:
+        images_out = os.path.join(out_dir, 'images')
+        # save all thin binaries and mark the best one with a _best suffix
+        for th_idx, bw_thin in enumerate(bw_thin_list):
+            is_best = (th_idx == best_idx)
+            what = f"bw_{t}_th{th_idx+1}"
+            if is_best:
+                what = what + "_best"
+            saved = save_binary_image(bw_thin, images_out, what, image_path, attempt_num, n_mc, mc_idx, msize)
+            # log saved path for the best one to avoid too much console spam
+            if is_best:
+                print(f"            Saved best bw for test={t}, mask={msize}, mc={mc_idx} -> {saved}")
+    except Exception as e:
+        print("            Failed to save binary image:", e)
+
+
+class RunningStats:
+    """Streaming mean and variance (Welford) of one stream of values."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (x - self.mean)
+
+    @property
+    def std(self):
+        """Sample standard deviation (ddof=1); 0 for fewer than two values."""
+        return float(np.sqrt(self._m2 / (self.n - 1))) if self.n > 1 else 0.0
+
+    def ci_halfwidth(self, ci=0.95):
+        """Half-width of the Student-t confidence interval of the mean; inf for fewer than two values."""
+        from scipy import stats
+
+        if self.n < 2:
+            return float("inf")
+        return float(stats.t.ppf(0.5 + ci / 2.0, self.n - 1) * self.std / np.sqrt(self.n))
+
+
+def _load_input(image_path, name):
+    # (image, path or name used in logs and file names) for a path or an in-memory array
+    if isinstance(image_path, np.ndarray):
+        im = image_path
+        if im.ndim != 2 or im.dtype != np.uint8:
+            raise ValueError(f"in-memory images must be 2D uint8 arrays, got {im.dtype} {im.shape}")
+        label = name if name is not None else "array"
+        print(f"  Using in-memory image: {label}")
+        return im, label
+    print(f"  Loading image: {os.path.basename(image_path)}")
+    return load_gray(image_path), image_path
+
+
+def _default_gt(im):
+    # horizontal single-pixel edge at the middle row
+    gt = np.zeros_like(im, dtype=np.uint8)
+    gt[im.shape[0] // 2, :] = 1
+    return gt
+
+
+def _adaptive_job(im, label, seed, mc_idx, msize, tests, gt, dtype, backend):
+    # one MC iteration of one mask size: noise, maps and the best PCM of each requested test
+    from .checkpoint import mc_noise_rng
+
+    im_mc = mc_image(im, mc_idx, 2, mc_noise_rng(seed, label, mc_idx))
+    angles = default_angles(msize)
+    resp, angle_idx = compute_response_maps(im_mc, msize, angles, dtype=dtype, backend=backend)
+    best = {}
+    for t in tests:
+        pcm_scores, _ = score_test(resp[TESTS.index(t)], angle_idx, angles, gt)
+        best[t] = float(np.max(pcm_scores)) if len(pcm_scores) > 0 else np.nan
+    return best
+
+
+def process_image_adaptive(image_path, mask_sizes, target_halfwidth, min_mc=3, max_mc=30, ci=0.95,
+                           batch_size=None, workers=None, out_dir: str = None, attempt_num: int = None,
+                           dtype=RESPONSE_DTYPE, gt=None, name: str = None, seed: int = None, backend=None):
+    """Monte Carlo until the CI of every (test, mask) pcm_mean is narrower than the target.
+
+    Iterations run in batches of `batch_size` (default: `workers`) per mask size across a
+    process pool. After each round, every (test, mask) pair whose confidence interval
+    half-width (Student t at level `ci`) is at most `target_halfwidth` PCM points, after at
+    least `min_mc` iterations, stops. So does any pair that reaches `max_mc`. Only the
+    pairs still running are scored in later rounds, and a mask size runs only while one
+    of its tests does. Iteration k uses the same noise as iteration k of process_image
+    with the same seed, so a pair that used n iterations matches process_image(n_mc=n).
+
+    Returns (df, im, gt); df is process_image's table plus n_mc_used and ci_halfwidth.
+    """
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+    from .tuning import select_backend
+
+    if min_mc < 2 or max_mc < min_mc:
+        raise ValueError(f"need 2 <= min_mc <= max_mc, got min_mc={min_mc}, max_mc={max_mc}")
+    im, image_path = _load_input(image_path, name)
+    if gt is None:
+        gt = _default_gt(im)
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2 ** 32)
+        print(f"    No seed given; using {seed}")
+    workers = workers or 1
+    batch_size = batch_size or workers
+    tests = TESTS
+    stats = {(t, m): RunningStats() for t in tests for m in mask_sizes}
+    backends = {m: backend or select_backend(im, m, default_angles(m), dtype) for m in mask_sizes}
+
+    def open_tests(msize):
+        out = []
+        for t in tests:
+            st = stats[(t, msize)]
+            if st.n < max_mc and (st.n < min_mc or st.ci_halfwidth(ci) > target_halfwidth):
+                out.append(t)
+        return out
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        round_idx = 0
+        while True:
+            jobs = []
+            for msize in mask_sizes:
+                todo = open_tests(msize)
+                if not todo:
+                    continue
+                done_n = max(stats[(t, msize)].n for t in todo)
+                # enough iterations to reach min_mc, else one batch; never past max_mc
+                n_new = max(min_mc - done_n, batch_size)
+                for mc_idx in range(done_n + 1, min(done_n + n_new, max_mc) + 1):
+                    jobs.append((mc_idx, msize, todo))
+            if not jobs:
+                break
+            round_idx += 1
+            print(f"    Round {round_idx}: {len(jobs)} iterations "
+                  f"({', '.join(f'mask {m}: {len(open_tests(m))} tests open' for m in mask_sizes)})")
+            args = [(im, image_path, seed, mc_idx, msize, todo, gt, dtype, backends[msize])
+                    for mc_idx, msize, todo in jobs]
+            if pool is None:
+                results = [_adaptive_job(*a) for a in args]
+            else:
+                results = list(pool.map(_adaptive_job, *zip(*args)))
+            # applied in iteration order so the statistics do not depend on scheduling
+            for (mc_idx, msize, todo), best in zip(jobs, results):
+                for t in todo:
+                    st = stats[(t, msize)]
+                    if st.n == mc_idx - 1:
+                        st.add(best[t])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    rows = []
+    for t in tests:
+        for m in mask_sizes:
+            st = stats[(t, m)]
+            rows.append({"test": t, "mask_size": m, "pcm_mean": st.mean, "pcm_std": st.std, "n_mc_used": st.n,
+                         "ci_halfwidth": st.ci_halfwidth(ci)})
+    df = pd.DataFrame(rows)
+    print(f"    Used {df.n_mc_used.sum()} (test, mask) iterations; "
+          f"{(df.ci_halfwidth <= target_halfwidth).sum()}/{len(df)} pairs reached the target")
+
+    if out_dir is not None and attempt_num is not None and save_table is not None:
+        try:
+            saved = save_table(df, os.path.join(out_dir, 'tables'), 'results', image_path, attempt_num,
+                               int(df.n_mc_used.max()))
+            print(f"    Saved results table to: {saved}")
+        except Exception as e:
+            print("    Failed to save results table:", e)
+    return df, im, gt
+
+
+def process_image(image_path, mask_sizes, n_mc=N_MC, out_dir: str = None, attempt_num: int = None,
+                  dtype=RESPONSE_DTYPE, save_maps: bool = False, gt=None, name: str = None,
+                  seed: int = None, checkpoint=None, mc_iterations=None, backend=None, workers=None,
+                  target_halfwidth=None, **adaptive):
+    """Process image and optionally save per-MC, per-mask best thin binaries when out_dir and attempt_num are provided.
+
+    `image_path` may also be an in-memory uint8 grayscale array (e.g. from phantom.squares);
+    `name` then stands in for the file name in logs and saved file names. `gt` overrides the
+    default ground truth (single-pixel horizontal edge on the middle row).
+
+    Response maps are computed in `dtype` (float32 by default, np.float64 for validation);
+    with save_maps=True they are also written to out_dir/maps as one .npz per MC and mask.
+
+    With `seed` the MC noise of every iteration is drawn from its own RNG (see
+    checkpoint.mc_noise_rng), making results independent of what ran before. With a
+    `checkpoint` (checkpoint.RunCheckpoint) finished units are persisted as they complete
+    and units already on disk are loaded instead of recomputed. `mc_iterations` restricts
+    the run to those 1-based MC iterations (the table then only covers them). `backend`
+    forces a response backend (see compute_response_maps).
+
+    With `workers` > 1 the post-processing of each mask size (NMS, hysteresis, thinning
+    and PCM of every test and threshold) runs on a pool of that many processes, see
+    postprocess.score_tests_parallel; results are the same as without it.
+
+    With `target_halfwidth` the number of iterations is adaptive instead of n_mc; see
+    process_image_adaptive, which receives `workers` and the remaining keyword arguments
+    (min_mc, max_mc, ci, batch_size).
+
+    Returns (df, im, gt) as before.
+    """
+    from .checkpoint import mc_noise_rng
+
+    if target_halfwidth is not None:
+        if checkpoint is not None or mc_iterations is not None or save_maps:
+            raise ValueError("adaptive MC does not support checkpoint, mc_iterations or save_maps")
+        return process_image_adaptive(image_path, mask_sizes, target_halfwidth, out_dir=out_dir,
+                                      attempt_num=attempt_num, dtype=dtype, gt=gt, name=name, seed=seed,
+                                      backend=backend, workers=workers, **adaptive)
+    if adaptive:
+        raise TypeError(f"unexpected arguments without target_halfwidth: {sorted(adaptive)}")
+
+    save_outputs = out_dir is not None and attempt_num is not None and save_binary_image is not None
+    save_tables = out_dir is not None and attempt_num is not None and save_table is not None
+    save_maps = save_maps and out_dir is not None and attempt_num is not None and save_response_maps is not None
+
+    im, image_path = _load_input(image_path, name)
+    if gt is None:
+        gt = _default_gt(im)
+
+    tests = TESTS
+    results = {t: {m: [] for m in mask_sizes} for t in tests}
+    pool = None
+    if workers is not None and workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=workers)
+
+    try:
+        for mc in range(n_mc):
+            if mc_iterations is not None and mc + 1 not in mc_iterations:
+                continue
+            print(f"    Monte Carlo iteration {mc+1}/{n_mc}")
+            im_mc = None
+
+            for msize in mask_sizes:
+                angles = default_angles(msize)
+                done = {}
+                if checkpoint is not None:
+                    for t in tests:
+                        unit = checkpoint.load_pcm(image_path, mc + 1, msize, t)
+                        if unit is not None:
+                            done[t] = unit
+                if len(done) == len(tests):
+                    print(f"      Mask size {msize}x{msize}: all tests checkpointed, skipping")
+                    for t in tests:
+                        results[t][msize].append(done[t]["best_pcm"])
+                    continue
+
+                maps = checkpoint.load_maps(image_path, mc + 1, msize) if checkpoint is not None else None
+                if maps is not None:
+                    print(f"      Mask size {msize}x{msize}: response maps loaded from checkpoint")
+                    resp, angle_idx = maps
+                else:
+                    print(f"      Processing mask size {msize}x{msize}")
+                    if im_mc is None:
+                        rng = mc_noise_rng(seed, image_path, mc + 1) if seed is not None else None
+                        im_mc = mc_image(im, mc + 1, n_mc, rng)
+                    label = f"MC {mc + 1}/{n_mc}, Image {os.path.basename(image_path)}, Mask {msize}"
+                    resp, angle_idx = compute_response_maps(im_mc, msize, angles, dtype=dtype, progress_label=label,
+                                                            backend=backend)
+
+                    print("100% - done")
+                    if checkpoint is not None:
+                        checkpoint.save_maps(image_path, mc + 1, msize, resp, angle_idx, angles)
+
+                    if save_maps:
+                        try:
+                            maps_out = os.path.join(out_dir, 'maps')
+                            saved = save_response_maps(resp, angle_idx, angles, maps_out, image_path, attempt_num, n_mc, mc+1, msize)
+                            print(f"        Saved response maps -> {saved}")
+                        except Exception as e:
+                            print("        Failed to save response maps:", e)
+
+                print(f"        Post-processing for {len(tests)} tests...")
+                scored = None
+                if pool is not None:
+                    todo = [t_idx for t_idx, t in enumerate(tests) if t not in done]
+                    scored = score_tests_parallel(resp, angle_idx, angles, gt, pool, todo,
+                                                  keep_binaries=save_outputs)
+                for t_idx, t in enumerate(tests):
+                    if t in done:
+                        print(f"          Test {t_idx+1}/{len(tests)}: {t} (checkpointed)")
+                        results[t][msize].append(done[t]["best_pcm"])
+                        continue
+                    print(f"          Test {t_idx+1}/{len(tests)}: {t}")
+                    if scored is not None:
+                        pcm_scores, bw_thin_list = scored[t_idx]
+                    else:
+                        pcm_scores, bw_thin_list = score_test(resp[t_idx], angle_idx, angles, gt)
+                    best_idx = int(np.nanargmax(pcm_scores)) if len(pcm_scores) > 0 else 0
+                    best_pcm = float(np.max(pcm_scores)) if len(pcm_scores) > 0 else np.nan
+                    results[t][msize].append(best_pcm)
+
+                    # optionally save the best thin binary for this test/mask/mc
+                    if save_outputs:
+                        _save_binaries(bw_thin_list, best_idx, t, out_dir, image_path, attempt_num, n_mc, mc + 1, msize)
+                    # the pcm file marks the unit finished, so it is written after its images
+                    if checkpoint is not None:
+                        checkpoint.save_pcm(image_path, mc + 1, msize, t, pcm_scores)
+
+                if checkpoint is not None:
+                    checkpoint.drop_maps(image_path, mc + 1, msize)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    print("    Computing statistics...")
+    df = summarize_results(results, tests, mask_sizes)
 
     if save_tables:
         try:
@@ -0,0 +1,239 @@
+"""Golden-result regression and performance tracking for the detection pipeline.
+
+Runs process_image on a fixed set of small, seeded synthetic layer-pair images with every
+backend in processing.BACKENDS. The response maps, angle maps and summary tables are
+compared against the golden outputs in tests/golden/ (written with the reference loop
+backend) using the tolerances in TOLERANCES. For each backend it also measures wall time,
+peak traced memory and pixel-angles per second on the larger TIMING_CASE: after one untimed
+warm-up run (lazy imports, mask caches), process_image is timed `repeats` times and the
+fastest run is kept, so one noisy run does not count as a regression. The metrics are
+appended to a JSON-lines history file, and the check fails if any of them is worse than the
+previous entry for the same machine and backend by more than `max_regression` percent.
+
+    python -m williams_2014_edge_detection.regression                 # check and record
+    python -m williams_2014_edge_detection.regression --update-golden # after an intended change
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from .constants import PROJECT_ROOT, TESTS
+
+GOLDEN_DIR = os.path.join(PROJECT_ROOT, "tests", "golden")
+HISTORY_FILE = os.path.join(PROJECT_ROOT, "perf_history.jsonl")
+MAX_REGRESSION = 20.0
+
+# (name, shape, upper layer gamma (shape, scale), lower layer gamma (shape, scale), seed)
+CASES = [
+    ("low_contrast", (11, 10), (20.0, 2.0), (24.0, 2.0), 1),
+    ("high_contrast", (11, 10), (8.0, 4.0), (30.0, 5.0), 2),
+]
+MASK_SIZES = [5]
+N_MC = 2
+SEED = 0
+# performance is measured on one larger image, with a single MC iteration per timed run
+TIMING_CASE = ("timing", (20, 20), (20.0, 2.0), (24.0, 2.0), 3)
+TIMING_N_MC = 1
+TIMING_REPEATS = 5
+TOLERANCES = {
+    # response maps (float32) against the golden maps
+    "resp_rtol": 1e-5,
+    "resp_atol": 1e-4,
+    # fraction of pixels whose best angle may differ (ties broken differently by rounding)
+    "angle_mismatch": 0.02,
+    # summary table columns, in PCM percentage points
+    "pcm_atol": 1e-6,
+}
+# metric -> True when larger is better
+METRICS = {"wall_s": False, "peak_mb": False, "pixel_angles_per_s": True}
+
+
+def case_image(case):
+    """uint8 two-layer image: upper and lower halves drawn from their gamma distributions."""
+    name, (h, w), (k_u, th_u), (k_l, th_l), seed = case
+    rng = np.random.default_rng([seed, h, w])
+    im = np.empty((h, w))
+    im[:h // 2] = rng.gamma(k_u, th_u, size=(h // 2, w))
+    im[h // 2:] = rng.gamma(k_l, th_l, size=(h - h // 2, w))
+    return np.clip(np.round(im), 0, 255).astype(np.uint8)
+
+
+def run_case(case, backend):
+    """Maps of the noiseless image and process_image's table for one backend."""
+    from .processing import compute_response_maps, process_image
+
+    im = case_image(case)
+    resp, angle_idx = compute_response_maps(im, MASK_SIZES[0], backend=backend)
+    with redirect_stdout(io.StringIO()):
+        table, _, _ = process_image(im, MASK_SIZES, n_mc=N_MC, seed=SEED, name=f"{case[0]}.png", backend=backend)
+    return {"resp": resp, "angle_idx": angle_idx, "table": table}
+
+
+def time_backend(backend, repeats=TIMING_REPEATS, case=TIMING_CASE):
+    """Performance metrics of process_image on `case`: fastest of `repeats` timed runs after a warm-up."""
+    from .masks import default_angles
+    from .processing import process_image
+
+    im = case_image(case)
+
+    def run():
+        with redirect_stdout(io.StringIO()):
+            process_image(im, MASK_SIZES, n_mc=TIMING_N_MC, seed=SEED, name=f"{case[0]}.png", backend=backend)
+
+    run()
+    times = []
+    for _ in range(max(repeats, 1)):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    seconds = min(times)
+    # tracing slows Python-heavy backends a lot, so memory is measured in a separate run
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    h, w = im.shape
+    pixel_angles = sum(max(h - m + 1, 0) * max(w - m + 1, 0) * len(default_angles(m))
+                       for m in MASK_SIZES) * TIMING_N_MC
+    return {"wall_s": seconds, "peak_mb": peak / 2 ** 20, "pixel_angles_per_s": pixel_angles / seconds}
+
+
+def write_golden(golden_dir=GOLDEN_DIR, backend="loop"):
+    """Regenerate the golden outputs with `backend`."""
+    import pandas as pd
+
+    os.makedirs(golden_dir, exist_ok=True)
+    maps, tables = {}, []
+    for case in CASES:
+        out = run_case(case, backend)
+        maps[f"{case[0]}_resp"] = out["resp"]
+        maps[f"{case[0]}_angle_idx"] = out["angle_idx"]
+        tables.append(out["table"].assign(case=case[0]))
+    np.savez_compressed(os.path.join(golden_dir, "maps.npz"), **maps)
+    pd.concat(tables, ignore_index=True).to_csv(os.path.join(golden_dir, "tables.csv"), index=False,
+                                                float_format="%.12g")
+    print(f"Wrote golden outputs for {len(CASES)} cases to {golden_dir}")
+
+
+def compare_case(case, out, golden_maps, golden_tables, tol=TOLERANCES):
+    """List of failure messages for one case's outputs."""
+    name = case[0]
+    failures = []
+    g_resp, g_angle = golden_maps[f"{name}_resp"], golden_maps[f"{name}_angle_idx"]
+    if out["resp"].shape != g_resp.shape:
+        return [f"{name}: response maps have shape {out['resp'].shape}, golden {g_resp.shape}"]
+    close = np.isclose(out["resp"], g_resp, rtol=tol["resp_rtol"], atol=tol["resp_atol"], equal_nan=True)
+    for t_idx, t in enumerate(TESTS):
+        if not close[t_idx].all():
+            diff = np.abs(out["resp"][t_idx].astype(float) - g_resp[t_idx])
+            failures.append(f"{name}: {t} response differs in {int((~close[t_idx]).sum())} pixels "
+                            f"(max abs diff {np.nanmax(diff):.3g})")
+    mismatch = float(np.mean(out["angle_idx"] != g_angle))
+    if mismatch > tol["angle_mismatch"]:
+        failures.append(f"{name}: angle map differs in {mismatch:.1%} of pixels")
+
+    expected = golden_tables[golden_tables.case == name].reset_index(drop=True)
+    got = out["table"].reset_index(drop=True)
+    if list(got.test) != list(expected.test) or list(got.mask_size) != list(expected.mask_size):
+        failures.append(f"{name}: summary table rows differ")
+        return failures
+    for col in ("pcm_mean", "pcm_std"):
+        diff = np.abs(got[col].to_numpy(float) - expected[col].to_numpy(float))
+        if not (diff <= tol["pcm_atol"]).all():
+            worst = int(np.argmax(diff))
+            failures.append(f"{name}: {col} of {got.test[worst]}/mask {got.mask_size[worst]} is "
+                            f"{got[col][worst]:.6f}, golden {expected[col][worst]:.6f}")
+    return failures
+
+
+def check_golden(golden_dir=GOLDEN_DIR, backends=None, repeats=TIMING_REPEATS):
+    """Run every case with every backend; returns (failures, {backend: performance metrics})."""
+    import pandas as pd
+    from .processing import BACKENDS
+
+    golden_tables = pd.read_csv(os.path.join(golden_dir, "tables.csv"))
+    failures, perf = [], {}
+    with np.load(os.path.join(golden_dir, "maps.npz")) as data:
+        golden_maps = dict(data)
+    for backend in backends or sorted(BACKENDS):
+        for case in CASES:
+            out = run_case(case, backend)
+            failures += [f"[{backend}] {msg}" for msg in compare_case(case, out, golden_maps, golden_tables)]
+        perf[backend] = metrics = time_backend(backend, repeats)
+        print(f"  {backend}: {metrics['wall_s']:.2f}s (best of {max(repeats, 1)}), peak {metrics['peak_mb']:.1f} MB, "
+              f"{metrics['pixel_angles_per_s']:,.0f} pixel-angles/s")
+    return failures, perf
+
+
+def record_history(perf, path=HISTORY_FILE, max_regression=MAX_REGRESSION):
+    """Compare with the last entry per (machine, backend), append the new ones; returns regression messages."""
+    from .tuning import machine_id
+
+    machine = machine_id()
+    previous = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    if entry.get("machine") == machine:
+                        previous[entry["backend"]] = entry
+
+    regressions = []
+    for backend, metrics in perf.items():
+        last = previous.get(backend)
+        if last is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = last["metrics"][metric], metrics[metric]
+            if old <= 0:
+                continue
+            change = (old - new) / old * 100 if higher_is_better else (new - old) / old * 100
+            if change > max_regression:
+                regressions.append(f"[{backend}] {metric} regressed {change:.0f}% ({old:.4g} -> {new:.4g})")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for backend, metrics in perf.items():
+            f.write(json.dumps({"time": time.strftime("%Y-%m-%d %H:%M:%S"), "machine": machine, "backend": backend,
+                                "metrics": metrics}) + "\n")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Golden-result regression and performance check")
+    parser.add_argument("--golden", default=GOLDEN_DIR, help="Golden outputs directory")
+    parser.add_argument("--update-golden", action="store_true", help="Rewrite the golden outputs and exit")
+    parser.add_argument("--backend", action="append", default=None, help="Only check these backends")
+    parser.add_argument("--repeats", type=int, default=TIMING_REPEATS,
+                        help="Timed runs per backend; the fastest is recorded")
+    parser.add_argument("--history", default=HISTORY_FILE, help="Performance history (JSON lines)")
+    parser.add_argument("--max-regression", type=float, default=MAX_REGRESSION,
+                        help="Allowed slowdown / memory growth in percent")
+    parser.add_argument("--no-record", action="store_true", help="Do not compare with or append to the history")
+    args = parser.parse_args(argv)
+
+    if args.update_golden:
+        write_golden(args.golden)
+        return 0
+    failures, perf = check_golden(args.golden, args.backend, args.repeats)
+    if not args.no_record:
+        failures += record_history(perf, args.history, args.max_regression)
+    for msg in failures:
+        print("FAIL", msg)
+    print("OK" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
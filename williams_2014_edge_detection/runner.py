@@ -6,11 +6,14 @@ if __name__ == "__main__" and globals().get("__package__") is None:
     __package__ = "williams_2014_edge_detection"
 
 import os
+import argparse
 from PIL import Image
-from .constants import IMAGE_DIR, FILENAMES, MASK_SIZES, N_MC, DISPLAY
+from .constants import PROJECT_ROOT, IMAGE_DIR, FILENAMES, MASK_SIZES, N_MC, DISPLAY
 from .processing import process_image
 from .display import build_ks_binary_for_display, show_edge_on_black
 from .saving import make_attempt_dir, save_table
+from .checkpoint import (RunCheckpoint, attempt_number, load_run_config, save_run_config, make_run_config,
+                         same_run_config)
 
 
 def _fmt_mean_std(mean, std):
@@ -20,13 +23,60 @@ def _fmt_mean_std(mean, std):
         return f"{mean} ± {std}"
 
 
-def main():
+def _open_attempt(resume, seed):
+    """New attempt directory, or the one named by `resume` with its stored run configuration.
+
+    Returns (attempt_dir, attempt_num, seed).
+    """
+    config = make_run_config(FILENAMES, MASK_SIZES, N_MC, seed)
+    if resume is None:
+        attempt_dir, attempt_num = make_attempt_dir(prefix="attempt")
+        save_run_config(attempt_dir, config)
+        print(f"Outputs will be saved under: {attempt_dir} (attempt {attempt_num})")
+        return attempt_dir, attempt_num, seed
+
+    attempt_dir = resume if os.path.isabs(resume) else os.path.join(PROJECT_ROOT, resume)
+    if not os.path.isdir(attempt_dir):
+        raise FileNotFoundError(f"No attempt directory to resume: {attempt_dir}")
+    attempt_num = attempt_number(attempt_dir)
+    saved = load_run_config(attempt_dir)
+    if saved is None:
+        raise ValueError(f"{attempt_dir} has no run_config.json; it was not started as a resumable run")
+    if seed is not None and seed != saved["seed"]:
+        raise ValueError(f"--seed {seed} does not match the seed {saved['seed']} of {attempt_dir}")
+    config["seed"] = saved["seed"]
+    if not same_run_config(saved, config):
+        raise ValueError(f"Run configuration changed since {attempt_dir} was started; cannot resume")
+    if saved["seed"] is None:
+        print("Warning: the run has no seed; MC iterations that are recomputed get new noise")
+    print(f"Resuming attempt {attempt_num} in: {attempt_dir}")
+    return attempt_dir, attempt_num, saved["seed"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the edge detector on the demo images")
+    parser.add_argument("--resume", metavar="ATTEMPT_DIR", default=None,
+                        help="Resume an interrupted run, e.g. attempt_002 (relative to the project root)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed for the MC noise; needed for resumed runs to match uninterrupted ones")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Overlap image loading, noise, compute and writing across all images (see pipeline.py)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes: pipeline compute, or post-processing without --pipeline")
+    args = parser.parse_args(argv)
+
     all_tables = {}
     total_files = len(FILENAMES)
 
-    # create attempt directory under project root
-    attempt_dir, attempt_num = make_attempt_dir(prefix="attempt")
-    print(f"Outputs will be saved under: {attempt_dir} (attempt {attempt_num})")
+    attempt_dir, attempt_num, seed = _open_attempt(args.resume, args.seed)
+    checkpoint = RunCheckpoint(attempt_dir, attempt_num, N_MC)
+
+    frames = None
+    if args.pipeline:
+        from .pipeline import run_pipeline
+        paths = [os.path.join(IMAGE_DIR, f) for f in FILENAMES if os.path.exists(os.path.join(IMAGE_DIR, f))]
+        frames, _ = run_pipeline(paths, MASK_SIZES, n_mc=N_MC, out_dir=attempt_dir, attempt_num=attempt_num,
+                                 seed=seed, checkpoint=checkpoint, workers=args.workers)
 
     for file_idx, fname in enumerate(FILENAMES):
         path = os.path.join(IMAGE_DIR, fname)
@@ -35,8 +85,12 @@ def main():
             continue
 
         print(f"\n[{file_idx+1}/{total_files}] Processing {fname}")
-        # pass attempt_dir and attempt_num so processing can save per-MC images and binaries
-        df, im, gt = process_image(path, MASK_SIZES, n_mc=N_MC, out_dir=attempt_dir, attempt_num=attempt_num)
+        if frames is not None:
+            df = frames[path]
+        else:
+            # pass attempt_dir and attempt_num so processing can save per-MC images and binaries
+            df, im, gt = process_image(path, MASK_SIZES, n_mc=N_MC, out_dir=attempt_dir, attempt_num=attempt_num,
+                                       seed=seed, checkpoint=checkpoint, workers=args.workers)
 
         pivot = df.pivot(index='test', columns='mask_size', values='pcm_mean').round(3)
         pivot_std = df.pivot(index='test', columns='mask_size', values='pcm_std').round(3)
@@ -53,20 +107,23 @@ def main():
         print(combined)
         all_tables[fname] = df
 
-        print("  Generating display image...")
-        display_mask = 11 if 11 in MASK_SIZES else MASK_SIZES[0]
-        bw_thin = build_ks_binary_for_display(path, display_mask)
-        print(f"Displaying detected edges for: {fname}")
-        canvas = show_edge_on_black(bw_thin, fname)
-        # if DISPLAY is False or matplotlib not available, save fallback image
-        if canvas is not None:
-            out_dir = os.path.join(attempt_dir, 'json_outputs')
-            os.makedirs(out_dir, exist_ok=True)
-            out_path = os.path.join(out_dir, f"detected_{os.path.basename(fname)}")
-            try:
-                Image.fromarray(canvas).save(out_path)
-            except Exception as e:
-                print("Failed to save display canvas:", e)
+        display_out_path = os.path.join(attempt_dir, 'json_outputs', f"detected_{os.path.basename(fname)}")
+        bw_thin = None
+        if args.resume is not None and os.path.exists(display_out_path):
+            print(f"  Display image already saved: {display_out_path}")
+        else:
+            print("  Generating display image...")
+            display_mask = 11 if 11 in MASK_SIZES else MASK_SIZES[0]
+            bw_thin = build_ks_binary_for_display(path, display_mask)
+            print(f"Displaying detected edges for: {fname}")
+            canvas = show_edge_on_black(bw_thin, fname)
+            # if DISPLAY is False or matplotlib not available, save fallback image
+            if canvas is not None:
+                os.makedirs(os.path.dirname(display_out_path), exist_ok=True)
+                try:
+                    Image.fromarray(canvas).save(display_out_path)
+                except Exception as e:
+                    print("Failed to save display canvas:", e)
 
         # save table for this image
         try:
@@ -76,7 +133,7 @@ def main():
         except Exception as e:
             print("Failed to save results table:", e)
 
-        if DISPLAY:
+        if DISPLAY and bw_thin is not None:
             try:
                 show_edge_on_black(bw_thin, fname)
             except Exception:
@@ -92,6 +149,12 @@ def main():
     except Exception as e:
         print("Failed to save aggregated table:", e)
 
+    try:
+        from .catalog import record_attempt
+        record_attempt(attempt_dir, kind="pipeline" if args.pipeline else "runner")
+    except Exception as e:
+        print("Failed to record the run in the results catalog:", e)
+
     print("\n" + "=" * 60)
     print("All processing complete!")
 
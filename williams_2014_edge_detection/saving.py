@@ -1,7 +1,6 @@
 import os
 import re
 from typing import Tuple
-from skimage import io
 import numpy as np
 from .constants import PROJECT_ROOT
 
@@ -53,6 +52,8 @@ def format_image_filename(what: str, source_path: str, attempt_num: int, total_m
 def save_binary_image(arr: np.ndarray, out_dir: str, what: str, source_path: str,
                       attempt_num: int, total_mc: int, mc_idx: int, mask_size: int) -> str:
     """Save a binary (0/1 or boolean) image as uint8 PNG and return path."""
+    from skimage import io
+
     os.makedirs(out_dir, exist_ok=True)
     # normalize to 0..255 uint8
     if arr.dtype != np.uint8:
@@ -69,6 +70,22 @@ def save_binary_image(arr: np.ndarray, out_dir: str, what: str, source_path: str
     return out_path
 
 
+def save_response_maps(resp: np.ndarray, angle_idx: np.ndarray, angles, out_dir: str, source_path: str,
+                       attempt_num: int, total_mc: int, mc_idx: int, mask_size: int) -> str:
+    """Save stacked response maps, uint8 angle map and angle bank as one uncompressed .npz and return path."""
+    os.makedirs(out_dir, exist_ok=True)
+    fname = format_image_filename("maps", source_path, attempt_num, total_mc, mc_idx, mask_size, ext=".npz")
+    out_path = os.path.join(out_dir, fname)
+    np.savez(out_path, resp=np.ascontiguousarray(resp), angle_idx=angle_idx, angles=np.asarray(angles, dtype=float))
+    return out_path
+
+
+def load_response_maps(path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Load (resp, angle_idx, angles) written by save_response_maps."""
+    with np.load(path) as data:
+        return data["resp"], data["angle_idx"], data["angles"]
+
+
 def format_table_filename(base: str, source_path: str, attempt_num: int, total_mc: int, ext: str = ".csv") -> str:
     src = _safe_basename(source_path)
     return f"{base}_src-{src}_attempt-{attempt_num:03d}_mcTotal-{total_mc}{ext}"
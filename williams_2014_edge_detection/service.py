@@ -0,0 +1,362 @@
+"""Long-running local worker that keeps imports, mask banks and recent results warm.
+
+    python -m williams_2014_edge_detection serve
+    python -m williams_2014_edge_detection submit image.png --mask 5 --n-mc 1
+
+The server listens on a Unix socket and speaks newline-delimited JSON. A client sends one
+request per connection; for a job the server streams {"type": "progress", "message": ...}
+lines (what process_image prints) and ends with one {"type": "result", ...} or
+{"type": "error", "message": ...} line. Jobs run one at a time.
+
+Response maps and PCM scores of recent jobs are kept in an in-memory LRU cache keyed by
+image content, so repeating a job (or changing only the mask sizes) skips the work already
+done. Jobs whose MC noise is random (n_mc > 1 without a seed) are never cached.
+
+This module only imports the standard library and NumPy at import time, so the client
+side starts quickly; the server imports the processing stack once when it starts.
+"""
+import os
+import io
+import sys
+import json
+import time
+import base64
+import socket
+import hashlib
+import tempfile
+import threading
+import socketserver
+from collections import OrderedDict
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from .constants import MASK_SIZES
+
+SOCKET_ENV = "WILLIAMS_SERVICE_SOCKET"
+CACHE_BYTES = 1 << 30
+
+
+def default_socket_path():
+    """$WILLIAMS_SERVICE_SOCKET, else a per-user socket in the temp directory."""
+    env = os.environ.get(SOCKET_ENV)
+    if env:
+        return env
+    return os.path.join(tempfile.gettempdir(), f"williams_2014_edge_detection-{os.getuid()}.sock")
+
+
+def encode_array(arr):
+    arr = np.ascontiguousarray(arr)
+    return {"dtype": arr.dtype.str, "shape": list(arr.shape), "data": base64.b64encode(arr.tobytes()).decode("ascii")}
+
+
+def decode_array(payload):
+    data = base64.b64decode(payload["data"])
+    return np.frombuffer(data, dtype=np.dtype(payload["dtype"])).reshape(payload["shape"]).copy()
+
+
+def _digest(arr):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str((arr.dtype.str, arr.shape)).encode("ascii"))
+    h.update(np.ascontiguousarray(arr).tobytes())
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """Byte-bounded LRU of response maps and PCM scores."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, value, n_bytes):
+        if key in self._items:
+            self.n_bytes -= self._items.pop(key)[1]
+        self._items[key] = (value, n_bytes)
+        self.n_bytes += n_bytes
+        while self.n_bytes > self.max_bytes and len(self._items) > 1:
+            _, (_, old_bytes) = self._items.popitem(last=False)
+            self.n_bytes -= old_bytes
+
+    def stats(self):
+        return {"entries": len(self._items), "bytes": self.n_bytes, "hits": self.hits, "misses": self.misses}
+
+
+class _CacheView:
+    """Checkpoint-compatible view (see checkpoint.RunCheckpoint) of the cache for one job."""
+
+    def __init__(self, cache, job_key):
+        self.cache = cache
+        self.job_key = job_key
+
+    def load_pcm(self, source_path, mc_idx, msize, test):
+        return self.cache.get(("pcm",) + self.job_key + (mc_idx, msize, test))
+
+    def save_pcm(self, source_path, mc_idx, msize, test, pcm_scores):
+        scores = [float(v) for v in pcm_scores]
+        unit = {"pcm": scores, "best_idx": int(np.nanargmax(scores)) if scores else 0,
+                "best_pcm": float(np.max(scores)) if scores else float("nan")}
+        self.cache.put(("pcm",) + self.job_key + (mc_idx, msize, test), unit, 8 * len(scores) + 64)
+
+    def load_maps(self, source_path, mc_idx, msize):
+        return self.cache.get(("maps",) + self.job_key + (mc_idx, msize))
+
+    def save_maps(self, source_path, mc_idx, msize, resp, angle_idx, angles):
+        self.cache.put(("maps",) + self.job_key + (mc_idx, msize), (resp, angle_idx), resp.nbytes + angle_idx.nbytes)
+
+    def drop_maps(self, source_path, mc_idx, msize):
+        # maps stay cached so the same image can be rescored with another ground truth
+        pass
+
+
+class _ProgressWriter(io.TextIOBase):
+    """stdout replacement that forwards every printed line to the client."""
+
+    def __init__(self, send):
+        self._send = send
+        self._buf = ""
+
+    def write(self, s):
+        self._buf += s
+        while "\n" in self._buf:
+            line, self._buf = self._buf.split("\n", 1)
+            self._send({"type": "progress", "message": line})
+        return len(s)
+
+
+class WarmService:
+    """Holds the warm state and runs requests; transport-independent."""
+
+    def __init__(self, cache_bytes=CACHE_BYTES):
+        self.cache = ResponseCache(cache_bytes)
+        self.started = time.time()
+        self.jobs = 0
+        self._lock = threading.Lock()
+
+    def warm_up(self, mask_sizes=MASK_SIZES):
+        """Import the processing stack and build the mask banks up front."""
+        import pandas  # noqa: F401
+        from scipy import stats  # noqa: F401
+        from skimage.morphology import thin  # noqa: F401
+        from skimage import io as skio  # noqa: F401
+        from .processing import process_image  # noqa: F401
+        from .masks import mask_bank
+        for msize in mask_sizes:
+            mask_bank(msize)
+
+    def handle(self, request, send):
+        op = request.get("op")
+        if op == "ping":
+            send({"type": "result", "pong": True, "pid": os.getpid()})
+        elif op == "stats":
+            send({"type": "result", "jobs": self.jobs, "uptime": time.time() - self.started,
+                  "cache": self.cache.stats()})
+        elif op == "process_image":
+            self._process_image(request, send)
+        else:
+            send({"type": "error", "message": f"unknown op: {op!r}"})
+
+    def _process_image(self, request, send):
+        from .io_utils import load_gray
+        from .processing import process_image
+
+        try:
+            if "array" in request:
+                im = decode_array(request["array"])
+                name = request.get("name") or "array"
+            else:
+                im = load_gray(request["path"])
+                name = request.get("name") or os.path.basename(request["path"])
+            gt = decode_array(request["gt"]).astype(np.uint8) if request.get("gt") is not None else None
+            mask_sizes = [int(m) for m in request.get("mask_sizes", MASK_SIZES)]
+            n_mc = int(request.get("n_mc", 1))
+            seed = request.get("seed")
+        except Exception as e:
+            send({"type": "error", "message": f"bad request: {e}"})
+            return
+
+        checkpoint = None
+        if n_mc <= 1 or seed is not None:
+            gt_key = None if gt is None else _digest(gt)
+            checkpoint = _CacheView(self.cache, (_digest(im), gt_key, name, seed, n_mc))
+        with self._lock:
+            start = time.perf_counter()
+            hits = self.cache.hits
+            try:
+                with redirect_stdout(_ProgressWriter(send)):
+                    df, _, _ = process_image(im, mask_sizes, n_mc=n_mc, gt=gt, name=name, seed=seed,
+                                             checkpoint=checkpoint)
+            except (BrokenPipeError, ConnectionResetError):
+                # the client went away; nothing left to report to
+                return
+            except Exception as e:
+                send({"type": "error", "message": f"{type(e).__name__}: {e}"})
+                return
+            self.jobs += 1
+        send({"type": "result", "rows": df.to_dict(orient="records"), "seconds": time.perf_counter() - start,
+              "cache_hits": self.cache.hits - hits})
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        def send(msg):
+            self.wfile.write((json.dumps(msg) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            send({"type": "error", "message": f"invalid JSON: {e}"})
+            return
+        if request.get("op") == "shutdown":
+            send({"type": "result", "stopping": True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        self.server.service.handle(request, send)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path=None, cache_bytes=CACHE_BYTES, warm_mask_sizes=MASK_SIZES):
+    """Run the service until a shutdown request (or Ctrl-C)."""
+    socket_path = socket_path or default_socket_path()
+    if os.path.exists(socket_path):
+        try:
+            ServiceClient(socket_path).ping()
+            raise RuntimeError(f"A service is already listening on {socket_path}")
+        except (ConnectionRefusedError, FileNotFoundError):
+            # left behind by a service that did not shut down cleanly
+            os.unlink(socket_path)
+
+    service = WarmService(cache_bytes)
+    start = time.perf_counter()
+    service.warm_up(warm_mask_sizes)
+    print(f"Warmed up in {time.perf_counter() - start:.1f}s; listening on {socket_path}")
+    server = _Server(socket_path, _Handler)
+    server.service = service
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            os.unlink(socket_path)
+        except FileNotFoundError:
+            pass
+    print("Service stopped")
+
+
+class ServiceClient:
+    """Thin client; one connection per request."""
+
+    def __init__(self, socket_path=None, timeout=None):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+
+    def request(self, request, on_progress=None):
+        """Send one request; progress messages go to on_progress, the final message is returned.
+
+        Raises RuntimeError if the service reports an error.
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+            with sock.makefile("r", encoding="utf-8") as f:
+                for line in f:
+                    msg = json.loads(line)
+                    if msg["type"] == "progress":
+                        if on_progress is not None:
+                            on_progress(msg["message"])
+                        continue
+                    if msg["type"] == "error":
+                        raise RuntimeError(msg["message"])
+                    return msg
+        raise ConnectionError("service closed the connection without a result")
+
+    def ping(self):
+        return self.request({"op": "ping"})
+
+    def stats(self):
+        return self.request({"op": "stats"})
+
+    def shutdown(self):
+        return self.request({"op": "shutdown"})
+
+    def process_image(self, image, mask_sizes=MASK_SIZES, n_mc=1, seed=None, gt=None, name=None, on_progress=None):
+        """Run process_image in the service; `image` is a path or a 2D uint8 array.
+
+        Returns the summary table as a list of row dicts (test, mask_size, pcm_mean, pcm_std);
+        pass it to pandas.DataFrame for a frame identical to process_image's.
+        """
+        request = {"op": "process_image", "mask_sizes": [int(m) for m in mask_sizes], "n_mc": int(n_mc),
+                   "seed": seed, "name": name}
+        if isinstance(image, np.ndarray):
+            request["array"] = encode_array(image)
+        else:
+            request["path"] = os.path.abspath(image)
+        if gt is not None:
+            request["gt"] = encode_array(np.asarray(gt, dtype=np.uint8))
+        return self.request(request, on_progress)["rows"]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m williams_2014_edge_detection",
+                                     description="Warm edge-detection service and client")
+    parser.add_argument("--socket", default=None, help=f"Unix socket path (default: ${SOCKET_ENV} or a temp path)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_serve = sub.add_parser("serve", help="Start the service in the foreground")
+    p_serve.add_argument("--cache-mb", type=int, default=CACHE_BYTES >> 20, help="Response cache budget")
+    p_submit = sub.add_parser("submit", help="Process an image through the running service")
+    p_submit.add_argument("image")
+    p_submit.add_argument("--mask", type=int, nargs="+", default=list(MASK_SIZES))
+    p_submit.add_argument("--n-mc", type=int, default=1)
+    p_submit.add_argument("--seed", type=int, default=None)
+    p_submit.add_argument("--quiet", action="store_true", help="Do not print progress")
+    sub.add_parser("ping", help="Check that the service is up")
+    sub.add_parser("stats", help="Show job count and cache usage")
+    sub.add_parser("stop", help="Shut the service down")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.socket, cache_bytes=args.cache_mb << 20)
+        return
+    client = ServiceClient(args.socket)
+    try:
+        if args.command == "submit":
+            rows = client.process_image(args.image, args.mask, n_mc=args.n_mc, seed=args.seed,
+                                        on_progress=None if args.quiet else print)
+            print(f"{'test':<6}{'mask_size':>10}{'pcm_mean':>12}{'pcm_std':>10}")
+            for r in rows:
+                print(f"{r['test']:<6}{r['mask_size']:>10}{r['pcm_mean']:>12.3f}{r['pcm_std']:>10.3f}")
+        elif args.command == "ping":
+            print(client.ping())
+        elif args.command == "stats":
+            print(json.dumps(client.stats(), indent=2))
+        else:
+            client.shutdown()
+            print("Service stopping")
+    except (ConnectionRefusedError, FileNotFoundError):
+        print(f"No service listening on {client.socket_path}; start one with "
+              f"`python -m williams_2014_edge_detection serve`", file=sys.stderr)
+        sys.exit(1)
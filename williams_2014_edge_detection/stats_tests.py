@@ -1,6 +1,7 @@
+from functools import lru_cache
+
 import numpy as np
-from scipy import stats
-from .constants import N_CHI_BINS
+from .constants import N_CHI_BINS, TESTS
 
 
 def compute_tests_region(values_A, values_B):
@@ -8,6 +9,9 @@ def compute_tests_region(values_A, values_B):
     Compute set of statistical test responses between two 1D arrays.
     Returns dict with keys: DoB, T, F, L, U, KS, v2
     """
+    # deferred so importing the package does not pull in scipy; a no-op after the first call
+    from scipy import stats
+
     # guard against empty
     if values_A.size == 0 or values_B.size == 0:
         return {
@@ -72,3 +76,60 @@ def compute_tests_region(values_A, values_B):
         "v2": v2
     }
 
+
+
+@lru_cache(maxsize=1)
+def _chi_bin_of_value():
+    # (256, N_CHI_BINS) one-hot map from uint8 value to its bin in compute_tests_region's v2
+    # histogram, with the bin edges taken from np.histogram itself
+    values = np.arange(256)
+    edges = np.histogram_bin_edges(values, bins=N_CHI_BINS, range=(0, 255))
+    bins = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, N_CHI_BINS - 1)
+    return (bins[:, None] == np.arange(N_CHI_BINS)).astype(float)
+
+
+def _value_histograms(values):
+    """(P, 256) counts of every uint8 value in each row of a (P, n) array."""
+    P = values.shape[0]
+    idx = (np.arange(P, dtype=np.int64)[:, None] * 256 + values).ravel()
+    return np.bincount(idx, minlength=P * 256).reshape(P, 256)
+
+
+def compute_tests_batch(values_A, values_B):
+    """compute_tests_region for many regions at once.
+
+    values_A (P, nA) and values_B (P, nB) are uint8 arrays, one row per region (both
+    non-empty). Returns a (len(TESTS), P) float64 array in TESTS order. Mann-Whitney U,
+    KS and v2 come from per-row 256-bin value histograms, the rest from row moments.
+    """
+    a = values_A.astype(float)
+    b = values_B.astype(float)
+    na, nb = a.shape[1], b.shape[1]
+    ma, mb = a.mean(axis=1), b.mean(axis=1)
+    sa = a.var(axis=1, ddof=1) if na > 1 else np.zeros(len(a))
+    sb = b.var(axis=1, ddof=1) if nb > 1 else np.zeros(len(b))
+
+    dob = np.abs(ma - mb)
+    t_stat = dob / (np.sqrt(sa / na + sb / nb) + 1e-12)
+    with np.errstate(divide="ignore"):
+        f_stat = np.where((sa <= 0) & (sb <= 0), 1.0,
+                          np.where(sb == 0, np.maximum(sa, sb) * 1e3,
+                                   np.maximum(sa / (sb + 1e-12), sb / (sa + 1e-12))))
+    L = -(na + nb) * np.log(4.0 * ((sa + 1e-12) / (sb + 1e-12)) + 1e-12)
+
+    hA = _value_histograms(values_A)
+    hB = _value_histograms(values_B)
+    cB = np.cumsum(hB, axis=1)
+    # U of sample A: for every a, the number of smaller b plus half the tied ones
+    Ustat = (hA * (cB - hB + 0.5 * hB)).sum(axis=1)
+    KSD = np.abs(np.cumsum(hA, axis=1) / na - cB / nb).max(axis=1)
+
+    to_bins = _chi_bin_of_value()
+    R = hA @ to_bins
+    S = hB @ to_bins
+    denom = R + S
+    with np.errstate(divide="ignore", invalid="ignore"):
+        v2 = np.where(denom > 0, (R - S) ** 2 / denom, 0.0).sum(axis=1)
+
+    out = {"DoB": dob, "T": t_stat, "F": f_stat, "L": L, "U": Ustat, "KS": KSD, "v2": v2}
+    return np.stack([out[t] for t in TESTS])
@@ -0,0 +1,124 @@
+"""Pick the fastest response backend per workload and remember the choice.
+
+The first time a workload is seen, every backend in processing.BACKENDS runs on a small
+calibration crop of the image. A backend counts only if its maps match the reference
+loop backend on the crop (up to float rounding). The fastest one per output pixel is
+stored in a JSON tuning cache and used from then on. A workload is identified by
+
+    machine (host, CPU architecture, core count, NumPy version) | image size class |
+    mask size | number of angles | response dtype | input dtype
+
+Image sizes are bucketed by powers of two of the pixel count, so similar images share an
+entry. The cache lives in $WILLIAMS_TUNING_CACHE, default .tuning_cache.json in the project
+root. Set $WILLIAMS_BACKEND (or pass backend= to compute_response_maps) to force a backend.
+"""
+import os
+import json
+import time
+import math
+import platform
+
+import numpy as np
+
+from .constants import PROJECT_ROOT
+from .checkpoint import write_json_atomic
+
+BACKEND_ENV = "WILLIAMS_BACKEND"
+CACHE_ENV = "WILLIAMS_TUNING_CACHE"
+DEFAULT_CACHE = os.path.join(PROJECT_ROOT, ".tuning_cache.json")
+REFERENCE_BACKEND = "loop"
+# output pixels per side of the calibration crop
+CALIBRATION_SIDE = 8
+
+# decisions made in this process, so the cache file is read at most once per workload
+_decisions = {}
+
+
+def tuning_cache_path():
+    return os.environ.get(CACHE_ENV) or DEFAULT_CACHE
+
+
+def machine_id():
+    return f"{platform.node()}/{platform.machine()}/{os.cpu_count()}cpu/numpy{np.__version__}"
+
+
+def workload_key(im, msize, n_angles, dtype):
+    size_class = 2 ** int(round(math.log2(max(im.shape[0] * im.shape[1], 1))))
+    return (f"{machine_id()}|px~{size_class}|mask{int(msize)}|angles{int(n_angles)}"
+            f"|{np.dtype(dtype).name}|in-{im.dtype.name}")
+
+
+def load_tuning_cache(path=None):
+    path = path or tuning_cache_path()
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable tuning cache {path}: {e}")
+        return {}
+
+
+def calibration_crop(im, msize, side=CALIBRATION_SIDE):
+    """Central crop with (at most) side x side pixels where the mask fits."""
+    H, W = im.shape
+    ch, cw = min(H, msize - 1 + side), min(W, msize - 1 + side)
+    r0, c0 = (H - ch) // 2, (W - cw) // 2
+    return im[r0:r0 + ch, c0:c0 + cw]
+
+
+def benchmark_backends(im, msize, angles, dtype, backends=None):
+    """{backend: seconds per output pixel} on a calibration crop; backends that disagree with the
+    reference backend get inf."""
+    from .processing import BACKENDS
+
+    crop = calibration_crop(im, msize)
+    n_px = max(crop.shape[0] - msize + 1, 1) * max(crop.shape[1] - msize + 1, 1)
+    timings, reference = {}, None
+    names = [REFERENCE_BACKEND] + sorted(n for n in (backends or BACKENDS) if n != REFERENCE_BACKEND)
+    for name in names:
+        start = time.perf_counter()
+        resp, angle_idx = BACKENDS[name](crop, msize, angles, dtype, None)
+        timings[name] = (time.perf_counter() - start) / n_px
+        if reference is None:
+            reference = (resp, angle_idx)
+        # the angle maps may differ only where two angles tie to within float rounding
+        elif not (np.mean(angle_idx != reference[1]) <= 0.01
+                  and np.allclose(resp, reference[0], rtol=1e-5, atol=1e-6, equal_nan=True)):
+            print(f"  Backend {name} disagrees with {REFERENCE_BACKEND} on the calibration crop; not using it")
+            timings[name] = math.inf
+    return timings
+
+
+def select_backend(im, msize, angles, dtype):
+    """Backend name to use for this workload: forced by $WILLIAMS_BACKEND, else tuned and cached."""
+    from .processing import BACKENDS
+
+    forced = os.environ.get(BACKEND_ENV)
+    if forced:
+        if forced not in BACKENDS:
+            raise ValueError(f"${BACKEND_ENV}={forced!r} is not one of {sorted(BACKENDS)}")
+        return forced
+
+    path = tuning_cache_path()
+    key = workload_key(im, msize, len(angles), dtype)
+    choice = _decisions.get((path, key))
+    if choice is None:
+        entry = load_tuning_cache(path).get(key)
+        if entry is not None and entry.get("backend") in BACKENDS:
+            choice = entry["backend"]
+        else:
+            timings = benchmark_backends(im, msize, angles, dtype)
+            choice = min(timings, key=timings.get)
+            print(f"  Tuned response backend for {key}: {choice} "
+                  f"({', '.join(f'{n} {t * 1e6:.0f} us/px' for n, t in timings.items())})")
+            cache = load_tuning_cache(path)
+            cache[key] = {"backend": choice, "us_per_px": {n: t * 1e6 for n, t in timings.items()},
+                          "tuned": time.strftime("%Y-%m-%d %H:%M:%S")}
+            try:
+                write_json_atomic(path, cache)
+            except OSError as e:
+                print(f"  Could not write tuning cache {path}: {e}")
+        _decisions[(path, key)] = choice
+    return choice
@@ -0,0 +1,233 @@
+"""Out-of-core processing of OCT B-scan stacks.
+
+A volume (multi-page TIFF or .npy stack) is memory-mapped and processed one
+tile of one slice at a time. Response maps, angle maps and thin binaries are
+written to memory-mapped .npy files in the output directory, and finished
+tiles/slices are recorded in progress.json so an interrupted run resumes where
+it stopped.
+
+    python -m williams_2014_edge_detection.volume stack.tif out_dir --mask 19
+"""
+import os
+import json
+import argparse
+import numpy as np
+
+from .io_utils import to_gray_uint8
+from .masks import default_angles
+from .processing import compute_response_maps, normalize_response
+from .nms_and_thresh import non_max_suppression, hysteresis_and_binary
+from .constants import TESTS, HIGHS, LOW_RATIO, RESPONSE_DTYPE, NO_ANGLE
+
+PROGRESS_FILE = "progress.json"
+
+
+class _TiffPages:
+    """Lazy (n_pages, H, W) view of a multi-page TIFF that cannot be memory-mapped (e.g. compressed)."""
+
+    def __init__(self, pages, shape, dtype):
+        self._pages = pages
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.ndim = len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, idx):
+        return self._pages[idx].asarray()
+
+
+def open_volume(path):
+    """Open a B-scan stack without loading it into memory.
+
+    .npy files are memory-mapped read-only, TIFFs are memory-mapped when stored
+    uncompressed and read page by page (one page per B-scan) otherwise. A single 2D image is treated
+    as a one-slice volume. So is a single colour image (H, W, 3 or 4), whose last axis holds
+    channels rather than slices; slices are converted to grayscale when processed.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npy":
+        vol = np.load(path, mmap_mode="r")
+    elif ext in (".tif", ".tiff"):
+        import tifffile
+        try:
+            vol = tifffile.memmap(path, mode="r")
+        except ValueError:
+            tif = tifffile.TiffFile(path)
+            series = tif.series[0]
+            if len(series.shape) == 3 and len(series.pages) == series.shape[0]:
+                vol = _TiffPages(series.pages, series.shape, series.dtype)
+            elif len(series.shape) == 2 and len(tif.pages) > 1:
+                # pages written one by one, each its own B-scan
+                vol = _TiffPages(tif.pages, (len(tif.pages),) + tuple(series.shape), series.dtype)
+            else:
+                # slices are not stored as separate pages, so they cannot be read one at a time
+                print(f"Warning: {path} cannot be memory-mapped or read per page; loading it into memory")
+                vol = series.asarray()
+    else:
+        raise ValueError(f"Unsupported volume format: {path} (expected .npy, .tif or .tiff)")
+    if vol.ndim == 2 or _is_colour_image(vol.shape):
+        vol = vol[None]
+    if vol.ndim not in (3, 4) or (vol.ndim == 4 and vol.shape[-1] not in (3, 4)):
+        raise ValueError(f"{path} has shape {vol.shape}; expected (slices, H, W) or (slices, H, W, channels)")
+    return vol
+
+
+def _is_colour_image(shape):
+    # (H, W, 3|4) rather than 3 or 4 slices: channels last, both image axes larger than that
+    return len(shape) == 3 and shape[-1] in (3, 4) and min(shape[0], shape[1]) > 4
+
+
+def _tile_origins(H, W, tile):
+    th, tw = tile
+    return [(r0, c0) for r0 in range(0, H, th) for c0 in range(0, W, tw)]
+
+
+def _write_json_atomic(path, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _open_output(path, shape, dtype, fill, resume):
+    if resume and os.path.exists(path):
+        arr = np.load(path, mmap_mode="r+")
+        if arr.shape != tuple(shape) or arr.dtype != np.dtype(dtype):
+            raise ValueError(f"Existing output {path} has shape {arr.shape}/{arr.dtype}, expected {shape}/{np.dtype(dtype)}")
+        return arr
+    arr = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=tuple(shape))
+    arr[...] = fill
+    return arr
+
+
+def process_volume(volume_path, out_dir, msize, angles=None, tile=(128, 128), high_threshold=None,
+                   dtype=RESPONSE_DTYPE, slices=None):
+    """Compute response maps and thin binaries for every slice of a B-scan stack, out of core.
+
+    Each tile is processed with a msize // 2 halo, so results are identical to running
+    compute_response_maps on the whole slice. Responses for one tile are the only
+    per-pixel state kept in memory; normalisation, NMS and hysteresis run per slice,
+    one test at a time, reading back from the memory-mapped outputs.
+
+    Outputs in out_dir:
+      responses.npy  (n_slices, n_tests, H, W) `dtype`
+      angle_idx.npy  (n_slices, H, W) uint8 index into the angle bank (NO_ANGLE = unset)
+      binary.npy     (n_slices, n_tests, H, W) uint8 thin edges at `high_threshold`
+      progress.json  run configuration plus finished tiles and slices
+
+    Calling again with the same arguments resumes an interrupted run.
+    Returns a dict with the three output memmaps and the number of tiles computed.
+    """
+    from skimage.morphology import thin
+
+    vol = open_volume(volume_path)
+    n_slices, H, W = vol.shape[0], vol.shape[1], vol.shape[2]
+    if angles is None:
+        angles = default_angles(msize)
+    angles = [float(a) for a in angles]
+    ThH = float(np.median(HIGHS)) if high_threshold is None else float(high_threshold)
+    if slices is None:
+        slices = range(n_slices)
+    tile = (int(tile[0]), int(tile[1]))
+    half = msize // 2
+
+    config = {
+        "volume": os.path.abspath(volume_path),
+        "shape": [n_slices, H, W],
+        "mask_size": msize,
+        "angles": angles,
+        "tile": list(tile),
+        "high_threshold": ThH,
+        "low_ratio": LOW_RATIO,
+        "dtype": np.dtype(dtype).name,
+        "tests": list(TESTS),
+    }
+
+    os.makedirs(out_dir, exist_ok=True)
+    progress_path = os.path.join(out_dir, PROGRESS_FILE)
+    progress = {"config": config, "tiles_done": [], "slices_done": []}
+    resume = False
+    if os.path.exists(progress_path):
+        with open(progress_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("config") != config:
+            raise ValueError(f"{out_dir} holds a run with a different configuration; use a fresh output directory")
+        progress = saved
+        resume = True
+        print(f"Resuming volume run: {len(progress['slices_done'])}/{n_slices} slices done")
+
+    n_tests = len(TESTS)
+    resp_out = _open_output(os.path.join(out_dir, "responses.npy"), (n_slices, n_tests, H, W), dtype, 0, resume)
+    angle_out = _open_output(os.path.join(out_dir, "angle_idx.npy"), (n_slices, H, W), np.uint8, NO_ANGLE, resume)
+    bin_out = _open_output(os.path.join(out_dir, "binary.npy"), (n_slices, n_tests, H, W), np.uint8, 0, resume)
+    if not resume:
+        _write_json_atomic(progress_path, progress)
+
+    tiles_done = {tuple(t) for t in progress["tiles_done"]}
+    slices_done = set(progress["slices_done"])
+    origins = _tile_origins(H, W, tile)
+    tiles_processed = 0
+
+    for s in slices:
+        if s in slices_done:
+            continue
+        print(f"  Slice {s+1}/{n_slices}")
+        # only this slice is decoded; for memmaps this reads just its pages
+        im = None
+        for t_idx, (r0, c0) in enumerate(origins):
+            if (s, r0, c0) in tiles_done:
+                continue
+            if im is None:
+                im = to_gray_uint8(np.asarray(vol[s]))
+            r1, c1 = min(r0 + tile[0], H), min(c0 + tile[1], W)
+            hr0, hc0 = max(r0 - half, 0), max(c0 - half, 0)
+            hr1, hc1 = min(r1 + half, H), min(c1 + half, W)
+            resp, angle_idx = compute_response_maps(im[hr0:hr1, hc0:hc1], msize, angles, dtype=dtype)
+            resp_out[s, :, r0:r1, c0:c1] = resp[:, r0 - hr0:r1 - hr0, c0 - hc0:c1 - hc0]
+            angle_out[s, r0:r1, c0:c1] = angle_idx[r0 - hr0:r1 - hr0, c0 - hc0:c1 - hc0]
+            resp_out.flush()
+            angle_out.flush()
+            tiles_done.add((s, r0, c0))
+            progress["tiles_done"].append([s, r0, c0])
+            _write_json_atomic(progress_path, progress)
+            tiles_processed += 1
+            print(f"    Tile {t_idx+1}/{len(origins)} done")
+
+        # per-slice post-processing, one test map at a time
+        slice_angles = np.asarray(angle_out[s])
+        for t_idx in range(n_tests):
+            norm = normalize_response(np.asarray(resp_out[s, t_idx]))
+            nms = non_max_suppression(norm, slice_angles, angles)
+            bw = hysteresis_and_binary(nms, ThH, LOW_RATIO * ThH)
+            bin_out[s, t_idx] = thin(bw > 0).astype(np.uint8)
+        bin_out.flush()
+        slices_done.add(s)
+        progress["slices_done"].append(s)
+        # tiles of finished slices are implied by slices_done
+        progress["tiles_done"] = [t for t in progress["tiles_done"] if t[0] != s]
+        _write_json_atomic(progress_path, progress)
+
+    return {"responses": resp_out, "angle_idx": angle_out, "binary": bin_out, "tiles_processed": tiles_processed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the edge detector on a B-scan stack out of core")
+    parser.add_argument("volume", help="Multi-page TIFF or .npy stack")
+    parser.add_argument("out_dir", help="Directory for memory-mapped outputs (reused to resume)")
+    parser.add_argument("--mask", type=int, default=19, help="Mask size")
+    parser.add_argument("--tile", type=int, nargs=2, default=(128, 128), metavar=("ROWS", "COLS"))
+    parser.add_argument("--high", type=float, default=None, help="High hysteresis threshold (default: median of HIGHS)")
+    parser.add_argument("--float64", action="store_true", help="Store responses as float64")
+    args = parser.parse_args(argv)
+
+    dtype = np.float64 if args.float64 else RESPONSE_DTYPE
+    res = process_volume(args.volume, args.out_dir, args.mask, tile=args.tile, high_threshold=args.high, dtype=dtype)
+    print(f"Done ({res['tiles_processed']} tiles computed). Outputs in {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
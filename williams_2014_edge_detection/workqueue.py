@@ -0,0 +1,299 @@
+"""Broker-free work queue on a shared filesystem, for running one attempt on many hosts.
+
+The planner writes one JSON file per (image, mask size, MC iteration) unit into
+<attempt_dir>/queue/pending/. Workers on any host that sees the directory (e.g. an NFS
+mount) claim a unit by renaming it into queue/leased/ under a name carrying their worker
+id; the rename is atomic, so exactly one worker wins. While computing, a worker touches
+its lease file as a heartbeat. Leases not touched for `lease_seconds` are moved back to
+pending by whichever worker notices first (host clocks only need to agree to well within
+`lease_seconds`). Results are the same per-unit checkpoint
+files a local run writes (see checkpoint.py), so a unit finished twice after a lease
+expiry writes identical data. Once every unit is done the reducer builds the per-image
+tables and the all_results table.
+
+    python -m williams_2014_edge_detection.workqueue plan --seed 0
+    python -m williams_2014_edge_detection.workqueue work attempt_003 --procs 8     # on every host
+    python -m williams_2014_edge_detection.workqueue reduce attempt_003
+"""
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+
+from .constants import PROJECT_ROOT, IMAGE_DIR, FILENAMES, MASK_SIZES, N_MC, TESTS
+from .checkpoint import (RunCheckpoint, attempt_number, load_run_config, save_run_config, load_results,
+                         write_json_atomic, make_run_config, same_run_config)
+from .saving import make_attempt_dir
+
+QUEUE_DIR = "queue"
+LEASE_SECONDS = 600
+POLL_SECONDS = 5
+
+
+def _queue_dirs(attempt_dir):
+    root = os.path.join(attempt_dir, QUEUE_DIR)
+    return {name: os.path.join(root, name) for name in ("pending", "leased", "done")}
+
+
+def unit_id(image_idx, image_path, msize, mc_idx):
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    return f"{image_idx:03d}_{stem}_mask-{msize}_mc-{mc_idx:03d}"
+
+
+def _lease_unit(lease_name):
+    # leases are named <unit id>__<worker id>.json
+    return lease_name.rsplit("__", 1)[0]
+
+
+def resolve_attempt_dir(attempt):
+    return attempt if os.path.isabs(attempt) else os.path.join(PROJECT_ROOT, attempt)
+
+
+def plan(attempt_dir=None, seed=None, filenames=None, mask_sizes=None, n_mc=N_MC, image_dir=IMAGE_DIR):
+    """Write the queue of units not finished yet; creates a new attempt directory unless one is given.
+
+    The run configuration is stored like a local run's, so `runner --resume` can also finish it.
+    Returns (attempt_dir, number of units queued).
+    """
+    filenames = list(FILENAMES if filenames is None else filenames)
+    mask_sizes = list(MASK_SIZES if mask_sizes is None else mask_sizes)
+    config = make_run_config(filenames, mask_sizes, n_mc, seed)
+    if attempt_dir is None:
+        attempt_dir, _ = make_attempt_dir(prefix="attempt")
+        save_run_config(attempt_dir, config)
+    else:
+        saved = load_run_config(attempt_dir)
+        if saved is None:
+            save_run_config(attempt_dir, config)
+        elif not same_run_config(saved, config):
+            raise ValueError(f"Run configuration of {attempt_dir} differs; plan into a new attempt")
+    if seed is None:
+        print("Warning: no seed; units recomputed after a lease expiry get new MC noise")
+
+    dirs = _queue_dirs(attempt_dir)
+    for d in dirs.values():
+        os.makedirs(d, exist_ok=True)
+    checkpoint = RunCheckpoint(attempt_dir, attempt_number(attempt_dir), n_mc)
+    queued = set(os.listdir(dirs["pending"])) | {_lease_unit(f) + ".json" for f in os.listdir(dirs["leased"])}
+
+    n_queued = 0
+    for image_idx, fname in enumerate(filenames):
+        path = os.path.join(image_dir, fname)
+        if not os.path.exists(path):
+            print(f"File not found: {path}. Skipping.")
+            continue
+        for msize in mask_sizes:
+            for mc_idx in range(1, n_mc + 1):
+                uid = unit_id(image_idx, path, msize, mc_idx)
+                if uid + ".json" in queued:
+                    continue
+                if all(checkpoint.load_pcm(path, mc_idx, msize, t) is not None for t in TESTS):
+                    continue
+                unit = {"id": uid, "image": path, "mask_size": msize, "mc": mc_idx, "n_mc": n_mc, "seed": seed}
+                write_json_atomic(os.path.join(dirs["pending"], uid + ".json"), unit)
+                n_queued += 1
+    print(f"Queued {n_queued} units in {dirs['pending']}")
+    return attempt_dir, n_queued
+
+
+def requeue_expired(attempt_dir, lease_seconds=LEASE_SECONDS):
+    """Move leases whose heartbeat is older than lease_seconds back to pending; returns how many."""
+    dirs = _queue_dirs(attempt_dir)
+    now = time.time()
+    n = 0
+    for name in os.listdir(dirs["leased"]):
+        path = os.path.join(dirs["leased"], name)
+        try:
+            if now - os.path.getmtime(path) <= lease_seconds:
+                continue
+            os.rename(path, os.path.join(dirs["pending"], _lease_unit(name) + ".json"))
+            print(f"  Lease expired, requeued: {name}")
+            n += 1
+        except FileNotFoundError:
+            # finished or requeued by someone else meanwhile
+            continue
+    return n
+
+
+def claim(attempt_dir, worker_id):
+    """Atomically claim one pending unit; returns (unit, lease_path) or None when nothing is pending."""
+    dirs = _queue_dirs(attempt_dir)
+    for name in sorted(os.listdir(dirs["pending"])):
+        if not name.endswith(".json"):
+            continue
+        pending_path = os.path.join(dirs["pending"], name)
+        lease_path = os.path.join(dirs["leased"], f"{name[:-5]}__{worker_id}.json")
+        try:
+            # the rename keeps the mtime, so touch first: otherwise the new lease would look
+            # expired at once and another worker's requeue_expired could take it back
+            os.utime(pending_path)
+            os.rename(pending_path, lease_path)
+            os.utime(lease_path)
+            with open(lease_path, "r", encoding="utf-8") as f:
+                return json.load(f), lease_path
+        except FileNotFoundError:
+            # claimed by another worker first, or the lease was lost right after the rename
+            continue
+    return None
+
+
+def _heartbeat(lease_path, interval, stop):
+    while not stop.wait(interval):
+        try:
+            os.utime(lease_path)
+        except FileNotFoundError:
+            # the lease expired and was requeued; the unit's result is still valid if we finish
+            return
+
+
+def run_unit(attempt_dir, unit):
+    """Compute one unit into the attempt's checkpoint files."""
+    from .processing import process_image
+
+    checkpoint = RunCheckpoint(attempt_dir, attempt_number(attempt_dir), unit["n_mc"])
+    process_image(unit["image"], [unit["mask_size"]], n_mc=unit["n_mc"], seed=unit["seed"],
+                  checkpoint=checkpoint, mc_iterations=[unit["mc"]])
+
+
+def work(attempt_dir, worker_id=None, lease_seconds=LEASE_SECONDS, max_units=None, poll_seconds=POLL_SECONDS):
+    """Claim and run units until the queue is drained (or max_units are done); returns units run.
+
+    Binary images and tables are not written by workers; the reducer writes the tables.
+    """
+    if worker_id is None:
+        worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    dirs = _queue_dirs(attempt_dir)
+    n_done = 0
+    while max_units is None or n_done < max_units:
+        requeue_expired(attempt_dir, lease_seconds)
+        claimed = claim(attempt_dir, worker_id)
+        if claimed is None:
+            if not os.listdir(dirs["leased"]):
+                break
+            # other workers hold the remaining units; wait in case their leases expire
+            time.sleep(poll_seconds)
+            continue
+        unit, lease_path = claimed
+        print(f"[{worker_id}] Running unit {unit['id']}")
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat, args=(lease_path, lease_seconds / 4.0, stop), daemon=True)
+        beat.start()
+        try:
+            run_unit(attempt_dir, unit)
+        except BaseException:
+            # hand the unit back right away instead of waiting for the lease to expire
+            stop.set()
+            try:
+                os.rename(lease_path, os.path.join(dirs["pending"], unit["id"] + ".json"))
+            except FileNotFoundError:
+                pass
+            raise
+        stop.set()
+        beat.join()
+        try:
+            os.rename(lease_path, os.path.join(dirs["done"], unit["id"] + ".json"))
+        except FileNotFoundError:
+            # lease expired meanwhile; whoever reran it writes the same results
+            pass
+        n_done += 1
+    print(f"[{worker_id}] Finished {n_done} units")
+    return n_done
+
+
+def _work_process(attempt_dir, worker_id, lease_seconds, max_units):
+    work(attempt_dir, worker_id, lease_seconds, max_units)
+
+
+def status(attempt_dir):
+    dirs = _queue_dirs(attempt_dir)
+    return {name: len(os.listdir(d)) if os.path.isdir(d) else 0 for name, d in dirs.items()}
+
+
+def reduce_results(attempt_dir, image_dir=IMAGE_DIR):
+    """Build per-image tables and the all_results table from finished units; returns the combined DataFrame.
+
+    Raises RuntimeError listing missing units if the queue has not been fully processed.
+    """
+    import pandas as pd
+    from .processing import summarize_results
+    from .saving import save_table
+
+    config = load_run_config(attempt_dir)
+    if config is None:
+        raise ValueError(f"{attempt_dir} has no run_config.json")
+    attempt_num = attempt_number(attempt_dir)
+    n_mc, mask_sizes = config["n_mc"], config["mask_sizes"]
+    checkpoint = RunCheckpoint(attempt_dir, attempt_num, n_mc)
+    tables_out_dir = os.path.join(attempt_dir, "tables")
+
+    tables, missing = [], []
+    for fname in config["filenames"]:
+        path = os.path.join(image_dir, fname)
+        if not os.path.exists(path):
+            continue
+        results, miss = load_results(checkpoint, path, TESTS, mask_sizes, n_mc)
+        missing += [(fname,) + m for m in miss]
+        if miss:
+            continue
+        df = summarize_results(results, TESTS, mask_sizes)
+        saved = save_table(df, tables_out_dir, "results", path, attempt_num, n_mc)
+        print(f"Saved results table to: {saved}")
+        tables.append(df)
+    if missing:
+        raise RuntimeError(f"{len(missing)} units are not finished yet, e.g. {missing[:3]}")
+
+    all_df = pd.concat(tables, ignore_index=True)
+    saved = save_table(all_df, tables_out_dir, "all_results", "all_images", attempt_num, n_mc)
+    print(f"Aggregated table saved to: {saved}")
+    try:
+        from .catalog import record_attempt
+        record_attempt(attempt_dir, kind="workqueue", image_dir=image_dir)
+    except Exception as e:
+        print("Failed to record the run in the results catalog:", e)
+    return all_df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared-filesystem work queue for detector runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_plan = sub.add_parser("plan", help="Queue the units of a new (or existing) attempt")
+    p_plan.add_argument("--attempt", default=None, help="Existing attempt directory to (re)plan")
+    p_plan.add_argument("--seed", type=int, default=None, help="Seed for the MC noise (recommended)")
+    p_work = sub.add_parser("work", help="Run units until the queue is empty")
+    p_work.add_argument("attempt")
+    p_work.add_argument("--procs", type=int, default=1, help="Worker processes on this host")
+    p_work.add_argument("--lease", type=float, default=LEASE_SECONDS, help="Seconds without heartbeat before requeue")
+    p_work.add_argument("--max-units", type=int, default=None)
+    p_status = sub.add_parser("status", help="Count pending, leased and done units")
+    p_status.add_argument("attempt")
+    p_reduce = sub.add_parser("reduce", help="Write the result tables once all units are done")
+    p_reduce.add_argument("attempt")
+    args = parser.parse_args(argv)
+
+    if args.command == "plan":
+        attempt_dir, _ = plan(None if args.attempt is None else resolve_attempt_dir(args.attempt), seed=args.seed)
+        print(f"Attempt directory: {attempt_dir}")
+    elif args.command == "work":
+        attempt_dir = resolve_attempt_dir(args.attempt)
+        if args.procs <= 1:
+            work(attempt_dir, lease_seconds=args.lease, max_units=args.max_units)
+        else:
+            import multiprocessing
+            procs = [multiprocessing.Process(target=_work_process,
+                                             args=(attempt_dir, f"{socket.gethostname()}-{os.getpid()}-{i}",
+                                                   args.lease, args.max_units))
+                     for i in range(args.procs)]
+            for p in procs:
+                p.start()
+            for p in procs:
+                p.join()
+    elif args.command == "status":
+        print(status(resolve_attempt_dir(args.attempt)))
+    else:
+        reduce_results(resolve_attempt_dir(args.attempt))
+
+
+if __name__ == "__main__":
+    main()